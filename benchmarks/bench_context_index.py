@@ -0,0 +1,142 @@
+"""
+Regression benchmark for the XbrlParser context index.
+
+Times element parsing over a sample of real filings using the per-element
+soup lookups (retrieve_unit, retrieve_date and retrieve_from_context) and
+using the one-pass context index, and checks both give the same elements.
+
+Usage:
+    python -m benchmarks.bench_context_index \
+        /shares/xbrl_unpacked_data/Accounts_Monthly_Data-September2019 -n 200
+"""
+import argparse
+import random
+import time
+
+from bs4 import BeautifulSoup as BS
+
+from src.data_processing.xbrl_pd_methods import XbrlExtraction
+from src.data_processing.xbrl_parser import XbrlParser
+
+
+def legacy_parse_elements(element_set, soup):
+    """
+    Parses a set of elements by searching the document for the context and
+    unit of every element, as parse_elements did before the context index.
+
+    Arguments:
+        element_set:    BeautifulSoup iterable search result object (list of BeautifulSoup objects)
+        soup:           BeautifulSoup object of accounts document (BeautifulSoup object)
+    Returns:
+        element_dict:   A dict of lists of the parsed elements (dict)
+    Raises:
+        None
+    """
+    element_dict = {'name': [], 'value': [], 'unit': [],
+                    'date': [], 'sign': []}
+
+    for element in element_set:
+        if "contextref" not in element.attrs:
+            continue
+
+        try:
+            name = element.attrs['name'].lower().split(":")[-1]
+        except:
+            name = element.name.lower().split(":")[-1]
+
+        value = element.get_text()
+        unit = XbrlParser.retrieve_unit(soup, element)
+        date = XbrlParser.retrieve_date(soup, element)
+
+        if value == "":
+            value = XbrlParser.retrieve_from_context(
+                soup, element.attrs['contextref'])
+
+        if unit != "NA":
+            value = XbrlParser.clean_value(value)
+
+        sign = element.attrs.get('sign', "NA")
+        if sign.strip() == "-":
+            try:
+                value = 0.0 - value
+            except TypeError:
+                pass
+
+        element_dict['name'].append(name)
+        element_dict['value'].append(value)
+        element_dict['unit'].append(unit)
+        element_dict['date'].append(date)
+        element_dict['sign'].append(sign)
+
+    return element_dict
+
+
+def run_benchmark(files):
+    """
+    Parses each file with both the legacy and the indexed lookups, timing
+    only the element parsing (soup construction is shared).
+
+    Arguments:
+        files:  list of filepaths of xbrl/html accounts (list)
+    Returns:
+        results: total seconds spent by each path, the number of elements
+                 parsed and the files whose output differed (dict)
+    Raises:
+        None
+    """
+    results = {"legacy": 0.0, "indexed": 0.0, "elements": 0,
+               "mismatches": []}
+
+    for filepath in files:
+        with open(filepath) as f:
+            soup = BS(f, "lxml")
+        element_set = soup.find_all(attrs={"contextref": True})
+
+        t0 = time.perf_counter()
+        legacy = legacy_parse_elements(element_set, soup)
+        results["legacy"] += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        index = XbrlParser.build_context_index(soup)
+        indexed = XbrlParser.parse_elements(element_set, soup, index)
+        indexed["value"] = XbrlParser.clean_values(
+            indexed["value"], indexed["unit"], indexed["sign"])
+        results["indexed"] += time.perf_counter() - t0
+
+        results["elements"] += len(indexed["name"])
+        if legacy != {key: indexed[key] for key in legacy}:
+            results["mismatches"].append(filepath)
+
+    return results
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("directory",
+                    help="folder of unpacked accounts, eg. "
+                         "Accounts_Monthly_Data-September2019")
+    ap.add_argument("-n", "--sample_size", type=int, default=100,
+                    help="number of filings to sample")
+    ap.add_argument("-s", "--seed", type=int, default=0,
+                    help="random seed for the sample")
+    args = ap.parse_args()
+
+    files, month, year = XbrlExtraction.get_filepaths(args.directory)
+    random.Random(args.seed).shuffle(files)
+    files = files[:args.sample_size]
+
+    results = run_benchmark(files)
+
+    print("Files:            {}".format(len(files)))
+    print("Elements:         {}".format(results["elements"]))
+    print("Legacy lookups:   {:.3f} s".format(results["legacy"]))
+    print("Indexed lookups:  {:.3f} s".format(results["indexed"]))
+    if results["indexed"] > 0:
+        print("Speed-up:         {:.1f}x".format(
+            results["legacy"] / results["indexed"]))
+    if results["mismatches"]:
+        print("Output differs for {} files:".format(
+            len(results["mismatches"])))
+        for filepath in results["mismatches"]:
+            print("  " + filepath)
+        raise SystemExit(1)
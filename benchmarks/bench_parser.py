@@ -0,0 +1,196 @@
+"""
+Throughput benchmark for the XBRL parsing hot path.
+
+Generates a synthetic corpus (see benchmarks.synthetic_corpus) for each
+requested size and times the stages of parsing separately:
+
+    process_account:    reading and parsing each file into a document dict
+    parse_elements:     indexing and parsing the tagged elements of each
+                        file, with the BeautifulSoup object already built
+    flatten_data:       turning the document dicts into the month table
+    parse_directory:    the whole month end to end, over a process pool
+
+Each stage runs in a fresh process so that its peak RSS is its own (for
+parse_directory this is the largest of the parent and its workers).
+Results are reported as files per second, facts per second and peak RSS.
+
+Usage:
+    python -m benchmarks.bench_parser -s small typical large -n 200
+"""
+import argparse
+import multiprocessing as mp
+import resource
+import tempfile
+import time
+
+from bs4 import BeautifulSoup as BS
+
+from benchmarks.synthetic_corpus import SIZES, write_corpus
+from src.data_processing.xbrl_pd_methods import XbrlExtraction
+from src.data_processing.xbrl_parser import XbrlParser
+
+STAGES = ["process_account", "parse_elements", "flatten_data",
+          "parse_directory"]
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """
+    Returns the peak resident set size of this process, or of its largest
+    finished child process.
+
+    Arguments:
+        who:    resource.RUSAGE_SELF or resource.RUSAGE_CHILDREN (int)
+    Returns:
+        rss: peak resident set size in MB (float)
+    Raises:
+        None
+    """
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def time_stage(stage, folder, engine, num_processes):
+    """
+    Runs one stage of the parser over a corpus and times it. Anything the
+    stage needs that is not part of it (eg. the document dicts for
+    flatten_data) is prepared before the clock starts.
+
+    Arguments:
+        stage:          one of STAGES (str)
+        folder:         month folder of the corpus (str)
+        engine:         parse engine passed to process_account (str)
+        num_processes:  size of the parse_directory process pool (int)
+    Returns:
+        seconds:    time taken by the stage (float)
+        peak_rss:   peak resident set size in MB (float)
+    Raises:
+        ValueError: If stage is not one of STAGES
+    """
+    files, month, year = XbrlExtraction.get_filepaths(folder)
+
+    if stage == "process_account":
+        t0 = time.perf_counter()
+        for filepath in files:
+            XbrlParser.process_account(filepath, engine)
+        seconds = time.perf_counter() - t0
+
+    elif stage == "parse_elements":
+        soups = []
+        for filepath in files:
+            with open(filepath) as f:
+                soups.append(BS(f, "lxml"))
+
+        t0 = time.perf_counter()
+        for soup in soups:
+            XbrlParser.parse_elements(
+                soup.find_all(attrs={"contextref": True}), soup)
+        seconds = time.perf_counter() - t0
+
+    elif stage == "flatten_data":
+        docs = [XbrlParser.process_account(filepath, engine)
+                for filepath in files]
+
+        t0 = time.perf_counter()
+        XbrlParser.flatten_data(docs)
+        seconds = time.perf_counter() - t0
+
+    elif stage == "parse_directory":
+        with tempfile.TemporaryDirectory() as out_dir:
+            t0 = time.perf_counter()
+            XbrlParser.parse_directory(folder, out_dir, num_processes,
+                                       engine, incremental=False)
+            seconds = time.perf_counter() - t0
+
+        return seconds, max(peak_rss_mb(),
+                            peak_rss_mb(resource.RUSAGE_CHILDREN))
+
+    else:
+        raise ValueError("stage must be one of {}".format(STAGES))
+
+    return seconds, peak_rss_mb()
+
+
+def stage_process(queue, *args):
+    """
+    Runs time_stage in a child process, which cannot be a pool worker as
+    parse_directory starts a pool of its own.
+
+    Arguments:
+        queue:  queue to put the result of time_stage on (Queue)
+        *args:  arguments of time_stage
+    Returns:
+        None
+    Raises:
+        None
+    """
+    queue.put(time_stage(*args))
+
+
+def run_benchmark(sizes, n_files, engine="soup", num_processes=None,
+                  seed=0):
+    """
+    Times every stage on a fresh corpus of each size.
+
+    Arguments:
+        sizes:          sizes of corpus to run, keys of SIZES (list)
+        n_files:        number of files in each corpus (int)
+        engine:         parse engine passed to process_account (str)
+        num_processes:  size of the parse_directory process pool, all cores
+                        if None (int)
+        seed:           random seed for the corpora (int)
+    Returns:
+        results: one dict per size and stage holding the size, stage,
+                 seconds, files/s, facts/s and peak RSS (list)
+    Raises:
+        None
+    """
+    results = []
+    ctx = mp.get_context("spawn")
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as corpus_dir:
+            folder, facts = write_corpus(corpus_dir, size, n_files, seed)
+
+            for stage in STAGES:
+                queue = ctx.Queue()
+                process = ctx.Process(target=stage_process,
+                                      args=(queue, stage, folder, engine,
+                                            num_processes))
+                process.start()
+                seconds, rss = queue.get()
+                process.join()
+
+                results.append({
+                    "size": size,
+                    "stage": stage,
+                    "seconds": seconds,
+                    "files_per_s": n_files / seconds if seconds else 0.0,
+                    "facts_per_s": facts / seconds if seconds else 0.0,
+                    "peak_rss_mb": rss,
+                })
+
+    return results
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-s", "--sizes", nargs="+", choices=list(SIZES),
+                    default=list(SIZES), help="sizes of corpus to run")
+    ap.add_argument("-n", "--n_files", type=int, default=100,
+                    help="number of files in each corpus")
+    ap.add_argument("-e", "--engine", choices=XbrlParser.parse_engines,
+                    default="soup", help="parse engine")
+    ap.add_argument("-p", "--processes", type=int, default=None,
+                    help="processes for parse_directory, all cores if unset")
+    ap.add_argument("--seed", type=int, default=0,
+                    help="random seed for the corpora")
+    args = ap.parse_args()
+
+    results = run_benchmark(args.sizes, args.n_files, args.engine,
+                            args.processes, args.seed)
+
+    print("{:<8} {:<16} {:>9} {:>10} {:>12} {:>10}".format(
+        "size", "stage", "seconds", "files/s", "facts/s", "peak MB"))
+    for row in results:
+        print("{size:<8} {stage:<16} {seconds:>9.3f} {files_per_s:>10.1f} "
+              "{facts_per_s:>12.0f} {peak_rss_mb:>10.1f}".format(**row))
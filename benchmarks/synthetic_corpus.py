@@ -0,0 +1,250 @@
+"""
+Synthetic corpus of company accounts for the parser benchmarks.
+
+Writes a month folder of iXBRL (html) and XBRL (xml) accounts named as in
+the Companies House monthly downloads, so the files can be fed to any part
+of XbrlParser. Files come in three sizes:
+
+    small:      micro-entity accounts, a few dozen facts
+    typical:    small company accounts, a couple of hundred facts
+    large:      large group accounts, thousands of facts over many contexts
+                and a lot of presentational html
+
+The corpus is generated from a seed rather than stored in the repository,
+so the same arguments always give the same files.
+
+Usage:
+    python -m benchmarks.synthetic_corpus /tmp/corpus -s typical -n 100
+"""
+import argparse
+import os
+import random
+
+# Number of facts, contexts and rows of presentational html in each size
+SIZES = {
+    "small": {"facts": 40, "contexts": 4, "padding": 50},
+    "typical": {"facts": 200, "contexts": 12, "padding": 400},
+    "large": {"facts": 3000, "contexts": 120, "padding": 6000},
+}
+
+# Share of the files written as XBRL rather than iXBRL
+XML_SHARE = 0.1
+
+SCHEMAS = [
+    "http://www.xbrl.org/uk/gaap/core/2009-09-01/uk-gaap-full-2009-09-01.xsd",
+    "http://www.xbrl.org/uk/fr/gaap/ae/2009-09-01/uk-gaap-ae-2009-09-01.xsd",
+    "https://xbrl.frc.org.uk/FRS-102/2014-09-01/FRS-102-2014-09-01.xsd",
+]
+
+NUMERIC_FORMATS = ["", ' format="ixt:numdotdecimal"',
+                   ' format="ixt:numcommadecimal"', ' format="ixt:zerodash"']
+
+FOLDER = "Accounts_Monthly_Data-March2014"
+
+
+def context_xml(i, period_end):
+    """
+    Builds a context, every fourth one with an explicit member.
+
+    Arguments:
+        i:          number of the context (int)
+        period_end: end date of the period (str)
+    Returns:
+        context: the context element (str)
+    Raises:
+        None
+    """
+    segment = ""
+    if i % 4 == 3:
+        segment = ('<xbrli:segment><xbrldi:explicitMember dimension="'
+                   'uk-gaap:EntityOfficersDimension">uk-gaap:Director{}'
+                   '</xbrldi:explicitMember></xbrli:segment>').format(i)
+
+    if i % 2:
+        period = ('<xbrli:startDate>2013-04-01</xbrli:startDate>'
+                  '<xbrli:endDate>{}</xbrli:endDate>').format(period_end)
+    else:
+        period = '<xbrli:instant>{}</xbrli:instant>'.format(period_end)
+
+    return ('<xbrli:context id="c{}"><xbrli:entity><xbrli:identifier '
+            'scheme="http://www.companieshouse.gov.uk/">00000000'
+            '</xbrli:identifier>{}</xbrli:entity><xbrli:period>{}'
+            '</xbrli:period></xbrli:context>\n').format(i, segment, period)
+
+
+def numeric_value(rng, fmt):
+    """
+    Builds the text of a monetary fact as it would be displayed.
+
+    Arguments:
+        rng:    random number generator (random.Random)
+        fmt:    format attribute of the fact (str)
+    Returns:
+        value: text of the fact (str)
+    Raises:
+        None
+    """
+    if "zerodash" in fmt:
+        return "-"
+
+    value = "{:,}".format(rng.randint(0, 5000000))
+    if "numcommadecimal" in fmt:
+        return value.replace(",", ".")
+
+    return value
+
+
+def make_ixbrl(rng, size):
+    """
+    Builds an iXBRL (html) accounts document.
+
+    Arguments:
+        rng:    random number generator (random.Random)
+        size:   one of the keys of SIZES (str)
+    Returns:
+        doc:    the document (str)
+        facts:  number of tagged facts in the document (int)
+    Raises:
+        None
+    """
+    spec = SIZES[size]
+    parts = ['<html xmlns="http://www.w3.org/1999/xhtml" '
+             'xmlns:ix="http://www.xbrl.org/2008/inlineXBRL"><head>'
+             '<title>Accounts</title></head><body>\n'
+             '<div style="display:none"><ix:header><ix:references>'
+             '<link:schemaRef xlink:type="simple" xlink:href="{}"/>'
+             '</ix:references><ix:resources>\n'.format(rng.choice(SCHEMAS))]
+
+    for i in range(spec["contexts"]):
+        parts.append(context_xml(i, "2014-03-31" if i % 3 else "2013-03-31"))
+    parts.append('<xbrli:unit id="GBP"><xbrli:measure>iso4217:GBP'
+                 '</xbrli:measure></xbrli:unit>\n'
+                 '</ix:resources></ix:header></div>\n<table>\n')
+
+    # Spread the presentational rows between the facts
+    padding_per_fact = spec["padding"] // spec["facts"] + 1
+    for i in range(spec["facts"]):
+        context = "c{}".format(rng.randrange(spec["contexts"]))
+
+        if i % 5 == 4:
+            fact = ('<ix:nonNumeric name="uk-gaap:Text{}" contextRef="{}">'
+                    'Note {} to the accounts</ix:nonNumeric>').format(
+                        i % 50, context, i)
+        else:
+            fmt = rng.choice(NUMERIC_FORMATS)
+            sign = ' sign="-"' if i % 7 == 0 else ""
+            scale = ' scale="3"' if i % 11 == 0 else ' scale="0"'
+            fact = ('<ix:nonFraction name="uk-gaap:Item{}" contextRef="{}" '
+                    'unitRef="GBP" decimals="0"{}{}{}>{}</ix:nonFraction>')\
+                .format(i % 300, context, scale, sign, fmt,
+                        numeric_value(rng, fmt))
+
+        parts.append('<tr><td class="label">Line {}</td><td class="value">'
+                     '{}</td></tr>\n'.format(i, fact))
+        for j in range(padding_per_fact):
+            parts.append('<tr><td style="padding-left:12pt;font-size:9pt">'
+                         '&#160;</td><td><span class="s{}">&#160;</span>'
+                         '</td></tr>\n'.format(j % 10))
+
+    parts.append('</table></body></html>\n')
+
+    return "".join(parts), spec["facts"]
+
+
+def make_xbrl(rng, size):
+    """
+    Builds an XBRL (xml) accounts document.
+
+    Arguments:
+        rng:    random number generator (random.Random)
+        size:   one of the keys of SIZES (str)
+    Returns:
+        doc:    the document (str)
+        facts:  number of tagged facts in the document (int)
+    Raises:
+        None
+    """
+    spec = SIZES[size]
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+             '<xbrli:xbrl xmlns:xbrli="http://www.xbrl.org/2003/instance" '
+             'xmlns:link="http://www.xbrl.org/2003/linkbase" '
+             'xmlns:xlink="http://www.w3.org/1999/xlink">\n'
+             '<link:schemaRef xlink:type="simple" xlink:href="{}"/>\n'
+             .format(rng.choice(SCHEMAS))]
+
+    for i in range(spec["contexts"]):
+        parts.append(context_xml(i, "2014-03-31" if i % 3 else "2013-03-31"))
+    parts.append('<xbrli:unit id="GBP"><xbrli:measure>iso4217:GBP'
+                 '</xbrli:measure></xbrli:unit>\n')
+
+    for i in range(spec["facts"]):
+        context = "c{}".format(rng.randrange(spec["contexts"]))
+        if i % 5 == 4:
+            parts.append('<uk-gaap:Text{0} contextRef="{1}">Note {2} to the '
+                         'accounts</uk-gaap:Text{0}>\n'.format(
+                             i % 50, context, i))
+        else:
+            parts.append('<uk-gaap:Item{0} contextRef="{1}" unitRef="GBP" '
+                         'decimals="0">{2}</uk-gaap:Item{0}>\n'.format(
+                             i % 300, context, rng.randint(-50000, 5000000)))
+
+    parts.append('</xbrli:xbrl>\n')
+
+    return "".join(parts), spec["facts"]
+
+
+def write_corpus(directory, size, n_files, seed=0):
+    """
+    Writes a month folder of synthetic accounts.
+
+    Arguments:
+        directory:  folder to write the month folder into (str)
+        size:       one of the keys of SIZES (str)
+        n_files:    number of accounts to write (int)
+        seed:       random seed (int)
+    Returns:
+        folder: path of the month folder (str)
+        facts:  total number of tagged facts in the corpus (int)
+    Raises:
+        ValueError: If size is not one of the keys of SIZES
+    """
+    if size not in SIZES:
+        raise ValueError("size must be one of {}".format(list(SIZES)))
+
+    rng = random.Random(seed)
+    folder = os.path.join(directory, FOLDER)
+    os.makedirs(folder, exist_ok=True)
+
+    facts = 0
+    for i in range(n_files):
+        if rng.random() < XML_SHARE:
+            doc, n = make_xbrl(rng, size)
+            extension = "xml"
+        else:
+            doc, n = make_ixbrl(rng, size)
+            extension = "html"
+
+        filename = "Prod224_{:04d}_{:08d}_20140331.{}".format(
+            i % 10000, 10000000 + i, extension)
+        with open(os.path.join(folder, filename), "w") as f:
+            f.write(doc)
+        facts += n
+
+    return folder, facts
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("directory", help="folder to write the corpus into")
+    ap.add_argument("-s", "--size", choices=list(SIZES), default="typical",
+                    help="size of the accounts")
+    ap.add_argument("-n", "--n_files", type=int, default=100,
+                    help="number of accounts to write")
+    ap.add_argument("--seed", type=int, default=0,
+                    help="random seed for the corpus")
+    args = ap.parse_args()
+
+    folder, facts = write_corpus(args.directory, args.size, args.n_files,
+                                 args.seed)
+    print("Wrote {} files with {} facts to {}".format(args.n_files, facts,
+                                                      folder))
@@ -44,12 +44,21 @@ xbrl_scraper = config.get('xbrl_web_scraper_args', 'xbrl_scraper')
 
 # Arguments for the XBRL web scraper validator
 validator_scraped_dir = config.get('xbrl_validator_args', 'scraped_dir')
+validator_extracted_dir = config.get('xbrl_validator_args', 'extracted_dir',
+                                     fallback='None')
+validator_report_path = config.get('xbrl_validator_args', 'report_path',
+                                   fallback='None')
+validator_check_crc = config.get('xbrl_validator_args', 'check_crc',
+                                 fallback='False')
 
 # Arguments for the XBRL unpacker
 unpacker_source_dir = config.get('xbrl_unpacker_args',
                                  'xbrl_unpacker_file_source_dir')
 unpacker_destination_dir = config.get('xbrl_unpacker_args',
                                       'xbrl_unpacker_file_destination_dir')
+unpacker_num_processes = config.get('xbrl_unpacker_args',
+                                    'xbrl_unpacker_num_processes',
+                                    fallback='None')
 
 # Arguments for the XBRL parser
 xbrl_unpacked_data = config.get('xbrl_parser_args', 'xbrl_parser_data_dir')
@@ -64,6 +73,21 @@ xbrl_parser_process_quarter = config.get('xbrl_parser_args',
                                          'xbrl_parser_process_quarter')
 xbrl_parser_custom_input = config.get('xbrl_parser_args',
                                       'xbrl_parser_custom_input')
+xbrl_parser_engine = config.get('xbrl_parser_args', 'xbrl_parser_engine',
+                                fallback='soup')
+xbrl_parser_num_processes = config.get('xbrl_parser_args',
+                                       'xbrl_parser_num_processes',
+                                       fallback='None')
+xbrl_parser_batch_size = config.getint('xbrl_parser_args',
+                                       'xbrl_parser_batch_size',
+                                       fallback=10)
+xbrl_parser_output_type = config.get('xbrl_parser_args',
+                                     'xbrl_parser_output_type',
+                                     fallback='csv')
+xbrl_parser_partition_by_standard = config.get(
+    'xbrl_parser_args', 'xbrl_parser_partition_by_standard', fallback='False')
+xbrl_parser_from_zip = config.get('xbrl_parser_args', 'xbrl_parser_from_zip',
+                                  fallback='False')
 
 # Arguments for xbrl appender
 xbrl_file_appender_indir = config.get('xbrl_file_appender_args',
@@ -74,12 +98,21 @@ xbrl_file_appender_year = config.get('xbrl_file_appender_args',
                                      'xbrl_file_appender_year')
 xbrl_file_appender_quarter = config.get('xbrl_file_appender_args',
                                         'xbrl_file_appender_quarter')
+xbrl_file_appender_output_type = config.get('xbrl_file_appender_args',
+                                            'xbrl_file_appender_output_type',
+                                            fallback='csv')
 
 #Arguments for xbrl csv cleaner
 xbrl_csv_cleaner_indir = config.get('xbrl_csv_cleaner_args',
                                     'xbrl_csv_cleaner_indir')
 xbrl_csv_cleaner_outdir = config.get('xbrl_csv_cleaner_args',
                                     'xbrl_csv_cleaner_outdir')
+xbrl_csv_cleaner_chunksize = config.get('xbrl_csv_cleaner_args',
+                                        'xbrl_csv_cleaner_chunksize',
+                                        fallback='None')
+xbrl_csv_cleaner_num_processes = config.get('xbrl_csv_cleaner_args',
+                                            'xbrl_csv_cleaner_num_processes',
+                                            fallback='None')
 
 # Arguments for xbrl melt to pivot table
 
@@ -134,6 +167,13 @@ def main():
         validator = XbrlValidatorMethods()
         print("Validating xbrl web scraped data...")
         validator.validate_compressed_files(validator_scraped_dir)
+        if validator_extracted_dir != "None":
+            print("Validating extracted xbrl data...")
+            validator.validate_extracted_archives(
+                validator_scraped_dir, validator_extracted_dir,
+                None if validator_report_path == "None"
+                else validator_report_path,
+                check_crc=validator_check_crc == str(True))
 
     # Execute module xbrl_unpacker
     if xbrl_unpacker == str(True):
@@ -142,34 +182,58 @@ def main():
         print("Reading from directory: ", unpacker_source_dir)
         print("Writing to directory: ", unpacker_destination_dir)
         unpacker = DataProcessing()
-        unpacker.extract_compressed_files(unpacker_source_dir,
-                                          unpacker_destination_dir)
+        unpacker.extract_compressed_files(
+            unpacker_source_dir, unpacker_destination_dir,
+            None if unpacker_num_processes == "None"
+            else int(unpacker_num_processes))
 
     # Execute module xbrl_parser
     if xbrl_parser == str(True):
         print("XBRL parser running...")
 
+        # Use all available cores unless a number has been specified
+        if xbrl_parser_num_processes == "None":
+            num_processes = None
+        else:
+            num_processes = int(xbrl_parser_num_processes)
+
         XbrlParser.parse_files(xbrl_parser_process_quarter,
                                xbrl_parser_process_year,
                                xbrl_unpacked_data,
                                xbrl_parser_custom_input,
                                xbrl_processed_csv,
-                               2)
+                               num_processes,
+                               xbrl_parser_engine,
+                               xbrl_parser_batch_size,
+                               True,
+                               xbrl_parser_output_type,
+                               xbrl_parser_partition_by_standard == str(True),
+                               xbrl_parser_from_zip == str(True))
 
     # Execute module xbrl_csv_cleaner
     if xbrl_csv_cleaner == str(True):
         print("XBRL CSV cleaner running...")
-        XbrlCSVCleaner.clean_parsed_files(xbrl_csv_cleaner_indir,
-                                          xbrl_csv_cleaner_outdir)
+        XbrlCSVCleaner.clean_parsed_files(
+            xbrl_csv_cleaner_indir, xbrl_csv_cleaner_outdir,
+            None if xbrl_csv_cleaner_chunksize == "None"
+            else int(xbrl_csv_cleaner_chunksize),
+            None if xbrl_csv_cleaner_num_processes == "None"
+            else int(xbrl_csv_cleaner_num_processes))
 
     # Append XBRL data on an annual or quarterly basis
     if xbrl_file_appender == str(True):
         appender = XbrlCsvAppender()
         print("XBRL appender running...")
-        appender.merge_files_by_year(xbrl_file_appender_indir,
-                                     xbrl_file_appender_outdir,
-                                     xbrl_file_appender_year,
-                                     xbrl_file_appender_quarter)
+        if xbrl_file_appender_output_type == "parquet":
+            appender.compact_files_by_year(xbrl_file_appender_indir,
+                                           xbrl_file_appender_outdir,
+                                           xbrl_file_appender_year,
+                                           xbrl_file_appender_quarter)
+        else:
+            appender.merge_files_by_year(xbrl_file_appender_indir,
+                                         xbrl_file_appender_outdir,
+                                         xbrl_file_appender_year,
+                                         xbrl_file_appender_quarter)
     """
     # Execute PDF web scraper
     if pdf_web_scraper == str(True):
@@ -98,6 +98,38 @@ class XbrlDataProcessing:
 
 	    return(df)
 
+	def xbrl_dataset_import(fp, year, quarter=None, tags=None):
+		"""
+		This function reads in the data for the chosen year, and optionally
+		quarter and tags, from the parquet dataset written by
+		XbrlCsvAppender.compact_files_by_year and creates a new spark data
+		frame. Spark only reads the partitions of the chosen year and quarter,
+		and skips row groups which do not hold the chosen tags.
+
+		Args:
+			fp: The file path of the parquet dataset
+			year: The year of the data
+			quarter: The quarter of the data
+			tags: The tag, or list of tags, to keep
+
+		Returns:
+			A Spark Data frame
+
+		Raises:
+			None
+		"""
+		df = spark.read.parquet(fp).filter(F.col('year') == int(year))
+
+		if quarter is not None:
+			df = df.filter(F.col('quarter') == int(quarter))
+
+		if tags is not None:
+			if isinstance(tags, str):
+				tags = [tags]
+			df = df.filter(F.col('name').isin(tags))
+
+		return(df)
+
 	def tag_count(df):
 	    """
 	    This function takes a spark data frame as an argument and does a groupby
@@ -1,8 +1,9 @@
 import os
-import csv
+import shutil
 import pandas as pd
 from typing import List
 from datetime import datetime
+from src.data_processing.xbrl_schema import XbrlSchema
 
 
 class XbrlCsvAppender:
@@ -12,68 +13,103 @@ class XbrlCsvAppender:
         self.__init__
 
     @staticmethod
-    def combine_csv(files: List[str], outfile: str):
+    def combine_csv(files: List[str], outfile: str,
+                    buffer_size: int = 1 << 24):
         """
-        Combines all csv files listed in files into a single csv file using
-
-        csv.writer. Unsuitable if files do not have the same format. Faster
-        than the pandas version.
+        Combines all csv files listed in files into a single csv file,
+        keeping only the header of the first file. Files are copied as bytes
+        in large blocks after skipping their header line rather than being
+        parsed, so only suitable for files with the same columns, which is
+        checked first.
 
         Arguments:
-            files:      List of csv files specified by user (list)
-            outfile:    Filepath to write combined csv file (str)
+            files:       List of csv files specified by user (list)
+            outfile:     Filepath to write combined csv file (str)
+            buffer_size: Number of bytes to copy at a time (int)
         Returns:
             None
         Raises:
-            None
+            ValueError: If the files do not all have the same header
         """
 
         print("Processing " + str(len(files)) + " files...")
-        with open(outfile, "w") as w:
-            writer = csv.writer(w, delimiter=',')
+
+        # Check the headers match before writing anything, empty files have
+        # no header and nothing to copy
+        files = [file for file in files if os.path.getsize(file) > 0]
+        headers = []
+        for file in files:
+            with open(file, "rb") as f:
+                headers.append(f.readline().rstrip(b"\r\n"))
+        for file, header in zip(files, headers):
+            if header != headers[0]:
+                raise ValueError("The header of " + file + " does not match "
+                                 "the header of " + files[0])
+
+        with open(outfile, "wb") as w:
             for n, file in enumerate(files):
                 print("Processing " + file + "...")
-                with open(file, "r") as f:
-                    reader = csv.reader(f, delimiter=',')
+                with open(file, "rb") as f:
                     if n > 0:
-                        next(reader)
-                    for row in reader:
-                        writer.writerow(row)
+                        f.readline()
+                        if f.tell() == os.path.getsize(file):
+                            continue
+                    shutil.copyfileobj(f, w, buffer_size)
+
+                    # Start the next file on a new line
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        w.write(b"\n")
 
     @staticmethod
-    def combine_csv_pd(files: List[str], outfile: str):
+    def _add_path(indir: str, files: str):
         """
-        Combines all csv files listed in files into a single csv file using
-        pandas.
+        Returns a list with the paths appended to file names.
 
         Arguments:
-            files:
-            outfile:   Filepath to write combined csv file (str)
+            indir:   List of csv files specified by user (list)
+            files:   Filepath to write combined csv file (str)
         Returns:
             None
         Raises:
             None
         """
+        
+        return [indir+i for i in files]
 
-        combined_csv = pd.concat([pd.read_csv(f, engine='python')
-                                  for f in files])
-        combined_csv.to_csv(outfile, index=False)
+    # Months of each quarter of the year
+    quarter_months = {1: ['January', 'February', 'March'],
+                      2: ['April', 'May', 'June'],
+                      3: ['July', 'August', 'September'],
+                      4: ['October', 'November', 'December']}
 
     @staticmethod
-    def _add_path(indir: str, files: str):
+    def _monthly_files(indir: str, year: int):
         """
-        Returns a list with the paths appended to file names.
+        Returns the monthly csv files of a year in indir, named
+        "YYYY-Month_xbrl_data.csv", sorted by month.
 
         Arguments:
-            indir:   List of csv files specified by user (list)
-            files:   Filepath to write combined csv file (str)
+            indir:   Path of directory to search for csv files in (str)
+            year:    Find all files from this year (int)
         Returns:
-            None
+            files:   (month, filename) of each file (list)
         Raises:
             None
         """
-        
-        return [indir+i for i in files]
+
+        # Get all csv files which contain the year specified in their
+        # filenames
+        files = os.listdir(indir)
+        files = ([i for i in files if i[-4:] == '.csv'
+                  and i[:4].isnumeric() and int(i[:4]) == year])
+
+        # Sort all files by the month contained in the file name
+        files = sorted(files,
+                       key=lambda day: datetime.strptime(
+                           day.split("-")[1].split("_")[0], "%B"))
+
+        return [(f.split("-")[1].split("_")[0], f) for f in files]
 
     @staticmethod
     def merge_files_by_year(indir: str, outdir: str, year: str, quarter=""):
@@ -107,41 +143,21 @@ class XbrlCsvAppender:
             if not os.path.exists(outdir):
                 os.mkdir(outdir)
 
-            # Get all csv files which contain the year specified in their
-            # filenames
-            files = os.listdir(indir)
-            files = ([i for i in files if i[-4:] == '.csv'
-                      and i[:4].isnumeric() and int(i[:4]) == year])
-
-            # Sort all files by the month contained in the file name
-            files = sorted(files,
-                           key=lambda day: datetime.strptime(
-                               day.split("-")[1].split("_")[0], "%B"))
-
-            # Create a list of months based on what quarter in the year has
-            # been specified
-            if quarter == 1:
-                quarter_list = ['January', 'February', 'March']
-            elif quarter == 2:
-                quarter_list = ['April', 'May', 'June']
-            elif quarter == 3:
-                quarter_list = ['July', 'August', 'September']
-            elif quarter == 4:
-                quarter_list = ['October', 'November', 'December']
-            else:
-                quarter_list = []
+            files = XbrlCsvAppender._monthly_files(indir, year)
 
             # Filter out those files not in the specified quarter,
             # if a quarter has been specified
             if quarter != None:
-                files = [f for f in files if f.split("-")[1].split("_")[0]
-                         in quarter_list]
+                quarter_list = XbrlCsvAppender.quarter_months.get(quarter,
+                                                                  [])
+                files = [(month, f) for month, f in files
+                         if month in quarter_list]
                 quarter_str = "q" + str(quarter)
             else:
                 quarter_str = ""
 
             # Prepend input directory to filenames
-            files = [indir + f for f in files]
+            files = [indir + f for month, f in files]
 
             # Combine the csvs
             XbrlCsvAppender.combine_csv(files, outdir + str(year)
@@ -149,6 +165,89 @@ class XbrlCsvAppender:
         else:
             print("Input file path does not exist")
 
+    @staticmethod
+    def compact_files_by_year(indir: str, outdir: str, year: str,
+                              quarter="", row_group_size: int = 100000):
+        """
+        Compacts the monthly csv files of a year, or of a quarter of it, into
+        a parquet dataset in outdir, as an alternative to merging them into a
+        single csv file with merge_files_by_year.
+
+        The dataset is partitioned into "year=YYYY/quarter=N" directories,
+        one parquet file per quarter, which pyarrow, pandas and Spark all
+        read as partition columns. Each quarter is sorted by name and company
+        number, so the row group statistics (min and max) of the name column
+        let readers filtering on tags skip most row groups. A quarter is
+        written to a temporary file which then replaces the existing one.
+
+        Arguments:
+            indir:          Path of directory to search for csv files in (str)
+            outdir:         Path of the parquet dataset (str)
+            year:           Find all files from this year (str)
+            quarter:        Only compact files from this quarter (int)
+            row_group_size: maximum number of rows in each row group (int)
+        Returns:
+            None
+        Raises:
+            None
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        year = int(year)
+        if quarter in ["None", "", None]:
+            quarters = list(XbrlCsvAppender.quarter_months)
+        else:
+            quarters = [int(quarter)]
+
+        if not os.path.exists(indir):
+            print("Input file path does not exist")
+            return None
+
+        files = XbrlCsvAppender._monthly_files(indir, year)
+        crn_col = XbrlSchema.crn_col
+
+        for quarter in quarters:
+            quarter_files = [os.path.join(indir, f) for month, f in files
+                             if month in XbrlCsvAppender.quarter_months[quarter]]
+            if not quarter_files:
+                continue
+            print("Compacting {} files for {} q{}...".format(
+                len(quarter_files), year, quarter))
+
+            df = pd.concat([XbrlSchema.read_csv(f) for f in quarter_files],
+                           ignore_index=True)
+
+            # Concatenating categoricals with different categories gives
+            # objects. Company numbers sort in the same order as integers
+            df = XbrlSchema.apply(df)
+            df = df.sort_values(['name', crn_col], kind='mergesort',
+                                ignore_index=True)
+
+            # Written as the same text as the csv files, without the helper
+            # columns of the typed schema, to be read easily by any reader.
+            # Columns are still dictionary encoded in the file, but readers
+            # only skip row groups by their statistics for plain string
+            # columns. Missing categories stay missing rather than "nan"
+            df = XbrlSchema.to_text(df)
+            df[XbrlSchema.category_cols] = \
+                df[XbrlSchema.category_cols].astype(object)
+
+            partition = os.path.join(outdir, "year={}".format(year),
+                                     "quarter={}".format(quarter))
+            os.makedirs(partition, exist_ok=True)
+            output_path = os.path.join(partition, "part-0.parquet")
+
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False),
+                           output_path + ".tmp",
+                           row_group_size=row_group_size,
+                           use_dictionary=XbrlSchema.category_cols
+                           + [crn_col],
+                           write_statistics=True,
+                           coerce_timestamps='us',
+                           allow_truncated_timestamps=True)
+            os.replace(output_path + ".tmp", output_path)
+
 if __name__ == '__main__':
 
     indir = '/shares/data/20200519_companies_house_accounts/xbrl_parsed_data/'
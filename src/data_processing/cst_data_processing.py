@@ -1,8 +1,12 @@
 #import cv2
-from os import listdir, mkdir
-from os.path import isfile, join, exists, splitext
+from os import listdir, makedirs
+from os.path import basename, isdir, isfile, join, exists, splitext
+from src.data_processing.xbrl_manifest import XbrlManifest
+import multiprocessing as mp
+import os
 import random
 import zipfile
+import zlib
 import shutil
 
 
@@ -140,81 +144,241 @@ class DataProcessing:
                 )
 
     @staticmethod
-    def extract_compressed_files(file_source, file_dest):
+    def extract_compressed_files(file_source, file_dest, num_processes=None,
+                                 chunk_size=500):
         """
         Extracts .zip files from a given directory or filename
         to a given file directory.
+
+        Archives are split into chunks of members which are extracted in
+        parallel by a pool of processes, the CRC32 of each member being
+        checked as it is written. Each archive extracted is recorded in a
+        manifest (extracted_files.csv) in file_dest with its size, mtime and
+        a CRC32 of its listing, and archives which have not changed since
+        they were last extracted are skipped. Archives which cannot be read
+        are recorded as failed without stopping the others being extracted.
+
         Arguments:
             file_source: source of files of interest, either a filename
                          or a directory (str)
             file_dest: destination directory to save extracted files to (str)
+            num_processes: number of processes to extract with, defaults to
+                           all available cores (int)
+            chunk_size: number of members extracted by a process at a time
+                        (int)
         Returns:
             None
         Raises:
             None
         """
-        if exists(file_dest):
-            if exists(file_source):
-
-                # Retrieve a list of all zip files that have been extracted
-                # If no such list exists, create one
-                if exists(file_dest + "/extracted_files.txt"):
-                    extracted_files_txt = open(
-                        file_dest + "/extracted_files.txt", "r")
-                    list_extracted_files = [f.rstrip("\n") for f in
-                                            extracted_files_txt]
-                    extracted_files_txt.close()
-                else:
-                    list_extracted_files = []
-                extracted_files_txt = open(file_dest + "/extracted_files.txt",
-                                           "a+")
-
-                if isfile(file_source):
-                    files = [file_source]
-                else:
-                    # Retrieve list of all files present in the directory
-                    # (not folders)
-                    files = [file_source + f for f in listdir(file_source)]
-                    files = [f for f in files if isfile(f)]
-
-                # Filter out all files from 'files' that have already been
-                # extracted
-                files = [f for f in files if f not in list_extracted_files]
-
-                print("Extracting files...")
-                for file in files:
-                    if file.endswith('.zip'):
-
-                        directory = file_dest + "/" + \
-                                    file.split('.')[0].split("/")[-1]
-
-                        # If the directory for the zip contents exists already,
-                        # delete it just in case a previous attempt at
-                        # extraction was incomplete. Otherwise, create a new
-                        # directory
-                        if exists(directory):
-                            shutil.rmtree(directory)
-                        else:
-                            mkdir(directory)
-
-                        # Perform the extraction
-                        with zipfile.ZipFile(file, 'r') as zip_ref:
-                            zip_ref.extractall(directory)
-                        print("Extracted files from " + file)
-
-                        # Add extracted filename to file list
-                        extracted_files_txt.write(file + "\n")
-                    else:
-                        print("File extension " + file.split('.')[
-                            1] + " not supported")
-                        print("Unable to extract file " + file)
-
-                extracted_files_txt.close()
-                print("Extraction complete")
+        if not exists(file_dest):
+            print("Destination directory not valid!: " + file_dest)
+            return None
+        if not exists(file_source):
+            print("File or directory not found: " + file_source)
+            return None
+
+        if isfile(file_source):
+            files = [file_source]
+        else:
+            # Retrieve list of all files present in the directory
+            # (not folders)
+            files = [join(file_source, f) for f in sorted(listdir(file_source))]
+            files = [f for f in files if isfile(f)]
+
+        for file in files:
+            if not file.endswith('.zip'):
+                print("File extension " + splitext(file)[1]
+                      + " not supported")
+                print("Unable to extract file " + file)
+        files = [f for f in files if f.endswith('.zip')]
+
+        # Filter out all archives that have already been extracted and have
+        # not changed since. An archive which cannot be read is recorded as
+        # failed, and the rest are still extracted
+        manifest_path = join(file_dest, "extracted_files.csv")
+        manifest = XbrlManifest.load(manifest_path)
+        archives = {}
+        entries = []
+        for file in files:
+            previous = manifest.get(file)
+            try:
+                entry = DataProcessing.archive_entry(file, "extracted",
+                                                     previous)
+            except (zipfile.BadZipFile, OSError) as e:
+                print("Unable to read archive {}: {}".format(file, e))
+                entries.append(DataProcessing.failed_entry(file))
+                continue
+            directory = join(file_dest, splitext(basename(file))[0])
+            if previous is not None and previous['status'] == "extracted" \
+                    and previous['checksum'] == entry['checksum'] \
+                    and isdir(directory):
+                continue
+            archives[file] = (entry, directory)
+
+        print("Extracting files from {} archives...".format(len(archives)))
+
+        # Split each archive into chunks of members, clearing out anything
+        # left by a previous attempt at extracting it first
+        tasks = []
+        for file, (entry, directory) in list(archives.items()):
+            try:
+                with zipfile.ZipFile(file) as zf:
+                    members = [info.filename for info in zf.infolist()]
+            except (zipfile.BadZipFile, OSError) as e:
+                print("Unable to read archive {}: {}".format(file, e))
+                entries.append(DataProcessing.failed_entry(file))
+                del archives[file]
+                continue
+
+            if exists(directory):
+                shutil.rmtree(directory)
+            makedirs(directory)
+
+            for i in range(0, len(members), chunk_size):
+                tasks.append((file, directory, members[i:i + chunk_size]))
+
+        failures = {file: [] for file in archives}
+        with mp.Pool(processes=num_processes) as pool:
+            for file, failed in pool.imap_unordered(
+                    DataProcessing.extract_members, tasks):
+                failures[file].extend(failed)
+
+        for file, (entry, directory) in archives.items():
+            if failures[file]:
+                entry['status'] = "failed"
+                print("Failed to extract {} members of {}:".format(
+                    len(failures[file]), file))
+                for member, error in failures[file]:
+                    print("  " + member + ": " + error)
             else:
-                print("File or directory not found: " + file_source)
+                print("Extracted files from " + file)
+            entries.append(entry)
+
+        XbrlManifest.record(manifest_path, entries)
+        print("Extraction complete")
+
+    @staticmethod
+    def archive_entry(archive, status, previous=None):
+        """
+        Builds the manifest entry of a zip archive. The checksum is a CRC32
+        of the name, size and CRC32 of every member, read from the central
+        directory, so the archive does not have to be read in full. If the
+        size and mtime of the archive match a previous entry which was
+        extracted, its checksum is taken from that entry without opening the
+        archive.
+
+        Arguments:
+            archive:  path of the zip archive (str)
+            status:   extraction status, "extracted" or "failed" (str)
+            previous: entry of the archive in the manifest, if any (dict)
+        Returns:
+            entry: path, size, mtime, checksum and status of the archive
+                   (dict)
+        Raises:
+            OSError: If the archive cannot be read
+        """
+        stat = os.stat(archive)
+
+        if previous is not None and previous['status'] == "extracted" \
+                and previous['size'] == stat.st_size \
+                and previous['mtime'] == stat.st_mtime:
+            crc = previous['checksum']
         else:
-            print("Destination directory not valid!: " + file_dest)
+            crc = 0
+            with zipfile.ZipFile(archive) as zf:
+                for info in zf.infolist():
+                    crc = zlib.crc32("{}:{}:{:08x}\n".format(
+                        info.filename, info.file_size, info.CRC).encode(),
+                        crc)
+            crc = "{:08x}".format(crc)
+
+        return {'path': archive, 'size': stat.st_size,
+                'mtime': stat.st_mtime, 'checksum': crc, 'status': status}
+
+    @staticmethod
+    def failed_entry(archive):
+        """
+        Builds the manifest entry of a zip archive which could not be read,
+        so that it is tried again on the next run.
+
+        Arguments:
+            archive:  path of the zip archive (str)
+        Returns:
+            entry: path, size, mtime, checksum and status of the archive
+                   (dict)
+        Raises:
+            None
+        """
+        try:
+            stat = os.stat(archive)
+            size, mtime = stat.st_size, stat.st_mtime
+        except OSError:
+            size, mtime = -1, 0.0
+
+        return {'path': archive, 'size': size, 'mtime': mtime,
+                'checksum': "", 'status': "failed"}
+
+    @staticmethod
+    def extract_members(task):
+        """
+        Extracts some of the members of a zip archive, streaming each one to
+        a temporary file while calculating its CRC32 and only moving it into
+        place if the CRC32 matches the archive. Run by each worker process
+        of extract_compressed_files.
+
+        Arguments:
+            task: path of the archive, directory to extract to and list of
+                  member names to extract (tuple)
+        Returns:
+            archive: path of the archive (str)
+            failed:  name and error of each member that could not be
+                     extracted (list)
+        Raises:
+            None
+        """
+        archive, directory, members = task
+        failed = []
+
+        try:
+            zf = zipfile.ZipFile(archive)
+        except (zipfile.BadZipFile, OSError) as e:
+            return archive, [(member, str(e)) for member in members]
+
+        with zf:
+            for member in members:
+                info = zf.getinfo(member)
+
+                # Never write outside of the directory
+                path = os.path.normpath(join(directory, member))
+                if not path.startswith(os.path.normpath(directory) + os.sep):
+                    failed.append((member, "unsafe path"))
+                    continue
+
+                if info.is_dir():
+                    makedirs(path, exist_ok=True)
+                    continue
+                makedirs(os.path.dirname(path), exist_ok=True)
+
+                try:
+                    crc = 0
+                    with zf.open(info) as src, open(path + ".part",
+                                                    "wb") as dst:
+                        for block in iter(lambda: src.read(1 << 20), b""):
+                            crc = zlib.crc32(block, crc)
+                            dst.write(block)
+
+                    if crc != info.CRC:
+                        raise zipfile.BadZipFile("Bad CRC-32")
+                    os.replace(path + ".part", path)
+
+                except Exception as e:
+                    failed.append((member, str(e)))
+                    if exists(path + ".part"):
+                        os.remove(path + ".part")
+
+        return archive, failed
+
 
 def get_file_details(files, n_objects=1, x_coord=0, y_coord=0):
     """
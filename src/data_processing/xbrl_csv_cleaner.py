@@ -1,6 +1,11 @@
 import pandas as pd
 import csv
+import multiprocessing as mp
 import os
+import re
+import time
+from functools import partial
+from src.data_processing.xbrl_schema import XbrlSchema
 
 class XbrlCSVCleaner:
     """
@@ -11,6 +16,18 @@ class XbrlCSVCleaner:
     def __init__(self):
         self.__init__
 
+    # Characters removed from the value column, all in one pass
+    unwanted_chars = re.compile(r'  |"|\n')
+
+    # Columns of the cleaned table, in order
+    wanted_cols = ['date', 'name', 'unit', 'value', 'scale', 'decimals',
+                   'format', 'doc_name', 'doc_type',
+                   'doc_upload_date', 'arc_name', 'parsed',
+                   'doc_balancesheetdate',
+                   'doc_companieshouseregisterednumber',
+                   'doc_standard_type',
+                   'doc_standard_date', 'doc_standard_link', ]
+
     @staticmethod
     def col_cast(df, col, col_type):
         """
@@ -29,7 +46,8 @@ class XbrlCSVCleaner:
         """
 
         # can include all standard types
-        allowed_types = ['str', 'datetime64[ns]', 'int64', 'int32', 'bool']
+        allowed_types = ['str', 'datetime64[ns]', 'int64', 'int32', 'bool',
+                         'category']
 
         # convert col to list if string
         if type(col) is str:
@@ -47,94 +65,208 @@ class XbrlCSVCleaner:
         return df
 
     @staticmethod
-    def parsed_csv_clean(import_path, export_path=''):
+    def clean_chunk(df):
+        """
+        Cleans a dataframe of parsed xbrl data, or a chunk of one, removing
+        unwanted characters from the value column and casting the columns to
+        the types of XbrlSchema.
+
+        Arguments:
+            df: A dataframe of parsed xbrl data
+        Returns:
+            df: The cleaned dataframe, with the typed schema
+        Raises:
+            None
+        """
+        # limit to desired columns, files parsed before the scale, decimals
+        # and format columns were added hold "NA" for them
+        df = df.reindex(columns=XbrlCSVCleaner.wanted_cols, fill_value='NA')
+
+        # remove unwanted chars
+        df['value'] = df['value'].astype(str).str.replace(
+            XbrlCSVCleaner.unwanted_chars, '', regex=True)
+
+        return XbrlSchema.apply(df)
+
+    @staticmethod
+    def parsed_csv_clean(import_path, export_path='', chunksize=None):
         """
         cleans a parsed xbrl csv file (from the xbrl_parsed_data storage)
         removing the index, removing unwanted string character from the value
         column and casting string and date(time) columns.
 
+        If a chunksize is given the file is streamed, reading, cleaning and
+        appending chunksize rows at a time to a temporary file which then
+        replaces the export file, so memory use does not depend on the size
+        of the file.
+
         Arguments:
             import_path: the filepath to the parsed xbrl csv file
             export_path: the filepath to export the cleaned csv file
+            chunksize:   number of rows to clean at a time, or None to clean
+                         the whole file at once
         Returns:
-            None
+            rows: the number of rows cleaned (int)
         Raises:
             None
         """
+        # export cleaned dataframe
+        if export_path == '':
+            export_path = import_path
 
-        # parameters
-        unwanted_chars = ['  ', '"', '\n']
-        str_cols = ['name', 'unit', 'value', 'doc_name', 'doc_type',
-                    'arc_name',
-                    'doc_companieshouseregisterednumber', 'doc_standard_type',
-                    'doc_standard_link', ]
-        date_cols = ['date', 'doc_balancesheetdate',
-                     'doc_standard_date', 'doc_upload_date']
-
-        wanted_cols = ['date', 'name', 'unit', 'value', 'doc_name', 'doc_type',
-                       'doc_upload_date', 'arc_name', 'parsed',
-                       'doc_balancesheetdate',
-                       'doc_companieshouseregisterednumber',
-                       'doc_standard_type',
-                       'doc_standard_date', 'doc_standard_link', ]
-
-        # turn all to string for now - redo when dates sorted (March 2015
-        # example)
-        str_cols = str_cols + date_cols
-
-        # import data
-        df = pd.read_csv(import_path, lineterminator="\n")
+        # import data, only the desired columns, read as strings or straight
+        # into categoricals so that every chunk is read the same way
+        chunks = pd.read_csv(import_path, lineterminator="\n",
+                             usecols=lambda c: c in XbrlCSVCleaner.wanted_cols,
+                             dtype=XbrlSchema.read_dtypes(),
+                             keep_default_na=False, chunksize=chunksize)
+        if chunksize is None:
+            chunks = [chunks]
 
-        # remove unwanted chars
-        for char in unwanted_chars:
-            df.value = df.value.str.replace(char, '')
+        # write to csv with no index, tab deliminated, and quoting all non
+        # numeric data. Written to a temporary file which then replaces the
+        # export file, so a partly written file is never left in its place
+        # and the export file may be the file being read
+        print('Exporting cleaned dataframe to {}'.format(export_path))
+        temp_path = '{}.{}.tmp'.format(export_path, os.getpid())
+        rows = 0
+        try:
+            for df in chunks:
+                XbrlSchema.to_text(XbrlCSVCleaner.clean_chunk(df)).to_csv(
+                    temp_path, mode='w' if rows == 0 else 'a',
+                    header=rows == 0, index=False, sep="\t",
+                    lineterminator='\n', quotechar='"',
+                    quoting=csv.QUOTE_NONNUMERIC)
+                rows += len(df)
 
-        # limit to desired columns
-        df = df[wanted_cols]
+            # a file with no rows still gets its header
+            if rows == 0:
+                XbrlSchema.to_text(XbrlCSVCleaner.clean_chunk(
+                    pd.DataFrame())).to_csv(
+                    temp_path, index=False, sep="\t", lineterminator='\n')
+            os.replace(temp_path, export_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
 
-        # cast columns
-        df = XbrlCSVCleaner.col_cast(df, str_cols, 'str')
-        # df = col_cast(df, date_cols, 'datetime64[ns]')
+        return rows
 
-        # export cleaned dataframe
-        if export_path == '':
-            export_path = import_path
-        # write to csv with no index, tab deliminated, and quoting all non
-        # numeric data
+    @staticmethod
+    def read_cleaned(filepath):
+        """
+        Reads a cleaned xbrl csv file, as written by parsed_csv_clean, with
+        the typed schema of XbrlSchema.
 
-        print('Exporting cleaned dataframe to {}'.format(export_path))
-        df.to_csv(export_path, index=False, sep="\t", line_terminator='\n',
-                  quotechar='"', quoting=csv.QUOTE_NONNUMERIC)
+        Arguments:
+            filepath: the filepath to the cleaned xbrl csv file
+        Returns:
+            df: The cleaned dataframe, with the typed schema
+        Raises:
+            None
+        """
+        return XbrlSchema.read_csv(filepath, sep="\t", lineterminator="\n")
+
+    @staticmethod
+    def clean_file(file, import_directory, export_directory, chunksize=None,
+                   skip_newer=True):
+        """
+        Cleans a parsed xbrl csv file with parsed_csv_clean, unless its
+        cleaned file is newer than it, timing how long it takes. Run by each
+        worker process of clean_parsed_files.
 
-        return None
+        Arguments:
+            file:             name of the .csv file to be cleaned
+            import_directory: Directory containing the file
+            export_directory: Directory where the cleaned file should be
+                              saved
+            chunksize:        number of rows to clean at a time, or None to
+                              clean the whole file at once
+            skip_newer:       whether to skip the file if its cleaned file is
+                              newer than it
+        Returns:
+            result: the file, status ("cleaned", "skipped" or "failed"),
+                    rows, seconds taken and error of the clean (dict)
+        Raises:
+            None
+        """
+        import_path = os.path.join(import_directory, file)
+        export_path = os.path.join(export_directory, file)
+        result = {'file': file, 'status': 'failed', 'rows': 0,
+                  'seconds': 0.0, 'error': ''}
+
+        # Files cleaned in place are always cleaned again
+        if skip_newer and os.path.exists(export_path) \
+                and not os.path.samefile(import_path, export_path) \
+                and os.path.getmtime(export_path) \
+                >= os.path.getmtime(import_path):
+            result['status'] = 'skipped'
+            return result
+
+        start = time.time()
+        try:
+            result['rows'] = XbrlCSVCleaner.parsed_csv_clean(
+                import_path, export_path, chunksize)
+            result['status'] = 'cleaned'
+        except Exception as e:
+            result['error'] = repr(e)
+        result['seconds'] = time.time() - start
+
+        return result
 
     @staticmethod
-    def clean_parsed_files(import_directory, export_directory):
+    def clean_parsed_files(import_directory, export_directory,
+                           chunksize=None, num_processes=None,
+                           skip_newer=True):
         """
         Cleans all .csv files in a given directory using methods in the
-        XbrlCSVCleaner class and saves the processed files in a given directory
+        XbrlCSVCleaner class and saves the processed files in a given
+        directory. Files are cleaned by a pool of worker processes, each
+        file by a single worker, and the rows and time taken for each file
+        are reported as it finishes.
 
         Arguments:
             import_directory: Directory containing .csv files to be cleaned
             export_directory: Directory where cleaned files should be saved
+            chunksize:        number of rows to clean at a time, or None to
+                              clean each file at once
+            num_processes:    number of files to clean at once, defaults to
+                              all available cores
+            skip_newer:       whether to skip files whose cleaned file is
+                              newer than them
         Returns:
-            None
+            results: the result of clean_file for each file (list)
         Raises:
             None
         """
-        #path = '/shares/xbrl_parsed_data/'
-        # Generate a list of files to be cleaned
-        os.chdir(import_directory)
-        xbrl_files = os.listdir(import_directory)
-        xbrl_files = [csv for csv in xbrl_files if csv.endswith('.csv')]
+        if num_processes is None:
+            num_processes = os.cpu_count()
+
+        # Generate a list of files to be cleaned, largest first so that a
+        # big month does not hold up the end of the run
+        xbrl_files = [file for file in os.listdir(import_directory)
+                      if file.endswith('.csv')]
+        xbrl_files.sort(key=lambda file: os.path.getsize(
+            os.path.join(import_directory, file)), reverse=True)
 
         # Clean the parsed files from the relevant list
-        for file in xbrl_files:
-            print('Exporting {}......'.format(file))
-            XbrlCSVCleaner.parsed_csv_clean(import_directory + file,
-                                            export_directory + file)
-            print('Successfully exported {}!'.format(file))
-        return None
+        results = []
+        with mp.Pool(processes=num_processes) as pool:
+            for result in pool.imap_unordered(
+                    partial(XbrlCSVCleaner.clean_file,
+                            import_directory=import_directory,
+                            export_directory=export_directory,
+                            chunksize=chunksize, skip_newer=skip_newer),
+                    xbrl_files):
+                results.append(result)
+                print('{}: {} {} rows in {:.1f}s {}'.format(
+                    result['file'], result['status'], result['rows'],
+                    result['seconds'], result['error']))
+
+        print('{} files cleaned, {} skipped, {} failed'.format(
+            *[sum(result['status'] == status for result in results)
+              for status in ['cleaned', 'skipped', 'failed']]))
+
+        return results
 
 if __name__ == "__main__":
     pd.set_option('display.max_colwidth', None)
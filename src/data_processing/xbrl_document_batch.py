@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+class XbrlDocumentBatch:
+    """
+    Compact, columnar store of the elements parsed from a batch of documents.
+
+    Elements are held as typed columns: strings which repeat a lot (names,
+    units, dates and attributes) as categoricals, and values as a float64
+    column with the text of the values which are not numeric alongside.
+    Each element carries the integer doc_id of its document, whose metadata
+    is held once in a table of documents. The batch is only expanded into
+    the long-thin table, repeating each document's metadata for each of its
+    elements, when it is written out.
+    """
+
+    # Columns of the elements held as categoricals
+    fact_category_cols = ['date', 'name', 'unit', 'scale', 'decimals',
+                          'format']
+
+    def __init__(self, facts, docs, files=None):
+        """
+        Arguments:
+            facts:  elements, with doc_id, value_num, value_text and
+                    fact_category_cols columns (dataframe)
+            docs:   metadata of the documents, the row number of each being
+                    its doc_id (dataframe)
+            files:  manifest entries of the files in the batch (list)
+        """
+        self.facts = facts
+        self.docs = docs
+        self.files = [] if files is None else files
+
+    @staticmethod
+    def from_columns(elements, numbers, numeric, meta, counts,
+                     files=None):
+        """
+        Builds a batch from lists of the elements of its documents.
+
+        Arguments:
+            elements:   element column lists, including value (dict)
+            numbers:    numeric value of each element (numpy float64 array)
+            numeric:    True where the element's value is numeric (numpy bool
+                        array)
+            meta:       document metadata column lists (dict)
+            counts:     number of elements of each document (list)
+            files:      manifest entries of the files in the batch (list)
+        Returns:
+            batch: the batch of documents (XbrlDocumentBatch)
+        Raises:
+            None
+        """
+        numbers = np.asarray(numbers, dtype=np.float64)
+        facts = pd.DataFrame({
+            'doc_id': np.repeat(np.arange(len(counts), dtype=np.int32),
+                                np.asarray(counts, dtype=np.int64))})
+
+        for col in XbrlDocumentBatch.fact_category_cols:
+            facts[col] = pd.Categorical(
+                np.array(elements[col], dtype=object).astype(str))
+
+        numeric = np.asarray(numeric, dtype=bool)
+        facts['value_num'] = np.where(numeric, numbers, np.nan)
+
+        # Keep the text of the non-numeric values only, without unwanted
+        # characters
+        text = pd.Series(elements['value'], dtype=object)
+        text = text[~numeric].astype(str).str.replace(r'  |"|\n', '',
+                                                      regex=True)
+        facts['value_text'] = text.reindex(facts.index)
+
+        docs = pd.DataFrame(meta, columns=list(meta))
+
+        return XbrlDocumentBatch(facts, docs, files)
+
+    @property
+    def n_docs(self):
+        return len(self.docs)
+
+    @property
+    def n_facts(self):
+        return len(self.facts)
+
+    @staticmethod
+    def concat(batches):
+        """
+        Concatenates batches, renumbering the documents of each batch after
+        those of the batches before it. Categorical columns are combined
+        without converting them back to strings.
+
+        Arguments:
+            batches: list of batches with the same columns (list)
+        Returns:
+            batch: a single batch holding all the documents
+                   (XbrlDocumentBatch)
+        Raises:
+            ValueError: If there are no batches
+        """
+        if not batches:
+            raise ValueError("There are no batches to concatenate")
+
+        # Batches of files which all failed to open hold no documents, but
+        # the entries of their files are still kept
+        files = [entry for batch in batches for entry in batch.files]
+        batches = [batch for batch in batches if batch.n_docs] \
+            or batches[:1]
+
+        offsets = np.cumsum([0] + [batch.n_docs for batch in batches[:-1]])
+
+        facts = {'doc_id': np.concatenate(
+            [batch.facts['doc_id'].to_numpy() + offset
+             for batch, offset in zip(batches, offsets)])
+            .astype(np.int32)}
+        for col in XbrlDocumentBatch.fact_category_cols:
+            facts[col] = union_categoricals(
+                [batch.facts[col] for batch in batches])
+        for col in ['value_num', 'value_text']:
+            facts[col] = np.concatenate(
+                [batch.facts[col].to_numpy() for batch in batches])
+
+        docs = pd.concat([batch.docs for batch in batches],
+                         ignore_index=True)
+
+        return XbrlDocumentBatch(pd.DataFrame(facts), docs, files)
+
+    def to_frame(self):
+        """
+        Expands the batch into the long-thin table of elements, with the
+        value of each element as a string and the metadata of its document
+        repeated alongside it.
+
+        Arguments:
+            None
+        Returns:
+            df: A dataframe with a row for each element (dataframe)
+        Raises:
+            None
+        """
+        df = pd.DataFrame(index=self.facts.index)
+        for col in XbrlDocumentBatch.fact_category_cols:
+            df[col] = self.facts[col].astype(str)
+
+        value_text = self.facts['value_text']
+        df['value'] = value_text.where(value_text.notna(),
+                                       self.facts['value_num'].astype(str))
+
+        doc_ids = self.facts['doc_id'].to_numpy()
+        for col in self.docs.columns:
+            df[col] = self.docs[col].to_numpy()[doc_ids]
+
+        return df
@@ -0,0 +1,227 @@
+from datetime import datetime
+import hashlib
+import os
+import pandas as pd
+
+
+class XbrlManifest:
+    """
+    Class to keep a manifest of the files parsed for a month of accounts, so
+    that a rerun of the parser only has to parse new or changed files.
+    """
+
+    def __init__(self):
+        self.__init__
+
+    # Columns of the manifest file. The checksum is the SHA1 of a file, or
+    # the CRC32 of a member of a zip archive
+    manifest_cols = ['path', 'size', 'mtime', 'checksum', 'status']
+
+    @staticmethod
+    def manifest_path(processed_path, folder_month, folder_year):
+        """
+        Returns the path of the manifest for a month of accounts, stored
+        alongside the parsed csv files.
+
+        Arguments:
+            processed_path: directory where parsed files are saved (str)
+            folder_month:   month of the accounts (str)
+            folder_year:    year of the accounts (str)
+        Returns:
+            path of the manifest file (str)
+        Raises:
+            None
+        """
+        return processed_path + "/" + folder_year + "-" + folder_month \
+            + "_manifest.csv"
+
+    @staticmethod
+    def file_hash(filepath, block_size=1 << 20):
+        """
+        Calculates the SHA1 hash of the contents of a file.
+
+        Arguments:
+            filepath:   path of the file to hash (str)
+            block_size: number of bytes to read at a time (int)
+        Returns:
+            hex digest of the file contents (str)
+        Raises:
+            OSError: If the file cannot be read
+        """
+        sha1 = hashlib.sha1()
+        with open(filepath, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                sha1.update(block)
+
+        return sha1.hexdigest()
+
+    @staticmethod
+    def file_entry(filepath, status):
+        """
+        Builds the manifest entry of a file.
+
+        Arguments:
+            filepath:   path of the file (str)
+            status:     parse status of the file, "parsed" or "failed" (str)
+        Returns:
+            entry: path, size, mtime, checksum and status of the file
+                   (dict)
+        Raises:
+            None
+        """
+        try:
+            stat = os.stat(filepath)
+            size, mtime = stat.st_size, stat.st_mtime
+            checksum = XbrlManifest.file_hash(filepath)
+        except OSError:
+            size, mtime, checksum, status = -1, 0.0, "", "failed"
+
+        return {'path': filepath, 'size': size, 'mtime': mtime,
+                'checksum': checksum, 'status': status}
+
+    @staticmethod
+    def member_entry(info, status):
+        """
+        Builds the manifest entry of a member of a zip archive. The CRC32
+        stored in the archive stands in for the hash of the contents, so
+        members do not have to be read to check whether they have changed.
+
+        Arguments:
+            info:       the member's entry in the archive (zipfile.ZipInfo)
+            status:     parse status of the member, "parsed" or "failed"
+                        (str)
+        Returns:
+            entry: path, size, mtime, checksum and status of the member
+                   (dict)
+        Raises:
+            None
+        """
+        return {'path': info.filename, 'size': info.file_size,
+                'mtime': float(datetime(*info.date_time).timestamp()),
+                'checksum': "{:08x}".format(info.CRC), 'status': status}
+
+    @staticmethod
+    def load(manifest_path):
+        """
+        Reads a manifest, keeping the latest entry recorded for each file.
+
+        Arguments:
+            manifest_path: path of the manifest file (str)
+        Returns:
+            manifest: dictionary of manifest entries keyed by path (dict)
+        Raises:
+            None
+        """
+        if not os.path.exists(manifest_path):
+            return {}
+
+        df = pd.read_csv(manifest_path,
+                         dtype={'path': str, 'checksum': str, 'sha1': str},
+                         keep_default_na=False, float_precision='round_trip')
+        # Manifests written before the column was renamed
+        df = df.rename(columns={'sha1': 'checksum'})
+        df = df.drop_duplicates('path', keep='last')
+
+        return {row['path']: row for row in df.to_dict(orient='records')}
+
+    @staticmethod
+    def record(manifest_path, entries):
+        """
+        Appends entries to a manifest, creating it if needed. Later entries
+        for the same file take precedence when the manifest is loaded.
+
+        Arguments:
+            manifest_path: path of the manifest file (str)
+            entries:       list of entries from file_entry (list)
+        Returns:
+            None
+        Raises:
+            None
+        """
+        if not entries:
+            return None
+
+        df = pd.DataFrame(entries, columns=XbrlManifest.manifest_cols)
+        df.to_csv(manifest_path, mode='a', index=False,
+                  header=not os.path.exists(manifest_path))
+
+    @staticmethod
+    def compact(manifest_path, files):
+        """
+        Rewrites a manifest with a single entry per file, dropping files which
+        are no longer in the month.
+
+        Arguments:
+            manifest_path: path of the manifest file (str)
+            files:         list of filepaths currently in the month (list)
+        Returns:
+            None
+        Raises:
+            None
+        """
+        manifest = XbrlManifest.load(manifest_path)
+        entries = [manifest[f] for f in files if f in manifest]
+
+        df = pd.DataFrame(entries, columns=XbrlManifest.manifest_cols)
+        df.to_csv(manifest_path + ".tmp", index=False)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    @staticmethod
+    def stale_files(files, manifest):
+        """
+        Finds the files which need parsing: those not yet parsed, those which
+        failed, and those whose contents have changed. The hash of a file is
+        only recalculated when its size or modification time has changed.
+
+        Arguments:
+            files:      list of filepaths in the month (list)
+            manifest:   manifest loaded with load (dict)
+        Returns:
+            stale:  list of filepaths to parse (list)
+        Raises:
+            None
+        """
+        stale = []
+        for filepath in files:
+            entry = manifest.get(filepath)
+            if entry is None or entry['status'] != "parsed":
+                stale.append(filepath)
+                continue
+
+            stat = os.stat(filepath)
+            if stat.st_size == entry['size'] \
+                    and stat.st_mtime == entry['mtime']:
+                continue
+
+            if stat.st_size != entry['size'] \
+                    or XbrlManifest.file_hash(filepath) \
+                    != entry['checksum']:
+                stale.append(filepath)
+
+        return stale
+
+    @staticmethod
+    def stale_members(infos, manifest):
+        """
+        Finds the members of a zip archive which need parsing: those not yet
+        parsed, those which failed, and those whose size or CRC32 differ
+        from the manifest.
+
+        Arguments:
+            infos:      entries of the members in the archive (list of
+                        zipfile.ZipInfo)
+            manifest:   manifest loaded with load (dict)
+        Returns:
+            stale:  list of member names to parse (list)
+        Raises:
+            None
+        """
+        stale = []
+        for info in infos:
+            entry = manifest.get(info.filename)
+            if entry is None or entry['status'] != "parsed" \
+                    or info.file_size != entry['size'] \
+                    or "{:08x}".format(info.CRC) != entry['checksum']:
+                stale.append(info.filename)
+
+        return stale
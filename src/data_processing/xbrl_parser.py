@@ -1,16 +1,20 @@
 from bs4 import BeautifulSoup as BS  # Can parse xml or html docs
 from datetime import datetime
 from dateutil import parser
+from functools import lru_cache, partial
+from lxml import etree
 from src.data_processing.xbrl_pd_methods import XbrlExtraction
+from src.data_processing.xbrl_manifest import XbrlManifest
+from src.data_processing.xbrl_document_batch import XbrlDocumentBatch
 import pandas as pd
 import os
-import csv
 import time
 import sys
-import math
 import time
 import multiprocessing as mp
+from multiprocessing import util
 import numpy as np
+import zipfile
 
 
 
@@ -35,6 +39,55 @@ class XbrlParser:
         "consolidationpolicy": "exist"
     }
 
+    # Tags holding the reporting date of a context, most specific first and
+    # ixbrl docs first as it's the most common file
+    context_date_tags = ["xbrli:enddate",
+                         "xbrli:instant",
+                         "xbrli:period",
+                         "enddate",
+                         "instant",
+                         "period"]
+
+    # Parse engines accepted by process_account
+    parse_engines = ["soup", "iterparse"]
+
+    # Columns of the parsed elements and of the document metadata
+    element_cols = ['date', 'name', 'unit', 'value', 'scale', 'decimals',
+                    'format']
+    meta_cols = ['doc_name', 'doc_type', 'doc_upload_date', 'arc_name',
+                 'parsed', 'doc_balancesheetdate',
+                 'doc_companieshouseregisterednumber', 'doc_standard_type',
+                 'doc_standard_date', 'doc_standard_link']
+
+    # Attributes of each element needed to normalise its value
+    fact_attr_cols = ['sign']
+
+    # Values taken to mean zero
+    zero_dashes = ["-", "\u2013", "\u2014"]
+
+    # iXBRL transformation formats, without prefix or hyphens, where a comma
+    # is the decimal separator, and where the value is zero whatever its text
+    comma_decimal_formats = ["numcommadecimal", "numdotcomma",
+                             "numspacecomma", "numcomma"]
+    zero_formats = ["zerodash", "numdash", "fixedzero"]
+
+    # Zip archives opened by this process, with the id of the process. An
+    # archive is reopened after a fork, as the position in the file would
+    # otherwise be shared between the processes
+    open_archives = {}
+
+    # Columns of the flattened table held as categoricals, as they only take
+    # a handful of distinct values
+    category_cols = ['doc_standard_type']
+
+    # Columns of the flattened table of parsed elements, in order
+    frame_cols = ['date', 'name', 'unit', 'value', 'scale', 'decimals',
+                  'format', 'doc_name', 'doc_type',
+                  'doc_upload_date', 'arc_name', 'parsed',
+                  'doc_balancesheetdate',
+                  'doc_companieshouseregisterednumber', 'doc_standard_type',
+                  'doc_standard_date', 'doc_standard_link']
+
     @staticmethod
     def clean_value(string):
         """
@@ -57,6 +110,104 @@ class XbrlParser:
 
         return string
 
+    @staticmethod
+    def normalise_values(values, signs=None, scales=None, formats=None):
+        """
+        Converts a whole column of values stored as strings to numeric at
+        once. Commas and whitespace are removed, a dash is taken to mean
+        zero and values in brackets are negative. Values whose sign is "-"
+        are negated, and values are multiplied by 10 to the power of their
+        scale. The iXBRL format of a value is honoured where it uses a comma
+        as the decimal separator (eg. ixt:numcommadecimal) or means zero
+        (eg. ixt:zerodash).
+
+        Arguments:
+            values: values to be converted (list or array of str)
+            signs:  sign attribute of each value, "-" or anything else
+                    (list or array of str)
+            scales: scale attribute of each value, any value which is not
+                    an integer is taken to be 0 (list or array of str)
+            formats: format attribute of each value, eg.
+                     "ixt:numdotdecimal" (list or array of str)
+        Returns:
+            numbers: the converted values, NaN where they could not be
+                     converted (numpy float64 array)
+            valid:   True where the value could be converted (numpy bool
+                     array)
+        Raises:
+            None
+        """
+        text = pd.Series(values, dtype=object).astype(str)
+
+        if formats is not None:
+            fmt = pd.Series(formats, dtype=object).astype(str).str.lower()\
+                .str.split(":").str[-1].str.replace("-", "", regex=False)
+
+            comma_decimal = fmt.isin(XbrlParser.comma_decimal_formats)
+            text = text.mask(comma_decimal,
+                             text.str.replace(".", "", regex=False)
+                             .str.replace(r"\s", "", regex=True)
+                             .str.replace(",", ".", regex=False))
+            text = text.mask(fmt.isin(XbrlParser.zero_formats), "0")
+
+        text = text.str.replace(r"[,\s]", "", regex=True)
+
+        negative = text.str.startswith("(") & text.str.endswith(")")
+        text = text.mask(negative, text.str[1:-1])
+        text = text.mask(text.isin(XbrlParser.zero_dashes), "0")
+
+        numbers = pd.to_numeric(text, errors="coerce").astype("float64")
+        valid = numbers.notna().to_numpy()
+        numbers = numbers.to_numpy()
+
+        # Subtract from zero rather than multiply by -1 to avoid -0.0
+        if signs is not None:
+            negative ^= pd.Series(signs, dtype=object).astype(str)\
+                .str.strip().eq("-").to_numpy()
+        numbers = np.where(negative, 0.0 - numbers, numbers)
+
+        if scales is not None:
+            scale = pd.to_numeric(pd.Series(scales, dtype=object),
+                                  errors="coerce").fillna(0).to_numpy()
+            scale = np.where(scale == np.round(scale), scale, 0)
+
+            # Divide for negative scales so that eg. 1234 with scale -2
+            # gives exactly 12.34
+            numbers = np.where(scale > 0, numbers * 10.0 ** np.abs(scale),
+                               np.where(scale < 0,
+                                        numbers / 10.0 ** np.abs(scale),
+                                        numbers))
+
+        return numbers, valid
+
+    @staticmethod
+    def clean_values(values, units, signs, scales=None, formats=None):
+        """
+        Converts the values of a set of parsed elements to numeric where the
+        element has a unit (eg a currency), using normalise_values. Values
+        without a unit, or which could not be converted, are left as they
+        are.
+
+        Arguments:
+            values: values of the elements (list of str)
+            units:  units of the elements, "NA" when there is none (list)
+            signs:  sign attribute of the elements (list)
+            scales: scale attribute of the elements (list)
+            formats: format attribute of the elements (list)
+        Returns:
+            values: the cleaned values (list)
+        Raises:
+            None
+        """
+        numbers, valid = XbrlParser.normalise_values(values, signs, scales,
+                                                     formats)
+        numeric = valid & (np.asarray(units, dtype=object) != "NA")
+
+        cleaned = np.array(values, dtype=object)
+        cleaned[numeric] = numbers[numeric]
+
+        return cleaned.tolist()
+
     @staticmethod
     def retrieve_from_context(soup, contextref):
         """
@@ -107,13 +258,33 @@ class XbrlParser:
         if link_obj == None:
             link_obj = soup.find("schemaref")
 
+        return XbrlParser.standard_from_link(link_obj['xlink:href'])
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def standard_from_link(href):
+        """
+        Splits the url of a schema reference sheet into the accounting
+        standard and standard date it refers to. There are only a few dozen
+        distinct urls, so results are cached by url and the same strings are
+        shared by every document using that standard.
+
+        Arguments:
+            href:   xlink:href of the schemaref element (str)
+        Returns:
+            standard:   The standard for the object (string)
+            date:       The date for the object (string)
+            original_url: The original url of the object (string)
+        Raises:
+            None
+        """
         # extract the name of the .xsd schema file, which contains format
         # and date information
-        text = link_obj['xlink:href'].split("/")[-1].split(".")[0]
+        text = href.split("/")[-1].split(".")[0]
 
         # Split the extracted text into format and date, return values
         standard, date, original_url = \
-            text[:-10].strip("-"), text[-10:], link_obj['xlink:href']
+            text[:-10].strip("-"), text[-10:], href
 
         return standard, date, original_url
 
@@ -163,14 +334,7 @@ class XbrlParser:
         # Try to find a date tag within the contextref element, starting with
         # the most specific tags, and starting with those for ixbrl docs as
         # it's the most common file.
-        date_tag_list = ["xbrli:enddate",
-                         "xbrli:instant",
-                         "xbrli:period",
-                         "enddate",
-                         "instant",
-                         "period"]
-
-        for tag in date_tag_list:
+        for tag in XbrlParser.context_date_tags:
             try:
                 date_str = each['contextref']
                 date_val = parser.parse(soup.find(id=each['contextref']).
@@ -247,59 +411,218 @@ class XbrlParser:
         return element_dict
 
     @staticmethod
-    def parse_elements(element_set, soup):
+    def build_context_index(soup):
+        """
+        Walks a document once and builds a lookup of every context and unit
+        element, keyed by id, so that the contextref and unitref of each
+        tagged element can be resolved without searching the whole document
+        again.
+
+        For each context the reporting date (period end or instant) and the
+        explicit member are extracted up front, using the same tag priority
+        as retrieve_date and retrieve_from_context. The link to the schema
+        reference sheet is picked up in the same pass.
+
+        Arguments:
+            soup:   BeautifulSoup souped html/xml object (BeautifulSoup object)
+        Returns:
+            index:  dictionary with a "contexts" entry mapping context ids to
+                    a dict of "date" and "member", a "units" entry mapping
+                    unit ids to the unit string and a "schemaref" entry
+                    holding the schema link, or None (dict)
+        Raises:
+            None
+        """
+        contexts = {}
+        units = {}
+        schemaref = None
+
+        def indexed(tag):
+            return tag.has_attr("id") or tag.name.endswith("schemaref")
+
+        for each in soup.find_all(indexed):
+            tag_type = each.name.split(":")[-1]
+            element_id = each.get("id")
+
+            if tag_type == "schemaref":
+                if schemaref is None:
+                    schemaref = each.get("xlink:href")
+
+            elif tag_type == "context" and element_id not in contexts:
+                def find_text(tag):
+                    found = each.find(tag)
+                    return None if found is None else found.get_text()
+
+                contexts[element_id] = XbrlParser.context_entry(find_text)
+
+            elif tag_type == "unit" and element_id not in units:
+                units[element_id] = each.get_text().strip()
+
+        return {"contexts": contexts, "units": units, "schemaref": schemaref}
+
+    @staticmethod
+    def context_entry(find_text):
+        """
+        Extracts the reporting date (period end or instant) and the explicit
+        member of a context element for the context index.
+
+        Arguments:
+            find_text:  function returning the text of the first descendant
+                        of the context with a given tag name, or None if
+                        there is none (function)
+        Returns:
+            entry:  dict of the context's "date" (None if not found) and
+                    "member" ("" if not found) (dict)
+        Raises:
+            None
+        """
+        date_val = None
+        for tag in XbrlParser.context_date_tags:
+            try:
+                date_val = parser.parse(find_text(tag)).date().isoformat()
+                break
+            except:
+                pass
+
+        try:
+            member = find_text("xbrldi:explicitmember").split(":")[-1]\
+                .strip()
+        except:
+            member = ""
+
+        return {"date": date_val, "member": member}
+
+    @staticmethod
+    def resolve_date(index, contextref):
+        """
+        Gets the reporting date of an element from the context index,
+        alternatively parses the contextref itself if it's not a reference
+        to a context element. Indexed equivalent of retrieve_date.
+
+        Arguments:
+            index:      context index built by build_context_index (dict)
+            contextref: contextref attribute of the element (str)
+        Returns:
+            date_val: The reporting date of the object (date)
+        Raises:
+            None
+        """
+        context = index["contexts"].get(contextref)
+        if context is not None and context["date"] is not None:
+            return context["date"]
+
+        try:
+            return parser.parse(contextref).date().isoformat()
+        except:
+            return "NA"
+
+    @staticmethod
+    def resolve_unit(index, unitref):
+        """
+        Gets the reporting unit of an element from the context index,
+        alternatively uses the unitref itself if it's not a reference to a
+        unit element. Indexed equivalent of retrieve_unit.
+
+        Arguments:
+            index:   context index built by build_context_index (dict)
+            unitref: unitref attribute of the element, or None (str)
+        Returns:
+            unit_str: the unit of the element (string)
+        Raises:
+            None
+        """
+        if unitref is None:
+            return "NA"
+
+        return index["units"].get(unitref, unitref).strip()
+
+    @staticmethod
+    def append_fact(element_dict, name, value, attrs, index):
+        """
+        Resolves the unit, date and sign of a single tagged element and
+        appends it to the lists in element_dict. Shared by every parse engine
+        so that they produce identical output.
+
+        Arguments:
+            element_dict:   dict of lists to append to, as built by
+                            parse_elements (dict)
+            name:           name of the element, lowercase with no prefix
+                            (str)
+            value:          text content of the element (str)
+            attrs:          attributes of the element (dict)
+            index:          context index built by build_context_index
+                            (dict)
+        Returns:
+            None
+        Raises:
+            None
+        """
+        contextref = attrs['contextref']
+
+        unit = XbrlParser.resolve_unit(index, attrs.get('unitref'))
+        date = XbrlParser.resolve_date(index, contextref)
+
+        # If there's no value retrieved, try raiding the associated context
+        # data
+        if value == "":
+            try:
+                value = index["contexts"][contextref]["member"]
+            except KeyError:
+                value = ""
+
+        # Values are converted to numeric for a whole batch of documents at
+        # once by collect_batch, so keep the attributes needed to do so
+        # alongside the raw value
+        sign = attrs.get('sign', "NA")
+        for col in ['scale', 'decimals', 'format']:
+            element_dict[col].append(attrs.get(col, "NA"))
+
+        element_dict['name'].append(name)
+        element_dict['value'].append(value)
+        element_dict['unit'].append(unit)
+        element_dict['date'].append(date)
+        element_dict['sign'].append(sign)
+
+    @staticmethod
+    def parse_elements(element_set, soup, index=None):
         """
         For a set of discovered elements within a document, try to parse
-        them. Only keep valid results (test is whether field "name" exists).
+        them. Only keep valid results (test is whether attribute "contextref"
+        exists). Contexts and units are resolved from a context index rather
+        than by searching the document for every element.
 
         Arguments:
             element_set:    BeautifulSoup iterable search result object (list of BeautifulSoup objects)
             soup:           BeautifulSoup object of accounts document (BeautifulSoup object)
+            index:          context index built by build_context_index, built
+                            from soup if not given (dict)
         Returns:
-            elements:   A list of dicts corresponding to the elements of
-                        element_set (list)
+            elements:   A dict of lists corresponding to the elements of
+                        element_set (dict)
         Raises:
             None
         """
+        if index is None:
+            index = XbrlParser.build_context_index(soup)
+
         element_dict = {'name': [], 'value': [], 'unit': [],
-                         'date': [], 'sign': []}
+                         'date': [], 'sign': [], 'scale': [],
+                         'decimals': [], 'format': []}
 
-        for i,element in enumerate(element_set):
+        for element in element_set:
             if "contextref" not in element.attrs:
-                return {}
+                continue
 
             # Basic name and value
             try:
                 # Method for XBRLi docs first
-                element_dict['name'].append(element.attrs['name'].lower().split(":")[-1])
+                name = element.attrs['name'].lower().split(":")[-1]
             except:
                 # Method for XBRL docs second
-                element_dict['name'].append(element.name.lower().split(":")[-1])
-
-            element_dict['value'].append(element.get_text())
-            element_dict['unit'].append(XbrlParser.retrieve_unit(soup, element))
-            element_dict['date'].append(XbrlParser.retrieve_date(soup, element))
-
-            # If there's no value retrieved, try raiding the associated context
-            # data
-            if element_dict['value'][i] == "":
-                element_dict['value'][i] = XbrlParser.retrieve_from_context(
-                    soup, element.attrs['contextref'])
+                name = element.name.lower().split(":")[-1]
 
-            # If the value has a defined unit (eg a currency) convert to numeric
-            if element_dict['unit'][i] != "NA":
-                element_dict['value'][i] = XbrlParser.clean_value(
-                    element_dict['value'][i])
-
-            # Retrieve sign of element if exists
-            try:
-                element_dict['sign'].append(element.attrs['sign'])
-
-                # if it's negative, convert the value then and there
-                if element_dict['sign'][i].strip() == "-":
-                    element_dict['value'][i] = 0.0 - element_dict['value'][i]
-            except:
-                pass
+            XbrlParser.append_fact(element_dict, name, element.get_text(),
+                                   element.attrs, index)
 
         return element_dict
 
@@ -418,7 +741,7 @@ class XbrlParser:
         return results
 
     @staticmethod
-    def scrape_elements(soup, filepath):
+    def scrape_elements(soup, filepath, index=None):
         """
         Parses an XBRL (xml) company accounts file for all labelled content and
         extracts the content (and metadata eg; unitref) of each element found
@@ -427,6 +750,8 @@ class XbrlParser:
         Arguments:
             soup:        BeautifulSoup object of accounts document (BeautifulSoup object)
             filepath:    A filepath (str)
+            index:       context index built by build_context_index, built
+                         from soup if not given (dict)
         Returns:
              elements:  A list of dictionaries containing meta data for each
                         element (list)
@@ -437,20 +762,136 @@ class XbrlParser:
         # now needed though.  The rest will be removed after testing this
         # but should not affect execution speed.
         try:
-            element_set = soup.find_all()
-            elements = XbrlParser.parse_elements(element_set, soup)
-            if len(elements) <= 5:
+            if index is None:
+                index = XbrlParser.build_context_index(soup)
+            element_set = soup.find_all(attrs={"contextref": True})
+            elements = XbrlParser.parse_elements(element_set, soup, index)
+        except:
+            elements = {}
+
+        return XbrlParser.validate_elements(elements)
+
+    @staticmethod
+    def validate_elements(elements):
+        """
+        Checks that enough elements were parsed from a document, otherwise
+        replaces them with a dummy entry so the document still exists in the
+        output.
+
+        Arguments:
+            elements:   A dict of lists of the parsed elements (dict)
+        Returns:
+             elements:  The elements, or the dummy entry if fewer than 6
+                        were parsed (dict)
+        Raises:
+            None
+        """
+        try:
+            if len(elements['name']) <= 5:
                 raise Exception("Elements should be gte 5, was {}".
-                                format(len(elements)))
+                                format(len(elements['name'])))
         except:
             # if fails parsing create dummy entry elements so entry still
             # exists in dictionary
             elements = {'name': 'NA', 'value': 'NA', 'unit': 'NA',
-                         'date': 'NA', 'sign': 'NA'}
-            pass
-        
+                         'date': 'NA', 'sign': 'NA', 'scale': 'NA',
+                         'decimals': 'NA', 'format': 'NA'}
+
         return elements
 
+    @staticmethod
+    def stream_elements(filepath):
+        """
+        Parses an XBRL (xml) or iXBRL (html) company accounts file with
+        lxml.etree.iterparse, keeping only the tagged elements, contexts,
+        units and the schema reference. Every other node is cleared as soon
+        as it has been read, so memory stays flat however large the
+        presentational html of the document is.
+
+        Produces the same elements as building a BeautifulSoup object and
+        calling scrape_elements.
+
+        Arguments:
+            filepath:   A filepath, or a binary file object such as a member
+                        opened from a zip archive (str or file object)
+        Returns:
+            elements:   A dict of lists of the parsed elements (dict)
+            index:      context index of the document, as built by
+                        build_context_index (dict)
+        Raises:
+            OSError:    If the file cannot be read
+        """
+        index = {"contexts": {}, "units": {}, "schemaref": None}
+        facts = []
+
+        # Positions in facts of the tagged elements, contexts and units that
+        # are still open. Nothing is cleared while one is open as its text is
+        # not yet complete. Facts are slotted in on their start tag to keep
+        # document order when elements are nested.
+        open_elements = []
+
+        for event, elem in etree.iterparse(filepath, events=("start", "end"),
+                                           html=True, recover=True):
+            if not isinstance(elem.tag, str):
+                continue
+
+            tag_type = elem.tag.split(":")[-1]
+            kept = "contextref" in elem.attrib \
+                or (tag_type in ("context", "unit") and "id" in elem.attrib)
+
+            if event == "start":
+                if kept:
+                    open_elements.append(len(facts))
+                    if "contextref" in elem.attrib:
+                        facts.append(None)
+                continue
+
+            if tag_type == "schemaref" and index["schemaref"] is None:
+                index["schemaref"] = elem.get("xlink:href")
+
+            if kept:
+                slot = open_elements.pop()
+                element_id = elem.get("id")
+
+                if "contextref" in elem.attrib:
+                    # Method for XBRLi docs first, XBRL docs second
+                    name = elem.get("name", elem.tag).lower().split(":")[-1]
+                    facts[slot] = (name, "".join(elem.itertext()),
+                                   dict(elem.attrib))
+
+                elif tag_type == "context" \
+                        and element_id not in index["contexts"]:
+                    def find_text(tag):
+                        found = next(elem.iter(tag), None)
+                        return None if found is None \
+                            else "".join(found.itertext())
+
+                    index["contexts"][element_id] = \
+                        XbrlParser.context_entry(find_text)
+
+                elif tag_type == "unit" and element_id not in index["units"]:
+                    index["units"][element_id] = \
+                        "".join(elem.itertext()).strip()
+
+            # Free everything read so far, unless it is part of an element
+            # that is still being read
+            if not open_elements:
+                elem.clear()
+                parent = elem.getparent()
+                if parent is not None:
+                    while elem.getprevious() is not None:
+                        del parent[0]
+
+        # Contexts can come after the elements that reference them, so the
+        # elements are only resolved once the whole file has been read
+        elements = {'name': [], 'value': [], 'unit': [],
+                    'date': [], 'sign': [], 'scale': [], 'decimals': [],
+                    'format': []}
+        for name, value, attrs in facts:
+            XbrlParser.append_fact(elements, name, value, attrs, index)
+
+        return elements, index
+
     @staticmethod
     def flatten_dict(doc):
         """
@@ -474,9 +915,9 @@ class XbrlParser:
         return doc_dict
 
     @staticmethod
-    def flatten_data(doc, temp_exports= "data/temp_exports"):
+    def flatten_data(doc):
         """
-        Takes the data returned by flatten dict, with its tree-like
+        Takes the data returned by process_account, with its tree-like
         structure and reorganises it into a long-thin format table structure
         suitable for SQL applications.
 
@@ -487,97 +928,168 @@ class XbrlParser:
         Raises:
             None
         """
-        doc2 = doc.copy()
+        return XbrlParser.batch_to_frame(XbrlParser.collect_batch(doc))
 
-        # Check if the temp_exports folder is present
-        if not (os.path.isdir(temp_exports)):
-            os.mkdir(temp_exports)
+    @staticmethod
+    def collect_batch(doc, files=None):
+        """
+        Collects the elements and metadata of a list of documents into an
+        XbrlDocumentBatch. Document metadata is held once per document and
+        each element refers to its document by doc_id, which keeps the result
+        small to pass between processes. The values of all the documents are
+        converted to numeric together with normalise_values.
 
-        # Check if temp file is already present and remove
-        try:
-            os.remove(temp_exports + "/df_elements.csv")
-        except:
-            pass
+        Argument:
+            doc:   a list of dictionaries as returned by process_account (list)
+            files: manifest entries of the files in the batch (list)
+        Returns:
+            batch: the elements and metadata of the documents
+                   (XbrlDocumentBatch)
+        Raises:
+            None
+        """
+        elements = {col: [] for col in XbrlParser.element_cols}
+        attrs = {col: [] for col in XbrlParser.fact_attr_cols}
+        meta = {col: [] for col in XbrlParser.meta_cols}
+        counts = []
+
+        for each in doc:
+            # Skip files that could not be opened
+            if not isinstance(each, dict):
+                continue
+
+            # Documents which failed to parse hold a single dummy entry
+            n = len(each['name']) if isinstance(each.get('name'), list) \
+                else 1
+            if n == 0:
+                continue
+
+            for col in XbrlParser.element_cols:
+                values = each.get(col, 'NA')
+                if isinstance(values, list):
+                    elements[col].extend(values)
+                else:
+                    elements[col].extend([values] * n)
+
+            for col in XbrlParser.fact_attr_cols:
+                values = each.get(col, 'NA')
+                if isinstance(values, list):
+                    attrs[col].extend(values)
+                else:
+                    attrs[col].extend([values] * n)
+
+            for col in XbrlParser.meta_cols:
+                meta[col].append(each.get(col))
+            counts.append(n)
+
+        # Convert the values of all the documents to numeric in one go, only
+        # where the element has a unit
+        if counts:
+            numbers, valid = XbrlParser.normalise_values(
+                elements["value"], attrs["sign"], elements["scale"],
+                elements["format"])
+            numeric = valid & (np.asarray(elements["unit"], dtype=object)
+                               != "NA")
+        else:
+            numbers, numeric = np.array([]), np.array([], dtype=bool)
 
-        #define lenth of dict and initial time
-        T = len(doc2)
-        t0 = time.time()
+        return XbrlDocumentBatch.from_columns(elements, numbers, numeric,
+                                              meta, counts, files)
 
-        # Define initial mode and header boolean for exporting file to csv
-        md, hd = 'w', True
+    @staticmethod
+    def batch_to_frame(batch):
+        """
+        Builds the long-thin table of elements from an XbrlDocumentBatch,
+        repeating the metadata of each document for each of its elements.
+        Only done when the elements are written out.
 
-        # loop over each file and create a separate dataframe
-        # for each set (elements) of parsed tags, appending result to list
-        for i in range(T):
-            # Turn each elements dict into a dataframe
-            print('DOC2 I',doc2[i])
-            df_element_export = pd.DataFrame.from_dict(doc2[i])
+        Argument:
+            batch: the elements and metadata of the documents
+                   (XbrlDocumentBatch)
+        Returns:
+            df_elements: A dataframe containing all the elements (dataframe)
+        Raises:
+            None
+        """
+        df_elements = batch.to_frame().reindex(columns=XbrlParser.frame_cols)
 
-            # Remove the 'sign' column if it is present
-            try:
-                df_element_export = df_element_export.drop('sign', axis=1)
-            except:
-                None
-
-            # Remove unwanted characters
-            unwanted_chars = ['  ', '"', '\n']
-            #print(df_element_export.value.str, flush=True)
-            df_element_export["value"] = df_element_export["value"]\
-                .astype('str')
-            for char in unwanted_chars:
-                df_element_export["value"] = df_element_export["value"].str\
-                    .replace(char, '')
-            #print(df_element_export.value)
-            # Change the order of the columns
-            wanted_cols = ['date', 'name', 'unit', 'value', 'doc_name',
-                           'doc_type',
-                           'doc_upload_date', 'arc_name', 'parsed',
-                           'doc_balancesheetdate',
-                           'doc_companieshouseregisterednumber',
-                           'doc_standard_type',
-                           'doc_standard_date', 'doc_standard_link', ]
-
-            df_element_export = df_element_export[wanted_cols]
-
-            # Append the new element to a csv file stored in temp_exports
-            df_element_export.to_csv(
-                temp_exports + "/df_elements.csv",
-                mode=md,
-                header=hd,
-                index=None,
-                sep = ",",
-                quotechar= '"',
-                quoting=csv.QUOTE_NONNUMERIC
-            )
-
-            # Print a progress update
-            if i % 100 == 0:
-                print("%2.2f %% have been processed"%((i/T)*100))
-
-            # Redefine mode and header value for subsequent dataframes
-            # (appending and False)
-            md, hd = 'a', False
-
-        # convert the stored csv back into a pandas df and tidy up
-        df_elements = pd.read_csv(
-            temp_exports + "/df_elements.csv",
-            index_col=None,
-            header=0,
-            sep=",",
-            lineterminator="\n",
-            quotechar='"')
-        os.remove(temp_exports + "/df_elements.csv")
+        # Store everything as strings apart from the parsed flag
+        str_cols = [col for col in XbrlParser.frame_cols if col != 'parsed']
+        df_elements[str_cols] = df_elements[str_cols].astype(str)
+        df_elements['parsed'] = df_elements['parsed'].astype(bool)
+        df_elements[XbrlParser.category_cols] = \
+            df_elements[XbrlParser.category_cols].astype('category')
 
         return df_elements
 
     @staticmethod
-    def process_account(filepath):
+    def open_archive(archive):
+        """
+        Opens a zip archive of accounts for reading its members, reusing the
+        archive already opened by this process if there is one so that its
+        central directory is only read once.
+
+        Arguments:
+            archive: path of the zip archive (str)
+        Returns:
+            zf: the open archive (zipfile.ZipFile)
+        Raises:
+            OSError: If the archive cannot be read
+        """
+        pid, zf = XbrlParser.open_archives.get(archive, (None, None))
+        if pid != os.getpid():
+            zf = zipfile.ZipFile(archive)
+            XbrlParser.open_archives[archive] = (os.getpid(), zf)
+
+        return zf
+
+    @staticmethod
+    def close_archives():
+        """
+        Closes the zip archives opened by this process with open_archive.
+        Archives opened by the parent of a forked process are only dropped
+        from the cache, as the parent still owns them.
+
+        Arguments:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        for pid, zf in XbrlParser.open_archives.values():
+            if pid == os.getpid():
+                zf.close()
+        XbrlParser.open_archives.clear()
+
+    @staticmethod
+    def init_worker():
+        """
+        Sets up a worker process of parse_directory so that the archives it
+        opens are closed when it exits.
+
+        Arguments:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        util.Finalize(None, XbrlParser.close_archives, exitpriority=0)
+
+    @staticmethod
+    def process_account(filepath, engine="soup", archive=None):
         """
         Scrape all of the relevant information from an iXBRL (html) file,
         upload the elements and some metadata to a mongodb.
 
         Arguments:
             filepath: complete filepath from drive root (str)
+            engine:   parse engine to use, either "soup" to build a
+                      BeautifulSoup object of the whole document or
+                      "iterparse" to stream it with lxml (str)
+            archive:  path of the zip archive to read filepath from, as a
+                      member name, rather than from disk (str)
         Returns:
             doc: dictionary of all data from the relevant file (dict)
         Raises:
@@ -589,7 +1101,10 @@ class XbrlParser:
         doc['doc_name'] = filepath.split("/")[-1]
         doc['doc_type'] = filepath.split(".")[-1].lower()
         doc['doc_upload_date'] = str(datetime.now())
-        doc['arc_name'] = filepath.split("/")[-2]
+        if archive is None:
+            doc['arc_name'] = filepath.split("/")[-2]
+        else:
+            doc['arc_name'] = os.path.splitext(os.path.basename(archive))[0]
 
         # Complicated ones
         sheet_date = filepath.split("/")[-1].split(".")[0].split("_")[-1]
@@ -599,21 +1114,60 @@ class XbrlParser:
         doc['doc_companieshouseregisterednumber'] = filepath.split("/")[-1]\
             .split(".")[0].split("_")[-2]
 
+        if engine == "iterparse":
+            try:
+                if archive is None:
+                    elements, index = XbrlParser.stream_elements(filepath)
+                else:
+                    with XbrlParser.open_archive(archive).open(filepath) \
+                            as file:
+                        elements, index = XbrlParser.stream_elements(file)
+            except:
+                print("Failed to open: " + filepath)
+                return 1
+
+            # Get metadata about the accounting standard used
+            try:
+                doc['doc_standard_type'],\
+                    doc['doc_standard_date'],\
+                    doc['doc_standard_link'] = XbrlParser\
+                    .standard_from_link(index["schemaref"])
+                doc['parsed'] = True
+            except:
+                doc['doc_standard_type'],\
+                    doc['doc_standard_date'],\
+                    doc['doc_standard_link'] = (0, 0, 0)
+                doc['parsed'] = False
+
+            doc.update(XbrlParser.validate_elements(elements))
+            return doc
+
         # loop over multi-threading here - imports data and parses on separate
         # threads
         try:
-            file = open(filepath)
-            soup = BS(file, "lxml")
+            if archive is None:
+                file = open(filepath)
+            else:
+                file = XbrlParser.open_archive(archive).open(filepath)
+            with file:
+                soup = BS(file, "lxml")
         except:
             print("Failed to open: " + filepath)
             return 1
 
+        # Index the contexts, units and schema link of the document in a
+        # single pass
+        try:
+            index = XbrlParser.build_context_index(soup)
+        except:
+            index = None
+
         # Get metadata about the accounting standard used
         try:
             doc['doc_standard_type'],\
                 doc['doc_standard_date'],\
                 doc['doc_standard_link'] = XbrlParser\
-                .retrieve_accounting_standard(soup)
+                .standard_from_link(index["schemaref"])
             doc['parsed'] = True
         except:
             doc['doc_standard_type'],\
@@ -623,7 +1177,7 @@ class XbrlParser:
 
         # Fetch all the marked elements of the document
         try:
-            doc.upgrade(XbrlParser.scrape_elements(soup, filepath))
+            doc.update(XbrlParser.scrape_elements(soup, filepath, index))
         except Exception as e:
             doc['parsed'] = False
             doc['Error'] = e
@@ -703,16 +1257,39 @@ class XbrlParser:
         return directory_list
 
     @staticmethod
-    def parse_directory(directory, processed_path, num_processes=1):
+    def parse_directory(directory, processed_path, num_processes=None,
+                        engine="soup", batch_size=10, incremental=True,
+                        file_type="csv", partition_by_standard=False):
         """
         Takes a directory, parses all files contained there and saves them as
-        csv files in a specified directory.
+        csv files in a specified directory. The directory can also be a zip
+        archive of accounts, whose members are then read straight from the
+        archive by the worker processes rather than unpacked to disk first.
+
+        Files are handed to the worker processes in small batches, largest
+        files first, and each worker picks up the next batch as soon as it
+        is free, so a few very large filings cannot hold up the rest.
+
+        Each file parsed is recorded in a manifest next to the csv files. If
+        incremental, only files which are new or have changed since the last
+        run are parsed and their rows are merged with those already saved.
+        Results are also saved batch by batch, so an interrupted run picks
+        up where it left off.
 
         Arguments:
-            directory: A directory (path) to be processed (str)
+            directory: A directory (path) or zip archive to be processed (str)
             processed_path: String of the path where processed files should be
                             saved (str)
-            num_processes:  The number of cores to use in multiprocessing (int)
+            num_processes:  The number of cores to use in multiprocessing,
+                            defaults to all available cores (int)
+            engine:         parse engine passed to process_account (str)
+            batch_size:     The number of files given to a worker at a time
+                            (int)
+            incremental:    Whether to skip files already parsed, otherwise
+                            the whole directory is parsed again (bool)
+            file_type:      Format to save the month in, csv or parquet (str)
+            partition_by_standard: Whether to partition parquet output by
+                            doc_standard_type (bool)
         Returns:
             None
         Raises:
@@ -721,44 +1298,121 @@ class XbrlParser:
         extractor = XbrlExtraction()
         parser = XbrlParser()
 
-        # Get all the filenames from the example folder
-        files, folder_month, folder_year = extractor.get_filepaths(directory)
+        if num_processes is None:
+            num_processes = os.cpu_count()
 
-        print(len(files))
-        
-        # Here you can splice/truncate the number of files you want to process
-        # for testing
-        files = files[0:10]
+        # Get all the filenames from the example folder, or the member names
+        # of the archive
+        if directory.endswith(".zip"):
+            archive = directory
+            files, folder_month, folder_year = \
+                extractor.get_archive_members(archive)
+        else:
+            archive = None
+            files, folder_month, folder_year = \
+                extractor.get_filepaths(directory)
 
-        # TO BE COMMENTED OUT AFTER TESTING
+        print(len(files))
         print(folder_month, folder_year)
 
-        # Code needed to split files by the number of cores before passing in
-        # as an argument
-        chunk_len = math.ceil(len(files) / num_processes)
-        files = [files[i:i + chunk_len] for i in
-                 range(0, len(files), chunk_len)]
+        manifest_path = XbrlManifest.manifest_path(processed_path,
+                                                   folder_month, folder_year)
+        output_path = extractor.xbrl_month_path(processed_path, folder_month,
+                                                folder_year, file_type)
+        pending_path = extractor.xbrl_month_path(
+            processed_path, folder_month, folder_year) + ".pending"
+
+        # Rows parsed by an earlier run that did not finish
+        if os.path.exists(pending_path):
+            pending = XbrlParser.read_parsed(pending_path)
+        else:
+            pending = None
+
+        if incremental:
+            # The manifest describes the rows in the output and the pending
+            # rows. A run killed before its first output was written left
+            # its rows in the pending file, but if the output type has
+            # changed the rows are in the other output and every file is
+            # parsed again
+            other_type = "csv" if file_type == "parquet" else "parquet"
+            other_path = extractor.xbrl_month_path(
+                processed_path, folder_month, folder_year, other_type)
+            if os.path.exists(output_path) \
+                    or (pending is not None
+                        and not os.path.exists(other_path)):
+                manifest = XbrlManifest.load(manifest_path)
+            else:
+                manifest = {}
+
+            if archive is None:
+                to_parse = XbrlManifest.stale_files(files, manifest)
+            else:
+                to_parse = XbrlManifest.stale_members(
+                    [XbrlParser.open_archive(archive).getinfo(f)
+                     for f in files], manifest)
+            print("{} new or changed files to parse".format(len(to_parse)))
+            if not to_parse and pending is None:
+                print("No new or changed files in " + directory)
+                XbrlParser.close_archives()
+                return None
+        else:
+            to_parse = files
+
+        batches = XbrlParser.batch_by_size(to_parse, batch_size, archive)
+
+        # The workers open the archive themselves
+        XbrlParser.close_archives()
 
-        # define number of processors
-        pool = mp.Pool(processes=num_processes)
         # Finally, build a table of all variables from all example (digital)
-        # documents splitting the load between cpu cores = num_processes
-        # This can take a while (hopefully not anymore!!!)
-        r = pool.map(parser.build_month_table, files)
-
-        pool.close()
-        pool.join()
-        # combine resultant list of lists
-        print("Combining lists...")
-        r = [item for sublist in r for item in sublist]
+        # documents, each worker returning an XbrlDocumentBatch. Each batch
+        # is saved as it arrives before its files are marked as parsed.
+        r = []
+        count = 0
+        with mp.Pool(processes=num_processes,
+                     initializer=XbrlParser.init_worker) as pool:
+            for batch in pool.imap_unordered(
+                    partial(parser.parse_batch, engine=engine,
+                            archive=archive), batches):
+                r.append(batch)
+                parser.batch_to_frame(batch).to_csv(
+                    pending_path, mode='a', index=False,
+                    header=not os.path.exists(pending_path))
+                XbrlManifest.record(manifest_path, batch.files)
+
+                count += len(batch.files)
+                XbrlExtraction.progressBar("XBRL Accounts Parsed", count,
+                                           len(to_parse), bar_length=50,
+                                           width=20)
+
+            # Let the workers exit by themselves so their archives are closed
+            pool.close()
+            pool.join()
+
         print("Flattening data....")
         # combine data and convert into dataframe
-        results = parser.flatten_data(r)
+        if r:
+            results = parser.batch_to_frame(XbrlDocumentBatch.concat(r))
+        else:
+            results = parser.flatten_data([])
+
+        # Merge with the rows saved by earlier runs, keeping the latest parse
+        # of each document and dropping documents no longer in the directory
+        if incremental:
+            previous = [pending]
+            if os.path.exists(output_path):
+                previous.append(XbrlParser.read_parsed(output_path))
+            results = XbrlParser.merge_parsed(
+                [results] + [df for df in previous if df is not None],
+                [f.split("/")[-1] for f in files])
         print(results.shape)
 
-        # save to csv
+        # save to csv or parquet
         extractor.output_xbrl_month(results, processed_path, folder_month,
-                                    folder_year)
+                                    folder_year, file_type,
+                                    partition_by_standard)
+        if os.path.exists(pending_path):
+            os.remove(pending_path)
+        XbrlManifest.compact(manifest_path, files)
 
         # Find list of all unique tags in dataset
         list_of_tags = results["name"].tolist()
@@ -788,9 +1442,141 @@ class XbrlParser:
         # print(results.shape)
 
 
+    @staticmethod
+    def batch_by_size(files, batch_size, archive=None):
+        """
+        Orders a list of files by size, largest first, and splits it into
+        batches of batch_size files.
+
+        Arguments:
+            files:      list of filepaths, or member names of archive (list)
+            batch_size: The number of files in each batch (int)
+            archive:    path of the zip archive holding the files (str)
+        Returns:
+            batches:    list of lists of filepaths (list)
+        Raises:
+            None
+        """
+        if archive is None:
+            size = os.path.getsize
+        else:
+            size = {info.filename: info.file_size for info
+                    in XbrlParser.open_archive(archive).infolist()}.get
+
+        files = sorted(files, key=size, reverse=True)
+
+        return [files[i:i + batch_size]
+                for i in range(0, len(files), batch_size)]
+
+    @staticmethod
+    def parse_batch(list_of_files, engine="soup", archive=None):
+        """
+        Parses a batch of xbrl/html files and returns their contents as an
+        XbrlDocumentBatch. Run by each worker process of parse_directory.
+
+        Arguments:
+            list_of_files: list of filepaths, each coresponding to a
+                           xbrl/html file (list)
+            engine:        parse engine passed to process_account (str)
+            archive:       path of the zip archive to read the files from, as
+                           member names (str)
+        Returns:
+            batch:         batch built by collect_batch, with the manifest
+                           entry of each file as its files
+                           (XbrlDocumentBatch)
+        Raises:
+            None
+        """
+        docs = [XbrlParser.process_account(file, engine, archive)
+                for file in list_of_files]
+
+        statuses = ["parsed" if isinstance(doc, dict) else "failed"
+                     for doc in docs]
+
+        if archive is None:
+            files = [XbrlManifest.file_entry(file, status)
+                     for file, status in zip(list_of_files, statuses)]
+        else:
+            zf = XbrlParser.open_archive(archive)
+            files = [XbrlManifest.member_entry(zf.getinfo(file), status)
+                     for file, status in zip(list_of_files, statuses)]
+
+        return XbrlParser.collect_batch(docs, files)
+
+    @staticmethod
+    def read_parsed(filepath):
+        """
+        Reads a csv or parquet file of parsed elements written by
+        parse_directory back into the same form as batch_to_frame returns.
+
+        Arguments:
+            filepath: path of the csv or parquet file (str)
+        Returns:
+            df: A dataframe of parsed elements (dataframe)
+        Raises:
+            None
+        """
+        if filepath.endswith(".parquet"):
+            df = pd.read_parquet(filepath)
+            str_cols = [col for col in df.columns if col != 'parsed']
+            df[str_cols] = df[str_cols].astype(str)
+        else:
+            df = pd.read_csv(filepath, dtype=str, keep_default_na=False)
+            df['parsed'] = df['parsed'] == "True"
+
+        # Files parsed before a column was added hold "NA" for it
+        df = df.reindex(columns=XbrlParser.frame_cols, fill_value="NA")
+        df[XbrlParser.category_cols] = \
+            df[XbrlParser.category_cols].astype('category')
+
+        return df
+
+    @staticmethod
+    def merge_parsed(frames, doc_names):
+        """
+        Merges tables of parsed elements, newest first. Each document is
+        taken from the first table it appears in and, within that table, from
+        its latest parse only. Documents not in doc_names are dropped.
+
+        Arguments:
+            frames:     list of dataframes of parsed elements, newest first
+                        (list)
+            doc_names:  names of the documents to keep (list)
+        Returns:
+            df: A dataframe of parsed elements (dataframe)
+        Raises:
+            None
+        """
+        seen = set()
+        keep = []
+        for df in frames:
+            df = df[df['doc_name'].isin(doc_names)
+                    & ~df['doc_name'].isin(seen)]
+
+            # A document parsed more than once in the same table (after an
+            # interrupted run) keeps only its latest parse
+            latest = df.groupby('doc_name')['doc_upload_date']\
+                .transform('max')
+            df = df[df['doc_upload_date'] == latest]
+
+            seen.update(df['doc_name'].unique())
+            keep.append(df)
+
+        df = pd.concat(keep, ignore_index=True)
+
+        # Concatenating categoricals with different categories gives objects
+        category_cols = [col for col in XbrlParser.category_cols
+                         if col in df.columns]
+        df[category_cols] = df[category_cols].astype('category')
+
+        return df
+
     @staticmethod
     def parse_files(quarter, year, unpacked_files,
-                    custom_input, processed_files, num_cores):
+                    custom_input, processed_files, num_cores=None,
+                    engine="soup", batch_size=10, incremental=True,
+                    file_type="csv", partition_by_standard=False,
+                    from_zip=False):
         """
         Parses a set of accounts for a given time period and saves as a csv in
         a specified location.
@@ -803,13 +1589,30 @@ class XbrlParser:
             processed_files:    path of directory where the files the resulting
                                 files will be saved (string)
             num_cores:          number of cores to use with mutliprocessing
-                                module (int)
+                                module, defaults to all available (int)
             custom_input:       Used to set a specific folder of accounts
+            engine:             parse engine passed to process_account, "soup"
+                                or "iterparse" (str)
+            batch_size:         number of files given to a worker process at
+                                a time (int)
+            incremental:        whether to only parse files which are new or
+                                have changed since the last run (bool)
+            file_type:          format to save each month in, csv or parquet
+                                (str)
+            partition_by_standard: whether to partition parquet output by
+                                doc_standard_type (bool)
+            from_zip:           whether to parse straight from the zip
+                                archives in unpacked_files rather than from
+                                unpacked folders (bool)
         Returns:
             None
         Raises:
-            None
+            ValueError: If the parse engine is not recognised
         """
+        if engine not in XbrlParser.parse_engines:
+            raise ValueError("The parse engine should be one of: "
+                             + ", ".join(XbrlParser.parse_engines))
+
         # Construct both the list of months and list of corresponding
         # directories
         month_list = XbrlParser.create_month_list(quarter)
@@ -817,53 +1620,14 @@ class XbrlParser:
                                                           unpacked_files,
                                                           year,
                                                           custom_input)
+        if from_zip:
+            directory_list = [directory if directory.endswith(".zip")
+                              else directory + ".zip"
+                              for directory in directory_list]
+
         # Parse each directory
         for directory in directory_list:
             print("Parsing " + directory + "...")
-            XbrlParser.parse_directory(directory, processed_files, num_cores)
-
-    @staticmethod
-    def build_month_table(list_of_files):
-        """
-        Function which parses, sequentially, a list of xbrl/ html files,
-        converting each parsed file into a dictionary and appending to a list.
-
-        Arguments:
-            list of files: list of filepaths, each coresponding to a xbrl/html file (list)
-
-        Returns:
-            results:       list of dictionaries, each containing the parsed content of
-                           a xbrl/html file (list)
-        Raises:
-            None
-        """
-
-        process_start = time.time()
-
-        # Empty table awaiting results
-        results = []
-
-        COUNT = 0
-
-        # For every file
-        for file in list_of_files:
-            COUNT += 1
-
-            # Read the file and parse
-            doc = XbrlParser.process_account(file)
-
-            # flatten the elements dict into single dict
-            #doc['elements'] = XbrlParser.flatten_dict(doc['elements'])
-
-            # append results to table
-            results.append(doc)
-
-            XbrlExtraction.progressBar("XBRL Accounts Parsed", COUNT,
-                                       len(list_of_files), bar_length=50,
-                                       width=20)
-
-        print(
-            "Average time to process an XBRL file: \x1b[31m{:0f}\x1b[0m".format(
-                (time.time() - process_start) / 60, 2), "minutes")
-
-        return results
\ No newline at end of file
+            XbrlParser.parse_directory(directory, processed_files, num_cores,
+                                       engine, batch_size, incremental,
+                                       file_type, partition_by_standard)
@@ -1,10 +1,15 @@
+import functools
+import operator
 import os
+import shutil
 import pandas as pd
 import time
+import zipfile
 
 import sys
 
 # Custom import
+from src.data_processing.xbrl_schema import XbrlSchema
 # from src.data_processing.xbrl_parser import XbrlParser
 # xbrl_parser = XbrlParser()
 
@@ -46,6 +51,37 @@ class XbrlExtraction:
 
         return files, month, year
 
+    @staticmethod
+    def get_archive_members(archive):
+        """
+        Helper function -
+        Get the names of all of the members of a zip archive of accounts that
+        end in htm* or xml, for parsing straight from the archive.
+        Arguments:
+            archive: path of an Accounts_Monthly_Data zip archive (str)
+        Returns:
+            members: List of the names of xml or html members (list)
+            month:   The month of the archive's accounts (str)
+            year:    The year of the archive's accounts (str)
+        Raises:
+            TypeError: If the path of the archive is not a string
+        """
+
+        if not isinstance(archive, str):
+            raise TypeError("The input argument 'archive' \
+            needs to be a string")
+
+        with zipfile.ZipFile(archive) as zf:
+            members = [info.filename for info in zf.infolist()
+                       if not info.is_dir()
+                       and ((".htm" in info.filename.lower())
+                            or (".xml" in info.filename.lower()))]
+
+        month_and_year = os.path.splitext(archive)[0].split('-')[-1]
+        month, year = month_and_year[:-4], month_and_year[-4:]
+
+        return members, month, year
+
     @staticmethod
     def progressBar(name, value, endvalue, bar_length=50, width=20):
         """
@@ -209,24 +245,62 @@ class XbrlExtraction:
             mode="a"
         )
 
+    @staticmethod
+    def xbrl_month_path(output_folder, folder_month, folder_year,
+                        file_type="csv"):
+        """
+        Returns the path a month of parsed data is saved to by
+        output_xbrl_month; "YYYY-Month_xbrl_data.csv" for csv files and
+        "YYYY_month_parsed.parquet" for parquet, as read by
+        XbrlDataProcessing.xbrl_import.
+
+        Arguments:
+            output_folder: user specified file destination (str)
+            folder_month: month of the data (str)
+            folder_year: year of the data (str)
+            file_type: csv or parquet (str)
+        Returns:
+            path of the output file (str)
+        Raises:
+            None
+        """
+        if file_type == "parquet":
+            return output_folder + "/" + folder_year + "_" \
+                + folder_month.lower() + "_parsed.parquet"
+
+        return output_folder + "/" + folder_year + "-" + folder_month \
+            + "_xbrl_data.csv"
+
     @staticmethod
     def output_xbrl_month(dataframe, output_folder, folder_month, folder_year,
-                          file_type="csv"):
+                          file_type="csv", partition_by_standard=False,
+                          row_group_size=500000):
 
         """
-        Save dataframe to csv format in specified directory, with particular
-        naming scheme "YYYY-MM_xbrl_data.csv".
+        Save dataframe to csv or parquet format in specified directory, with
+        particular naming scheme "YYYY-MM_xbrl_data.csv" or
+        "YYYY_mm_parsed.parquet".
+
+        Parquet files are written with pyarrow, with the name, unit and
+        doc_standard_type columns dictionary encoded. If
+        partition_by_standard, the parquet output is a directory with one
+        "doc_standard_type=..." partition per accounting standard.
 
         Arguments:
             dataframe: tabular data (dataframe)
             output_folder: user specified file destination (str)
             folder_month: month to include in output folder name (str)
             folder_year: year to include in output folder name (str)
-            file_type: default is csv (str)
+            file_type: default is csv, or parquet (str)
+            partition_by_standard: whether to partition parquet output by
+                                   doc_standard_type (bool)
+            row_group_size: maximum number of rows in each parquet row
+                            group (int)
         Returns:
             None
         Raises:
             TypeError: if arguments are of incorrect type
+            ValueError: if arguments are of incorrect value
         """
 
         # Check that the input df is actually dataframe type.
@@ -253,19 +327,52 @@ class XbrlExtraction:
         if not str.isdigit(folder_year):
             raise ValueError("Year specified must be an integer >= 0")
 
+        if file_type not in ["csv", "parquet"]:
+            raise ValueError("The file_type should be csv or parquet")
+
+        output_path = XbrlExtraction.xbrl_month_path(
+            output_folder, folder_month, folder_year, file_type)
+
         if file_type == "csv":
             dataframe.to_csv(
-                output_folder
-                    + "/"
-                    + folder_year
-                    + "-"
-                    + folder_month
-                    + "_xbrl_data.csv",
+                output_path,
                 index=False,
                 header=True
             )
         else:
-            print("I need a CSV for now...")
+            import pyarrow as pa
+            import pyarrow.dataset as ds
+            import pyarrow.parquet as pq
+
+            dictionary_cols = [c for c in ["name", "unit",
+                                           "doc_standard_type"]
+                               if c in dataframe.columns]
+            table = pa.Table.from_pandas(dataframe, preserve_index=False)
+
+            if partition_by_standard:
+                # Clear out partitions of standards no longer in the month
+                if os.path.isdir(output_path):
+                    shutil.rmtree(output_path)
+                elif os.path.exists(output_path):
+                    os.remove(output_path)
+
+                ds.write_dataset(
+                    table,
+                    output_path,
+                    format="parquet",
+                    partitioning=["doc_standard_type"],
+                    partitioning_flavor="hive",
+                    file_options=ds.ParquetFileFormat().make_write_options(
+                        use_dictionary=dictionary_cols),
+                    max_rows_per_group=row_group_size,
+                    min_rows_per_group=min(row_group_size, 65536)
+                )
+            else:
+                if os.path.isdir(output_path):
+                    shutil.rmtree(output_path)
+                pq.write_table(table, output_path,
+                               row_group_size=row_group_size,
+                               use_dictionary=dictionary_cols)
 
 
 class XbrlSubsets:
@@ -338,7 +445,9 @@ class XbrlSubsets:
             raise ValueError(("The agg_method should be: sum, mean, count, \
                                 var, std, first, last, min or max"))
         else:
-            output = df.groupby(groupby_cols).agg(agg_method)
+            # Only group by the categories present, rather than every
+            # combination of the categories of categorical columns
+            output = df.groupby(groupby_cols, observed=True).agg(agg_method)
             agg_cols.extend(groupby_cols)
             output = output[output.columns[output.columns.isin(agg_cols)]]
 
@@ -463,8 +572,79 @@ class XbrlSubsets:
 
         output = df[df[tag_col].isin(tag)]
 
+        # Drop the tags filtered out from the categories of a categorical
+        # column, so later groupbys only see the tags extracted
+        if isinstance(output[tag_col].dtype, pd.CategoricalDtype):
+            output = output.assign(**{
+                tag_col: output[tag_col].cat.remove_unused_categories()})
+
         return output
 
+    @staticmethod
+    def tag_extraction_dataset(dataset_path, wanted_tag, year=None,
+                               quarter=None, columns=None):
+        """
+        Reads the elements with the required tag(s) from a parquet dataset
+        written by XbrlCsvAppender.compact_files_by_year. The filter is
+        pushed down to pyarrow, so partitions of other years and quarters
+        are never opened and row groups whose range of names does not
+        include a tag are skipped.
+
+        Arguments:
+            dataset_path: path of the parquet dataset (str)
+            wanted_tag:   name of extracted tag(s) (str or list)
+            year:         only read this year (int)
+            quarter:      only read this quarter (int)
+            columns:      only read these columns (list)
+        Returns:
+            output: DataFrame containing only the required tag(s)
+                    (dataframe)
+        Raises:
+            TypeError: If arguments are of incorrect types
+        """
+        import pyarrow.dataset as ds
+
+        if isinstance(wanted_tag, str):
+            tag = [wanted_tag]
+        elif isinstance(wanted_tag, list):
+            tag = wanted_tag
+        else:
+            raise TypeError("The wanted_tag needs to be a string or list")
+
+        dataset = ds.dataset(dataset_path, format="parquet",
+                             partitioning="hive")
+
+        # Comparisons are checked against the row group statistics, which
+        # isin is not
+        expression = functools.reduce(
+            operator.or_, [ds.field("name") == t for t in tag])
+        if year is not None:
+            expression &= ds.field("year") == int(year)
+        if quarter is not None:
+            expression &= ds.field("quarter") == int(quarter)
+
+        # Values are only read as numbers for facts with a unit
+        read_columns = columns
+        if columns is not None and 'value' in columns \
+                and 'unit' not in columns:
+            read_columns = columns + ['unit']
+
+        output = dataset.to_table(columns=read_columns,
+                                  filter=expression).to_pandas()
+
+        # The dataset holds the same text as the csv files, which is read
+        # into the typed schema, keeping the partition columns
+        partitions = [col for col in ['year', 'quarter']
+                      if col in output.columns]
+        typed = XbrlSchema.apply(output.drop(columns=partitions))
+        for col in partitions:
+            typed[col] = output[col]
+
+        if columns is not None:
+            typed = typed[columns]
+
+        return typed
+
     @staticmethod
     def unique_entries(df, col_name, out_list=True):
         """
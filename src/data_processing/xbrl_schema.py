@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+
+from src.filing_fetcher_scraper.filing_fetcher_scraper.company_numbers \
+    import decode_company_numbers, encode_company_numbers
+
+
+class XbrlSchema:
+    """
+    The canonical schema of the table of parsed xbrl elements, used to hold
+    a table in memory with compact types and to write it back out as text.
+
+    Columns which only take a limited number of distinct values are held as
+    categoricals, dates as datetime64, the values of facts with a unit as
+    float64 with the text of every value kept in value_text, and company
+    numbers as base 36 integers. The text of dates and company numbers which
+    cannot be read is kept in a "_text" column next to them.
+    """
+
+    def __init__(self):
+        self.__init__
+
+    category_cols = ['name', 'unit', 'doc_type', 'arc_name',
+                     'doc_standard_type']
+
+    # Dates held to the day, and the upload date which also has a time
+    date_cols = ['date', 'doc_balancesheetdate', 'doc_standard_date']
+    datetime_cols = ['doc_upload_date']
+
+    crn_col = 'doc_companieshouseregisterednumber'
+
+    # Company numbers are encoded as base 36 integers in the same way as
+    # the indexes of the filing fetcher, so the codes can be compared
+    encode_crn = staticmethod(encode_company_numbers)
+    decode_crn = staticmethod(decode_company_numbers)
+
+    # The text of dates and company numbers which could not be read, so
+    # that it is written out again as it was
+    raw_cols = {col: col + '_text'
+                for col in date_cols + datetime_cols + [crn_col]}
+
+    # Columns of the typed table, in order
+    columns = ['date', 'name', 'unit', 'value', 'value_text', 'scale',
+               'decimals', 'format', 'doc_name', 'doc_type',
+               'doc_upload_date', 'arc_name', 'parsed',
+               'doc_balancesheetdate', 'doc_companieshouseregisterednumber',
+               'doc_standard_type', 'doc_standard_date',
+               'doc_standard_link'] + list(raw_cols.values())
+
+    @staticmethod
+    def read_dtypes():
+        """
+        Returns the dtypes to read a csv file of parsed xbrl elements with,
+        so that the categorical columns never take up memory as strings.
+        """
+        return {col: ('category' if col in XbrlSchema.category_cols else str)
+                for col in XbrlSchema.columns if col != 'parsed'}
+
+    @staticmethod
+    def read_csv(filepath, **kwargs):
+        """
+        Reads a csv file of parsed xbrl elements, as written by the parser,
+        the cleaner (with sep="\\t") or the appender, into the typed schema.
+
+        Arguments:
+            filepath: path of the csv file (str)
+            kwargs:   further arguments passed to pd.read_csv
+        Returns:
+            df: A dataframe of parsed elements with the typed schema
+                (dataframe)
+        Raises:
+            None
+        """
+        df = pd.read_csv(filepath, dtype=XbrlSchema.read_dtypes(),
+                         keep_default_na=False, **kwargs)
+
+        return XbrlSchema.apply(df)
+
+    @staticmethod
+    def apply(df):
+        """
+        Converts a table of parsed xbrl elements held as strings to the typed
+        schema. Columns which already have their type are left as they are.
+
+        The values of facts with a unit are held as numbers wherever they
+        can be read as one, and the text of every value is kept, so that
+        text facts which look like numbers (eg. "01234567") are written out
+        again as they were. Dates which cannot be read and company numbers
+        which are not valid are held as NaT and -1, keeping their text to be
+        written out again.
+
+        Arguments:
+            df: A dataframe of parsed elements (dataframe)
+        Returns:
+            df: The dataframe with the typed schema (dataframe)
+        Raises:
+            None
+        """
+        typed = 'value_text' in df and df['value'].dtype == np.float64
+
+        # Files parsed before a column was added hold "NA" for it
+        df = df.reindex(columns=XbrlSchema.columns, fill_value='NA')
+
+        if not typed:
+            text = df['value'].astype(str)
+            numeric = ~df['unit'].astype(str).isin(['NA', ''])
+            df['value'] = pd.to_numeric(text.where(numeric),
+                                        errors='coerce').astype(np.float64)
+            df['value_text'] = text
+
+        for col in XbrlSchema.category_cols:
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+
+        # Missing dates and company numbers are "NA", anything else which
+        # cannot be read keeps its text
+        for col in XbrlSchema.date_cols + XbrlSchema.datetime_cols:
+            if not pd.api.types.is_datetime64_any_dtype(df[col]):
+                text = df[col].astype(str)
+                df[col] = pd.to_datetime(
+                    text, errors='coerce',
+                    format='%Y-%m-%d' if col in XbrlSchema.date_cols
+                    else None)
+                df[XbrlSchema.raw_cols[col]] = \
+                    text.where(df[col].isna() & (text != 'NA'))
+
+        crn_col = XbrlSchema.crn_col
+        if not pd.api.types.is_integer_dtype(df[crn_col]):
+            text = df[crn_col].astype(str)
+            df[crn_col] = XbrlSchema.encode_crn(text)
+            df[XbrlSchema.raw_cols[crn_col]] = \
+                text.where((df[crn_col] < 0) & (text != 'NA'))
+
+        if df['parsed'].dtype != bool:
+            df['parsed'] = df['parsed'].astype(str) == 'True'
+
+        return df
+
+    @staticmethod
+    def to_text(df):
+        """
+        Converts a table with the typed schema back to the text written to
+        csv files, with each column combined with its "_text" column.
+
+        Arguments:
+            df: A dataframe of parsed elements with the typed schema
+                (dataframe)
+        Returns:
+            df: A dataframe of parsed elements as strings (dataframe)
+        Raises:
+            None
+        """
+        df = df.copy()
+
+        df['value'] = df['value_text'].where(
+            df['value_text'].notna() | df['value'].isna(),
+            df['value'].astype(str)).fillna('NA')
+        df = df.drop(columns='value_text')
+
+        for col in XbrlSchema.date_cols + XbrlSchema.datetime_cols:
+            if col in XbrlSchema.date_cols:
+                text = df[col].dt.strftime('%Y-%m-%d')
+            else:
+                text = df[col].astype(str)
+            df[col] = text.where(df[col].notna(), XbrlSchema.raw_text(df, col))
+
+        crn_col = XbrlSchema.crn_col
+        df[crn_col] = pd.Series(XbrlSchema.decode_crn(df[crn_col]),
+                                index=df.index).where(
+            df[crn_col] >= 0, XbrlSchema.raw_text(df, crn_col))
+
+        return df.drop(columns=list(XbrlSchema.raw_cols.values()))
+
+    @staticmethod
+    def raw_text(df, col):
+        """
+        Returns the text kept for the values of a column which could not be
+        read, or "NA" for those which were missing.
+
+        Arguments:
+            df:  A dataframe of parsed elements with the typed schema
+                 (dataframe)
+            col: name of the typed column (str)
+        Returns:
+            text: the text of the values (series of str)
+        Raises:
+            None
+        """
+        raw_col = XbrlSchema.raw_cols[col]
+        if raw_col not in df:
+            return pd.Series('NA', index=df.index)
+
+        return df[raw_col].fillna('NA')
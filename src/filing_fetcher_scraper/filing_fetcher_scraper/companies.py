@@ -1,48 +1,183 @@
 # -*- coding: utf-8 -*-
+import hashlib
 import json
 import os
+import tempfile
 
+import numpy as np
 import pandas as pd
 
+from .company_numbers import encode_company_numbers
 from .configuration import get_config
+from .filing_store import FilingStore
 
 config = get_config()
 
+# Columns of the BasicCompanyData file yielded for each company, in order
+COMPANY_COLUMNS = [
+    'CompanyNumber',
+    'CompanyStatus',
+    'IncorporationDate',
+    'Accounts.NextDueDate',
+    'Accounts.LastMadeUpDate',
+    'Accounts.AccountCategory'
+]
+
 _digital_reporters = None
+_already_seen = None
+
+
+def is_in_index(codes, index):
+    """
+    Returns a boolean mask of which encoded company numbers are in a sorted
+    index, using a binary search for each.
+    """
+    if len(index) == 0:
+        return np.zeros(len(codes), dtype=bool)
+
+    positions = np.searchsorted(index, codes).clip(max=len(index) - 1)
+
+    return index[positions] == codes
+
+
+def build_index(codes):
+    """
+    Returns the sorted, unique, valid codes of an index.
+    """
+    codes = np.unique(codes)
+
+    return codes[codes >= 0]
+
+
+def _index_filepath(filepath):
+    return filepath + '.crn.npz'
+
+
+def _cached_index_filepath(filepath):
+    """
+    Returns the path in INDEX_CACHE_DIR, or the temporary directory, that
+    the index of a file the fetcher does not own is saved under, named
+    after the file and a hash of its full path.
+    """
+    cache_dir = config.INDEX_CACHE_DIR or tempfile.gettempdir()
+    os.makedirs(cache_dir, exist_ok=True)
+
+    path_hash = hashlib.sha1(os.path.abspath(filepath).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f'{os.path.basename(filepath)}.{path_hash}.crn.npz')
 
 
 def digital_reporters():
+    """
+    Returns the sorted index of companies which have filed digitally.
+
+    The index is built from DIGITAL_REPORTERS_FILEPATH and saved in
+    INDEX_CACHE_DIR, rather than alongside a csv file which may be shared,
+    and is only rebuilt when the csv file changes.
+    """
     global _digital_reporters
 
     if _digital_reporters is None:
-        df = pd.read_csv(config.DIGITAL_REPORTERS_FILEPATH, dtype={"crn": str})
-        _digital_reporters = set(df.crn)
+        filepath = config.DIGITAL_REPORTERS_FILEPATH
+        index_filepath = _cached_index_filepath(filepath)
 
-    return _digital_reporters
+        if os.path.isfile(index_filepath) \
+                and os.path.getmtime(index_filepath) \
+                >= os.path.getmtime(filepath):
+            with np.load(index_filepath) as saved:
+                _digital_reporters = saved['index']
 
+        else:
+            df = pd.read_csv(filepath, usecols=['crn'], dtype={"crn": str})
+            _digital_reporters = build_index(encode_company_numbers(df.crn))
+            np.savez(index_filepath, index=_digital_reporters)
 
-_already_seen = None
+    return _digital_reporters
 
 
 def already_seen():
+    """
+    Returns the sorted index of companies already fetched, from the
+    LATEST_FILING_STORE_FILE if it is set and otherwise from the
+    LATEST_FILING_FEED_FILE.
+    """
     global _already_seen
 
     if _already_seen is None:
-        if os.path.isfile(config.LATEST_FILING_FEED_FILE):
+        if config.LATEST_FILING_STORE_FILE:
+            _already_seen = _already_seen_in_store(config.LATEST_FILING_STORE_FILE)
+        else:
+            _already_seen = _already_seen_in_feed(config.LATEST_FILING_FEED_FILE)
 
-            with open(config.LATEST_FILING_FEED_FILE) as f:
+    return _already_seen
 
-                company_numbers = []
-                for line in f:
-                    company_number = json.loads(line)['company_number']
-                    company_numbers.append(company_number)
 
-            _already_seen = set(company_numbers)
+def _load_index(index_filepath):
+    if os.path.isfile(index_filepath):
+        with np.load(index_filepath) as saved:
+            return saved['index'], int(saved['offset'])
 
-        else:
-            _already_seen = set()
+    return np.array([], dtype=np.int64), 0
 
-    return _already_seen
+
+def _already_seen_in_feed(filepath):
+    """
+    The feed file is only ever appended to, so the index is saved alongside
+    it with the number of bytes of the feed it covers. Only lines appended
+    since are read at start-up. The index is rebuilt if the feed file has
+    shrunk.
+    """
+    if not os.path.isfile(filepath):
+        return np.array([], dtype=np.int64)
+
+    index_filepath = _index_filepath(filepath)
+    index, offset = _load_index(index_filepath)
+
+    size = os.path.getsize(filepath)
+    if size < offset:
+        index, offset = np.array([], dtype=np.int64), 0
+
+    if size > offset:
+        with open(filepath, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+
+        # Leave any partly written last line for the next start-up
+        complete = data.rfind(b'\n') + 1
+        company_numbers = [json.loads(line)['company_number']
+                           for line in data[:complete].splitlines()
+                           if line.strip()]
+
+        index = build_index(np.concatenate(
+            [index, encode_company_numbers(company_numbers)]))
+        offset += complete
+        np.savez(index_filepath, index=index, offset=offset)
+
+    return index
+
+
+def _already_seen_in_store(filepath):
+    """
+    The store is only ever appended to, so the index is saved alongside it
+    with the rowid of the last row it covers, and only rows added since are
+    read at start-up. The index is rebuilt if the store has fewer rows.
+    """
+    index_filepath = _index_filepath(filepath)
+    index, offset = _load_index(index_filepath)
+
+    store = FilingStore(filepath)
+    try:
+        if store.last_rowid() < offset:
+            index, offset = np.array([], dtype=np.int64), 0
+        company_numbers, last_rowid = store.company_numbers(offset)
+    finally:
+        store.close()
+
+    if company_numbers:
+        index = build_index(np.concatenate(
+            [index, encode_company_numbers(company_numbers)]))
+        np.savez(index_filepath, index=index, offset=last_rowid)
+
+    return index
 
 
 def read_basic_company_data(filepath):
@@ -56,7 +191,7 @@ def read_basic_company_data(filepath):
         'Accounts.AccountCategory'
     ]
 
-    dfs = pd.read_csv(filepath, usecols=relevant_columns, dtype={' CompanyNumber': str}, chunksize=100000)
+    dfs = pd.read_csv(filepath, usecols=relevant_columns, dtype=str, chunksize=100000)
 
     for df in dfs:
         df = df.rename(columns={' CompanyNumber': 'CompanyNumber'})
@@ -65,28 +200,38 @@ def read_basic_company_data(filepath):
 
 
 def filter_active_and_has_filed(df):
-    return df[df.CompanyStatus.str.startswith('Active') & df['Accounts.LastMadeUpDate'].notnull()]
+    return df[df.CompanyStatus.str.startswith('Active', na=False) & df['Accounts.LastMadeUpDate'].notnull()]
 
 
-def remove_digital_reporters(df):
-    return df[~df.CompanyNumber.isin(digital_reporters())]
+def remove_digital_reporters(df, codes):
+    keep = ~is_in_index(codes, digital_reporters())
+    return df[keep], codes[keep]
 
 
-def remove_already_seen(df):
-    return df[~df.CompanyNumber.isin(already_seen())]
+def remove_already_seen(df, codes):
+    keep = ~is_in_index(codes, already_seen())
+    return df[keep], codes[keep]
 
 
 def companies_to_scrape(filepath):
-
+    """
+    Yields the companies to fetch filings for, as tuples of the values in
+    COMPANY_COLUMNS, reading the BasicCompanyData file a chunk at a time.
+    """
     for df in read_basic_company_data(filepath):
 
         df = filter_active_and_has_filed(df)
-        df = remove_digital_reporters(df)
-        df = remove_already_seen(df)
+        codes = encode_company_numbers(df.CompanyNumber.values)
+        df, codes = remove_digital_reporters(df, codes)
+        df, codes = remove_already_seen(df, codes)
+
+        # Missing values are yielded as None
+        rows = df[COMPANY_COLUMNS].astype(object)
+        rows = rows.where(rows.notnull(), None)
 
-        yield from df.to_dict(orient='records')
+        yield from rows.itertuples(index=False, name=None)
 
 
 if __name__ == '__main__':
 
-    print(len(list(companies_to_scrape(config.BASIC_COMPANY_INFO_FILEPATH))))
\ No newline at end of file
+    print(sum(1 for _ in companies_to_scrape(config.BASIC_COMPANY_INFO_FILEPATH)))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Company numbers encoded as integers.
+
+Company numbers are up to 8 characters of 0-9 and A-Z, so they are encoded
+as base 36 integers, which take a fraction of the memory of the strings and
+can be sorted and searched with numpy. This is the only encoding of company
+numbers: the scraper's indexes and the typed tables of parsed accounts
+both use it, so their codes can be compared.
+
+Only numpy and pandas are needed, so the module can be imported from
+outside the scrapy project.
+"""
+import numpy as np
+import pandas as pd
+
+CRN_WIDTH = 8
+CRN_CHARS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+_CRN_DIGITS = np.full(256, -1, dtype=np.int64)
+_CRN_DIGITS[np.frombuffer(CRN_CHARS.encode(), dtype=np.uint8)] = np.arange(36)
+_CRN_POWERS = 36 ** np.arange(CRN_WIDTH - 1, -1, -1, dtype=np.int64)
+
+
+def encode_company_numbers(company_numbers):
+    """
+    Encodes company numbers as integers, all at once.
+
+    Shorter company numbers are padded with leading zeros, so '1234567' and
+    '01234567' are the same company. Company numbers which are not valid,
+    including missing ones, are encoded as -1.
+    """
+    numbers = pd.Series(company_numbers, dtype=object).fillna('') \
+        .astype(str).str.strip().str.upper()
+    # Every company number has digits, unlike '', 'NA' or 'nan'
+    invalid = ((numbers.str.len() > CRN_WIDTH)
+               | ~numbers.str.contains('[0-9]', regex=True)).to_numpy()
+
+    # Any other characters, including non-ASCII ones which could not be
+    # encoded below, are replaced with one that is not a digit
+    numbers = numbers.str.replace('[^0-9A-Z]', '#', regex=True) \
+        .str.slice(0, CRN_WIDTH).str.zfill(CRN_WIDTH)
+
+    chars = np.array(numbers.to_numpy(), dtype='S{}'.format(CRN_WIDTH))
+    digits = _CRN_DIGITS[chars.view(np.uint8).reshape(-1, CRN_WIDTH)]
+
+    codes = digits @ _CRN_POWERS
+    codes[invalid | (digits < 0).any(axis=1)] = -1
+
+    return codes
+
+
+def decode_company_numbers(codes):
+    """
+    Decodes company numbers encoded by encode_company_numbers, padded to 8
+    characters, giving 'NA' for those which were not valid.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    digits = (np.maximum(codes, 0)[:, None] // _CRN_POWERS) % 36
+
+    chars = np.frombuffer(CRN_CHARS.encode(), dtype=np.uint8)[digits]
+    company_numbers = chars.view('S{}'.format(CRN_WIDTH)).ravel() \
+        .astype(str).astype(object)
+    company_numbers[codes < 0] = 'NA'
+
+    return company_numbers
@@ -108,6 +108,8 @@ class Config(metaclass=Singleton):
         self.BASIC_COMPANY_INFO_FILEPATH = None
         self.DIGITAL_REPORTERS_FILEPATH = None
         self.LATEST_FILING_FEED_FILE = None
+        self.LATEST_FILING_STORE_FILE = None
+        self.INDEX_CACHE_DIR = None
         self.LOG_DIR = str(Path.home().joinpath('logs'))
 
         for key, value in Config.config_provider.fetch_config():
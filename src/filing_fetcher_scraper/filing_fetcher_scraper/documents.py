@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming downloads of filed documents from the Companies House document API.
+
+The document API answers a request for a document's content with a redirect
+to a signed URL on Amazon S3, which rejects requests carrying the API key.
+The redirect is followed by hand so the key is only sent to the document
+API, and the PDF is written to disk a block at a time so memory stays flat
+however many pages a scanned filing has.
+"""
+import base64
+import hashlib
+import http.client
+import os
+import time
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin
+from urllib.request import HTTPRedirectHandler, Request, build_opener, urlopen
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+
+class _NoRedirect(HTTPRedirectHandler):
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_api_opener = build_opener(_NoRedirect)
+
+
+def document_filename(url, barcode=None):
+    """
+    Returns the filename a document is saved under: its barcode, or the SHA1
+    of its URL if it has no barcode, as FilesPipeline would name it.
+    """
+    if barcode:
+        return f'{barcode}.pdf'
+
+    return hashlib.sha1(url.encode('utf-8')).hexdigest() + '.pdf'
+
+
+def legacy_document_paths(url, dest_dir):
+    """
+    Returns the paths FilesPipeline saved a document under before the
+    document download stage: full/ and the SHA1 of its URL, with or without
+    the .pdf extension, as the content URLs of the document API have none.
+    """
+    name = hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    return [os.path.join(dest_dir, 'full', name + '.pdf'),
+            os.path.join(dest_dir, 'full', name)]
+
+
+def _acquire(limiter):
+    while True:
+        key, wait = limiter.acquire()
+        if key is not None:
+            return key
+        time.sleep(wait)
+
+
+def download_document(url, dest_dir, barcode=None, limiter=None, timeout=60, block_size=1 << 16):
+    """
+    Downloads a document to dest_dir, unless a document with the same
+    barcode is already there, or FilesPipeline has already saved it under
+    its legacy path.
+
+    Arguments:
+        url:        document API URL of the document's content (str)
+        dest_dir:   directory to save the document to (str)
+        barcode:    barcode of the filing (str)
+        limiter:    rate limiter for the document API, also providing the
+                    API key (ApiRateLimiter)
+        timeout:    seconds to wait for the server (float)
+        block_size: number of bytes to write at a time (int)
+    Returns:
+        result: url, path, size, status ("downloaded", "skipped" or
+                "failed") and error of the download (dict)
+    """
+    path = os.path.join(dest_dir, document_filename(url, barcode))
+    result = {'url': url, 'path': path, 'size': -1, 'status': 'failed', 'error': ''}
+
+    for existing in [path] + legacy_document_paths(url, dest_dir):
+        if os.path.isfile(existing):
+            result.update({'path': existing, 'size': os.path.getsize(existing), 'status': 'skipped'})
+            return result
+
+    try:
+        with _open_document(url, limiter, timeout) as response:
+            length = response.headers.get('Content-Length')
+
+            size = 0
+            with open(path + '.part', 'wb') as f:
+                for block in iter(lambda: response.read(block_size), b''):
+                    if size == 0 and not block.startswith(b'%PDF'):
+                        raise ValueError('not a PDF document')
+                    f.write(block)
+                    size += len(block)
+
+        if length is not None and size != int(length):
+            raise http.client.IncompleteRead(b'', int(length) - size)
+
+        os.replace(path + '.part', path)
+        result.update({'size': size, 'status': 'downloaded'})
+
+    except (HTTPError, URLError, OSError, ValueError, http.client.HTTPException) as e:
+        result['error'] = str(e)
+        if os.path.exists(path + '.part'):
+            os.remove(path + '.part')
+
+    return result
+
+
+def _open_document(url, limiter, timeout):
+    """
+    Requests a document's content from the document API with the API key,
+    following the redirect without it. Requests which are rate limited are
+    retried once the limiter has a token again.
+
+    Returns:
+        response:   open response with the document's content
+    """
+    while True:
+        request = Request(url, headers={'Accept': 'application/pdf'})
+
+        key = None
+        if limiter is not None:
+            key = _acquire(limiter)
+            token = base64.b64encode(f'{key}:'.encode('utf-8')).decode('ascii')
+            # Not passed on to the redirect
+            request.add_unredirected_header('Authorization', f'Basic {token}')
+
+        try:
+            response = _api_opener.open(request, timeout=timeout)
+            status, headers = response.status, response.headers
+        except HTTPError as e:
+            response = None
+            status, headers = e.code, e.headers
+            e.close()
+        except Exception:
+            if key is not None:
+                limiter.release(key)
+            raise
+
+        if key is not None:
+            remaining = headers.get('X-Ratelimit-Remaining')
+            reset = headers.get('X-Ratelimit-Reset')
+            limiter.update(key, status,
+                           None if remaining is None else int(remaining),
+                           None if reset is None else float(reset))
+            if status == 429:
+                continue
+
+        # Served directly rather than redirected
+        if response is not None:
+            return response
+
+        if status in REDIRECT_CODES and headers.get('Location'):
+            return urlopen(urljoin(url, headers['Location']), timeout=timeout)
+
+        raise HTTPError(url, status, f'document API returned {status}', headers, None)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Append-only store of the filings fetched, kept in SQLite.
+
+The database is in WAL mode so it can be read while the crawl writes to it,
+and has an index on company_number. Rows are only ever inserted, so the
+rowid of the last row read can be used to read only the rows added since.
+"""
+import json
+import sqlite3
+
+# Columns of the store, one for each field of a FilingItem
+FIELDS = [
+    'company_number',
+    'company_status',
+    'incorporation_date',
+    'accounts_next_due_date',
+    'accounts_last_made_up_date',
+    'accounts_account_category',
+    'pages',
+    'date',
+    'type',
+    'barcode',
+    'file_urls',
+    'files',
+    'made_up_date',
+    'filing_history_status'
+]
+
+# Fields stored as JSON rather than text
+JSON_FIELDS = ['file_urls', 'files']
+
+
+class FilingStore(object):
+    """Connection to the store, creating it if it does not exist."""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.connection = sqlite3.connect(filepath)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+
+        columns = ', '.join(f'"{field}" TEXT' for field in FIELDS)
+        with self.connection:
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS filings ({columns})')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS filings_company_number '
+                                    'ON filings (company_number)')
+
+    def add(self, items):
+        """Appends a batch of items to the store in a single transaction."""
+        rows = [tuple(self._column_value(item, field) for field in FIELDS) for item in items]
+
+        placeholders = ', '.join('?' for _ in FIELDS)
+        columns = ', '.join(f'"{field}"' for field in FIELDS)
+        with self.connection:
+            self.connection.executemany(f'INSERT INTO filings ({columns}) VALUES ({placeholders})', rows)
+
+    @staticmethod
+    def _column_value(item, field):
+        value = item.get(field)
+        if value is None:
+            return None
+        if field in JSON_FIELDS:
+            return json.dumps(value, default=str)
+        return str(value)
+
+    def company_numbers(self, after_rowid=0):
+        """
+        Returns the company numbers of the rows added after a rowid, with the
+        rowid of the last row.
+        """
+        rows = self.connection.execute('SELECT rowid, company_number FROM filings '
+                                       'WHERE rowid > ? ORDER BY rowid', (after_rowid,)).fetchall()
+
+        if not rows:
+            return [], after_rowid
+
+        return [company_number for _, company_number in rows], rows[-1][0]
+
+    def last_rowid(self):
+        return self.connection.execute('SELECT COALESCE(MAX(rowid), 0) FROM filings').fetchone()[0]
+
+    def has_company(self, company_number):
+        return self.connection.execute('SELECT 1 FROM filings WHERE company_number = ? LIMIT 1',
+                                       (company_number,)).fetchone() is not None
+
+    def close(self):
+        self.connection.close()
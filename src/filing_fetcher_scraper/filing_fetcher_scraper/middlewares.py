@@ -7,6 +7,11 @@
 
 from scrapy import signals
 from scrapy.exceptions import IgnoreRequest
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet.task import deferLater
+from w3lib.http import basic_auth_header
+
+from .rate_limit import shared_rate_limiter
 
 
 class FilingFetcherSpiderMiddleware(object):
@@ -108,3 +113,63 @@ class FilingFetcherDownloaderMiddleware(object):
 
     def spider_opened(self, spider):
         spider.logger.info('Spider opened: %s' % spider.name)
+
+
+class RateLimitMiddleware(object):
+    """
+    Keeps requests to the Companies House API within the quota of each API
+    key, spreading them across all the keys in ch_api_key.ini. Requests are
+    held back without blocking the crawl when every key has run out, and
+    requests which are rate limited (429) are retried. Only requests to
+    hosts in CH_API_DOMAIN are limited.
+    """
+
+    def __init__(self, limiter, domain='companieshouse.gov.uk'):
+        self.limiter = limiter
+        self.domain = domain
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        limiter = shared_rate_limiter(settings.getint('CH_RATE_LIMIT', 600),
+                                      settings.getfloat('CH_RATE_LIMIT_WINDOW', 300))
+        return cls(limiter, settings.get('CH_API_DOMAIN', 'companieshouse.gov.uk'))
+
+    def process_request(self, request, spider):
+        if not urlparse_cached(request).hostname.endswith(self.domain):
+            return None
+
+        key, wait = self.limiter.acquire()
+        if key is None:
+            # Imported here so that the reactor installed by scrapy is used
+            from twisted.internet import reactor
+            return deferLater(reactor, wait, self.process_request, request, spider)
+
+        request.meta['ch_api_key'] = key
+        request.headers['Authorization'] = basic_auth_header(key, '')
+
+        return None
+
+    def process_response(self, request, response, spider):
+        key = request.meta.pop('ch_api_key', None)
+        if key is None:
+            return response
+
+        remaining = response.headers.get('X-Ratelimit-Remaining')
+        reset = response.headers.get('X-Ratelimit-Reset')
+        self.limiter.update(key, response.status,
+                            None if remaining is None else int(remaining),
+                            None if reset is None else float(reset))
+
+        if response.status == 429:
+            spider.logger.debug(f'Rate limited, retrying {request.url}')
+            retry = request.copy()
+            retry.dont_filter = True
+            return retry
+
+        return response
+
+    def process_exception(self, request, exception, spider):
+        key = request.meta.pop('ch_api_key', None)
+        if key is not None:
+            self.limiter.release(key)
@@ -4,8 +4,101 @@
 #
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://doc.scrapy.org/en/latest/topics/item-pipeline.html
+import os
+
+from scrapy.exceptions import NotConfigured
+from twisted.internet import threads
+from twisted.internet.defer import DeferredSemaphore
+
+from .configuration import get_config
+from .documents import download_document
+from .filing_store import FilingStore
+from .rate_limit import shared_rate_limiter
 
 
 class FilingFetcherPipeline(object):
     def process_item(self, item, spider):
         return item
+
+
+class DocumentDownloadPipeline(object):
+    """
+    Streams the documents of each item to FILES_STORE in a thread, a bounded
+    number (DOCUMENT_CONCURRENT_DOWNLOADS) at a time, instead of buffering
+    whole PDFs in memory as FilesPipeline does. FILES_STORE is created when
+    the spider opens if it does not exist. Documents whose barcode is
+    already in FILES_STORE are skipped. Requests to the document API share
+    the rate limiter of RateLimitMiddleware.
+    """
+
+    def __init__(self, files_store, num_downloads, limiter):
+        self.files_store = files_store
+        self.semaphore = DeferredSemaphore(num_downloads)
+        self.limiter = limiter
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        limiter = shared_rate_limiter(settings.getint('CH_RATE_LIMIT', 600),
+                                      settings.getfloat('CH_RATE_LIMIT_WINDOW', 300))
+        return cls(settings.get('FILES_STORE'), settings.getint('DOCUMENT_CONCURRENT_DOWNLOADS', 4), limiter)
+
+    def open_spider(self, spider):
+        os.makedirs(self.files_store, exist_ok=True)
+
+    def process_item(self, item, spider):
+        if not item.get('file_urls'):
+            return item
+
+        return self.semaphore.run(threads.deferToThread, self.download_item, item, spider)
+
+    def download_item(self, item, spider):
+        item['files'] = []
+        for url in item['file_urls']:
+            result = download_document(url, self.files_store, item.get('barcode'), self.limiter)
+            if result['status'] == 'failed':
+                spider.logger.error(f"Failed to download {url}: {result['error']}")
+            item['files'].append(result)
+
+        return item
+
+
+class FilingStorePipeline(object):
+    """
+    Appends items to the FilingStore at LATEST_FILING_STORE_FILE in batches
+    of FILING_STORE_BATCH_SIZE, writing any remainder when the spider
+    closes.
+    """
+
+    def __init__(self, filepath, batch_size):
+        self.filepath = filepath
+        self.batch_size = batch_size
+        self.store = None
+        self.batch = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        filepath = get_config().LATEST_FILING_STORE_FILE
+        if not filepath:
+            raise NotConfigured('LATEST_FILING_STORE_FILE is not set')
+
+        return cls(filepath, crawler.settings.getint('FILING_STORE_BATCH_SIZE', 1000))
+
+    def open_spider(self, spider):
+        self.store = FilingStore(self.filepath)
+
+    def close_spider(self, spider):
+        self.flush()
+        self.store.close()
+
+    def process_item(self, item, spider):
+        self.batch.append(item)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+        return item
+
+    def flush(self):
+        if self.batch:
+            self.store.add(self.batch)
+            self.batch = []
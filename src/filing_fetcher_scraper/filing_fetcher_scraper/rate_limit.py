@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Rate limiting for the Companies House API.
+
+The API allows each key a fixed number of requests per window (600 per five
+minutes) and reports the requests left and the end of the window in the
+X-Ratelimit-Remaining and X-Ratelimit-Reset headers of every response.
+ApiRateLimiter keeps a bucket of tokens for each key, refilled at the end of
+each window, and corrects it from those headers so that the quota can be
+used in full by concurrent requests without hitting 429 responses.
+"""
+import configparser
+import os
+import threading
+import time
+
+API_KEY_FILEPATH = os.path.join(os.path.expanduser('~'), 'config', 'ch_api_key.ini')
+
+
+def read_api_keys(filepath=API_KEY_FILEPATH):
+    """
+    Reads the API keys from the companies_house section of an ini file. The
+    key option can hold several keys separated by commas or new lines.
+    """
+    config = configparser.ConfigParser()
+    config.read(filepath)
+
+    keys = config['companies_house']['key'].replace(',', '\n').split('\n')
+
+    return [key.strip() for key in keys if key.strip()]
+
+
+class _Bucket(object):
+
+    def __init__(self, limit):
+        self.remaining = limit
+        self.reset = 0.0
+        self.in_flight = 0
+
+
+class ApiRateLimiter(object):
+    """
+    Token buckets for one or more API keys, safe to share between threads.
+
+    Each request takes a token from the key with the most tokens left with
+    acquire, and returns the rate limit headers of its response with
+    update.
+    """
+
+    def __init__(self, keys, limit=600, window=300.0, clock=time.time):
+        self.limit = limit
+        self.window = window
+        self.clock = clock
+        self.buckets = {key: _Bucket(limit) for key in keys}
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes a token for a request.
+
+        Returns:
+            key:    API key to make the request with, or None if every key
+                    has run out of tokens (str)
+            wait:   seconds until a token is available if key is None (float)
+        """
+        with self.lock:
+            now = self.clock()
+            for bucket in self.buckets.values():
+                # Refill at the end of the window, assuming a new window
+                # starts now until the API says otherwise
+                if now >= bucket.reset:
+                    bucket.remaining = self.limit
+                    bucket.reset = now + self.window
+
+            key, bucket = max(self.buckets.items(),
+                              key=lambda item: item[1].remaining)
+            if bucket.remaining <= 0:
+                return None, max(0.0, min(b.reset for b in
+                                          self.buckets.values()) - now)
+
+            bucket.remaining -= 1
+            bucket.in_flight += 1
+
+            return key, 0.0
+
+    def update(self, key, status, remaining=None, reset=None):
+        """
+        Corrects the tokens of a key from the response to a request made
+        with it.
+
+        Arguments:
+            key:        API key the request was made with (str)
+            status:     HTTP status of the response (int)
+            remaining:  value of the X-Ratelimit-Remaining header, if any
+                        (int)
+            reset:      value of the X-Ratelimit-Reset header, the end of
+                        the window as a unix time, if any (float)
+        Returns:
+            None
+        Raises:
+            None
+        """
+        with self.lock:
+            bucket = self.buckets[key]
+            bucket.in_flight = max(0, bucket.in_flight - 1)
+
+            if status == 429:
+                bucket.remaining = 0
+                if reset is not None:
+                    bucket.reset = reset
+                return
+
+            if remaining is None or reset is None:
+                return
+
+            if reset >= bucket.reset + self.window / 2:
+                # A later window than expected, in which requests still in
+                # flight may not yet be counted by the API
+                bucket.remaining = max(0, remaining - bucket.in_flight)
+            else:
+                # Tokens are taken as requests are made, so the API only
+                # reports fewer when the key is also used elsewhere
+                bucket.remaining = min(bucket.remaining, remaining)
+            bucket.reset = reset
+
+    def release(self, key):
+        """
+        Marks a request which got no response as no longer in flight. Its
+        token is not returned, as the API may have counted it.
+        """
+        with self.lock:
+            bucket = self.buckets[key]
+            bucket.in_flight = max(0, bucket.in_flight - 1)
+
+
+_shared_limiter = None
+
+
+def shared_rate_limiter(limit=600, window=300.0):
+    """
+    Returns the rate limiter shared by everything in the process that calls
+    the API with the keys in ch_api_key.ini, creating it on the first call.
+    """
+    global _shared_limiter
+
+    if _shared_limiter is None:
+        _shared_limiter = ApiRateLimiter(read_api_keys(), limit, window)
+
+    return _shared_limiter
@@ -30,12 +30,19 @@ USER_AGENT = 'office_for_national_statistics_filing_fetcher (+https://www.ons.go
 ROBOTSTXT_OBEY = False
 
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
-CONCURRENT_REQUESTS = 1
+# Requests are kept within the API quota by RateLimitMiddleware
+CONCURRENT_REQUESTS = 8
 
 # Configure a delay for requests for the same website (default: 0)
 # See https://doc.scrapy.org/en/latest/topics/settings.html#download-delay
 # See also autothrottle settings and docs
-DOWNLOAD_DELAY = 0.5
+DOWNLOAD_DELAY = 0
+
+# Companies House API quota for each API key: requests per window (seconds)
+CH_RATE_LIMIT = 600
+CH_RATE_LIMIT_WINDOW = 300
+# Hosts whose requests count against the quota
+CH_API_DOMAIN = 'companieshouse.gov.uk'
 # The download delay setting will honor only one of:
 #CONCURRENT_REQUESTS_PER_DOMAIN = 16
 #CONCURRENT_REQUESTS_PER_IP = 16
@@ -62,6 +69,8 @@ DOWNLOAD_DELAY = 0.5
 # See https://doc.scrapy.org/en/latest/topics/downloader-middleware.html
 DOWNLOADER_MIDDLEWARES = {
     'filing_fetcher_scraper.middlewares.FilingFetcherDownloaderMiddleware': 543,
+    # Sees responses before the retry and redirect middlewares
+    'filing_fetcher_scraper.middlewares.RateLimitMiddleware': 650,
 }
 
 # Enable or disable extensions
@@ -73,9 +82,17 @@ DOWNLOADER_MIDDLEWARES = {
 # Configure item pipelines
 # See https://doc.scrapy.org/en/latest/topics/item-pipeline.html
 ITEM_PIPELINES = {
-    'scrapy.pipelines.files.FilesPipeline': 300,
+    'filing_fetcher_scraper.pipelines.DocumentDownloadPipeline': 300,
+    # Only enabled when LATEST_FILING_STORE_FILE is set in the config
+    'filing_fetcher_scraper.pipelines.FilingStorePipeline': 400,
 }
 
+# Number of documents downloaded at a time by DocumentDownloadPipeline
+DOCUMENT_CONCURRENT_DOWNLOADS = 4
+
+# Number of items written to the filing store at a time
+FILING_STORE_BATCH_SIZE = 1000
+
 #FILES_STORE = os.path.join(os.path.expanduser('~'), 'data', 'companies_house', 'pdfs')
 FILES_STORE = "/shares/data/20200519_companies_house_accounts/pdf_scraped_data/"
 
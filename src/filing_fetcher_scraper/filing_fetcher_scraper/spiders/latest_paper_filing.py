@@ -1,22 +1,17 @@
 # -*- coding: utf-8 -*-
-import configparser
 import json
 import logging
-import os
 import scrapy
 
 from ..items import FilingItem
-from ..companies import companies_to_scrape
+from ..companies import COMPANY_COLUMNS, companies_to_scrape
 from ..configuration import get_config
+from ..rate_limit import read_api_keys
 
 
 def fetch_auth():
-    auth_config_path = os.path.join(os.path.expanduser('~'), 'config', 'ch_api_key.ini')
-
-    config = configparser.ConfigParser()
-    config.read(auth_config_path)
-
-    return config['companies_house']['key']
+    # RateLimitMiddleware spreads requests across all of the keys
+    return read_api_keys()[0]
 
 
 CH_AUTH = fetch_auth()
@@ -41,7 +36,8 @@ class LatestPaperFilingSpider(scrapy.spiders.CrawlSpider):
 
         cha_companies_to_scrape = companies_to_scrape(config.BASIC_COMPANY_INFO_FILEPATH)
 
-        for i, company_info in enumerate(cha_companies_to_scrape):
+        for i, company_row in enumerate(cha_companies_to_scrape):
+            company_info = dict(zip(COMPANY_COLUMNS, company_row))
             logger.debug(f"Request {i} - {company_info}")
             company_number = company_info["CompanyNumber"]
 
@@ -1,7 +1,11 @@
-from os import listdir, walk
-from os.path import isfile, exists, getsize, getmtime, join
+from os import listdir, scandir, walk
+from os.path import basename, isdir, isfile, exists, getsize, getmtime, \
+    join, splitext
 from datetime import datetime
+import concurrent.futures
+import json
 import zipfile
+import zlib
 
 
 class XbrlValidatorMethods:
@@ -118,7 +122,8 @@ class XbrlValidatorMethods:
                     zip file - size check failed!")
 
                 # Check to see if all files have been extracted correctly
-                files_in_zip = set(zipfile.ZipFile(z).namelist())
+                with zipfile.ZipFile(z) as zf:
+                    files_in_zip = set(zf.namelist())
                 files_in_extracted_folder = set([f for f in listdir(e)])
                 diff = files_in_zip.difference(files_in_extracted_folder)
 
@@ -133,3 +138,161 @@ class XbrlValidatorMethods:
                 print("Specified directory to zip files does not exist!")
             if not exists(filepath_to_extracted_files):
                 print("Specified directory to extracted files does not exist!")
+
+    @staticmethod
+    def validate_extracted_archives(filepath_to_zip_files,
+                                    filepath_to_extracted_files,
+                                    report_path=None, num_threads=None,
+                                    check_crc=False):
+        """
+        Validates that each zip file in a directory has been fully extracted
+        to the folder of the same name in another directory, as written by
+        DataProcessing.extract_compressed_files.
+
+        The names and uncompressed sizes in each archive's central directory
+        are compared against the extracted tree, so no member has to be
+        decompressed. Archives are validated in parallel by a pool of
+        threads. Optionally the CRC32 of each extracted file whose size
+        matches is also recalculated and compared against the archive.
+
+        Arguments:
+            filepath_to_zip_files:        source directory of zip files (str)
+            filepath_to_extracted_files:  destination directory of extracted
+                                          folders (str)
+            report_path:    path to write a JSON report of the results to,
+                            if any (str)
+            num_threads:    number of threads to validate with, defaults to
+                            the ThreadPoolExecutor default (int)
+            check_crc:      whether to recalculate the CRC32 of extracted
+                            files (bool)
+        Returns:
+            report: results of validate_archive for each archive (list)
+        Raises:
+            None
+        """
+        if not isdir(filepath_to_zip_files):
+            print("Specified directory to zip files does not exist!")
+            return []
+        if not isdir(filepath_to_extracted_files):
+            print("Specified directory to extracted files does not exist!")
+            return []
+
+        archives = sorted(join(filepath_to_zip_files, f)
+                          for f in listdir(filepath_to_zip_files)
+                          if f.endswith('.zip'))
+        tasks = [(a, join(filepath_to_extracted_files,
+                          splitext(basename(a))[0])) for a in archives]
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=num_threads) as executor:
+            report = list(executor.map(
+                lambda task: XbrlValidatorMethods.validate_archive(
+                    *task, check_crc=check_crc), tasks))
+
+        for result in report:
+            if result['ok']:
+                print("Validated " + result['archive'] + " - OK")
+            else:
+                print("Validated " + result['archive'] + " - "
+                      + ", ".join("{} {}".format(len(result[k]), k)
+                                  for k in ['missing', 'truncated',
+                                            'corrupt', 'extra']
+                                  if result[k])
+                      + (" " + result['error'] if result['error'] else ""))
+
+        if report_path is not None:
+            with open(report_path, "w") as f:
+                json.dump(report, f, indent=1)
+            print("Validation report written to " + report_path)
+
+        return report
+
+    @staticmethod
+    def validate_archive(archive, directory, check_crc=False):
+        """
+        Compares the central directory of a zip archive against the folder
+        it was extracted to. Run by each thread of
+        validate_extracted_archives.
+
+        Arguments:
+            archive:    path of the zip archive (str)
+            directory:  folder the archive was extracted to (str)
+            check_crc:  whether to recalculate the CRC32 of extracted files
+                        whose size matches the archive (bool)
+        Returns:
+            result: the archive and folder, the number of members, the
+                    missing, truncated (size differs), corrupt (CRC32
+                    differs) and extra files, any error, and whether the
+                    archive passed (dict)
+        Raises:
+            None
+        """
+        result = {'archive': archive, 'directory': directory, 'members': 0,
+                  'missing': [], 'truncated': [], 'corrupt': [],
+                  'extra': [], 'error': "", 'ok': False}
+
+        try:
+            with zipfile.ZipFile(archive) as zf:
+                infos = [info for info in zf.infolist()
+                         if not info.is_dir()]
+        except (OSError, zipfile.BadZipFile) as e:
+            result['error'] = str(e)
+            return result
+        result['members'] = len(infos)
+
+        if not isdir(directory):
+            result['missing'] = [info.filename for info in infos]
+            result['error'] = "extracted folder not found"
+            return result
+
+        extracted = XbrlValidatorMethods.scan_tree(directory)
+
+        for info in infos:
+            size = extracted.pop(info.filename, None)
+            if size is None:
+                result['missing'].append(info.filename)
+            elif size != info.file_size:
+                result['truncated'].append(
+                    {'name': info.filename, 'expected': info.file_size,
+                     'actual': size})
+            elif check_crc:
+                crc = 0
+                with open(join(directory, info.filename), "rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        crc = zlib.crc32(block, crc)
+                if crc != info.CRC:
+                    result['corrupt'].append(info.filename)
+
+        result['extra'] = sorted(extracted)
+        result['ok'] = not (result['missing'] or result['truncated']
+                            or result['corrupt'] or result['extra'])
+
+        return result
+
+    @staticmethod
+    def scan_tree(directory):
+        """
+        Lists the files in a directory and its sub-directories with their
+        sizes, using the file types and sizes returned by scandir.
+
+        Arguments:
+            directory:  directory to scan (str)
+        Returns:
+            files:  sizes of the files keyed by their path relative to the
+                    directory, with "/" separators as in zip archives (dict)
+        Raises:
+            None
+        """
+        files = {}
+        stack = [(directory, "")]
+        while stack:
+            path, prefix = stack.pop()
+            with scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, prefix + entry.name + "/"))
+                    else:
+                        files[prefix + entry.name] = \
+                            entry.stat(follow_symlinks=False).st_size
+
+        return files
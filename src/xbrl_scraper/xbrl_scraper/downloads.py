@@ -0,0 +1,436 @@
+# -*- coding: utf-8 -*-
+"""
+Resumable downloads of the monthly accounts archives.
+
+Archives are streamed to a .part file which is resumed with an HTTP Range
+request if the connection drops, and only moved into place once its size
+and checksums have been verified. The Range request is made conditional on
+the ETag or Last-Modified of the archive the .part file was started from
+(If-Range), so an archive which has changed since is downloaded again from
+the start rather than appended to the old one. A bounded number of archives are fetched
+at a time, spaced out by a throttle which adapts to the server's latency in
+the same way as Scrapy's AutoThrottle extension.
+
+A download index records the ETag, Last-Modified, size and path of every
+archive downloaded, so an archive which has not changed on the server costs
+a single conditional HEAD request rather than downloading it again.
+"""
+from os.path import exists, getsize, join
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+import concurrent.futures
+import hashlib
+import http.client
+import json
+import os
+import threading
+import time
+import zipfile
+
+
+class DownloadThrottle:
+    """
+    Spaces out the start of requests shared between threads. The delay
+    between requests follows the latency of the server, as in Scrapy's
+    AutoThrottle: it moves halfway towards latency / target_concurrency
+    after each response, never below that target, and is never reduced by
+    an error response.
+    """
+
+    def __init__(self, start_delay=5.0, max_delay=60.0,
+                 target_concurrency=1.0, min_delay=0.0):
+        self.delay = start_delay
+        self.max_delay = max_delay
+        self.min_delay = min_delay
+        self.target_concurrency = target_concurrency
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """
+        Blocks the calling thread until its turn to start a request.
+        """
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.delay
+
+        if start > now:
+            time.sleep(start - now)
+
+    def feedback(self, latency, ok=True):
+        """
+        Adjusts the delay from the latency of a response.
+
+        Arguments:
+            latency:    seconds taken to receive the response headers (float)
+            ok:         whether the response was successful (bool)
+        Returns:
+            None
+        Raises:
+            None
+        """
+        with self.lock:
+            target = latency / self.target_concurrency
+            delay = max(target, (self.delay + target) / 2.0)
+            delay = min(max(self.min_delay, delay), self.max_delay)
+            if ok or delay > self.delay:
+                self.delay = delay
+
+
+class DownloadIndex:
+    """
+    Persistent index of downloaded files keyed by URL, stored as JSON. Each
+    entry holds the ETag, Last-Modified, size, SHA1 and path of the file,
+    and the validator of any .part file left by an unfinished download.
+    The index is saved after every change and is safe to share between
+    threads.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if exists(index_path):
+            with open(index_path) as f:
+                self.entries = json.load(f)
+
+    def get(self, url):
+        """
+        Returns the entry of a URL, or None if it has not been downloaded.
+        """
+        with self.lock:
+            return self.entries.get(url)
+
+    def record(self, url, entry):
+        """
+        Records the entry of a URL and saves the index.
+
+        Arguments:
+            url:    URL of the file (str)
+            entry:  etag, last_modified, size, sha1 and path of the file
+                    (dict)
+        Returns:
+            None
+        Raises:
+            OSError: If the index cannot be written
+        """
+        with self.lock:
+            self.entries[url] = entry
+            self._save()
+
+    def record_part(self, url, validator):
+        """
+        Records the ETag or Last-Modified of the archive the .part file of a
+        URL was started from, which resuming it is conditional on, and
+        saves the index.
+
+        Arguments:
+            url:        URL of the file (str)
+            validator:  ETag or Last-Modified of the file, if any (str)
+        Returns:
+            None
+        Raises:
+            OSError: If the index cannot be written
+        """
+        with self.lock:
+            entry = dict(self.entries.get(url, {}))
+            entry['part_validator'] = validator
+            self.entries[url] = entry
+            self._save()
+
+    def _save(self):
+        with open(self.index_path + ".tmp", "w") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(self.index_path + ".tmp", self.index_path)
+
+
+def is_unchanged(url, entry, throttle=None, timeout=60):
+    """
+    Checks whether a file recorded in the download index is still on disk
+    and unchanged on the server, with a HEAD request made conditional on
+    the ETag and Last-Modified recorded for it.
+
+    Arguments:
+        url:        URL of the file (str)
+        entry:      entry of the URL in the download index (dict)
+        throttle:   throttle shared by all downloads, if any
+                    (DownloadThrottle)
+        timeout:    seconds to wait for the server (float)
+    Returns:
+        True if the file does not need downloading again (bool)
+    Raises:
+        None
+    """
+    if not exists(entry['path']) or getsize(entry['path']) != entry['size']:
+        return False
+
+    headers = {}
+    if entry.get('etag'):
+        headers["If-None-Match"] = entry['etag']
+    if entry.get('last_modified'):
+        headers["If-Modified-Since"] = entry['last_modified']
+    if not headers:
+        return False
+
+    if throttle is not None:
+        throttle.wait()
+    start = time.monotonic()
+    try:
+        with urlopen(Request(url, headers=headers, method="HEAD"),
+                     timeout=timeout) as response:
+            if throttle is not None:
+                throttle.feedback(time.monotonic() - start)
+            response_headers = response.headers
+    except HTTPError as e:
+        if throttle is not None:
+            throttle.feedback(time.monotonic() - start, ok=e.code == 304)
+        return e.code == 304
+    except (URLError, OSError, http.client.HTTPException):
+        return False
+
+    # Servers which ignore conditional headers still report the validators
+    length = response_headers.get("Content-Length")
+    return response_headers.get("ETag") == entry.get('etag') \
+        and response_headers.get("Last-Modified") \
+        == entry.get('last_modified') \
+        and (length is None or int(length) == entry['size'])
+
+
+def archive_filename(url):
+    """
+    Returns the filename an archive is stored under, which is the basename
+    of its URL as in XbrlScraperPipeline.file_path.
+    """
+    return url.split("/")[-1]
+
+
+def download_file(url, dest_dir, throttle=None, expected_sha1=None,
+                  verify_zip=True, retries=5, timeout=60,
+                  block_size=1 << 20, index=None, backoff=1.0,
+                  max_backoff=60.0):
+    """
+    Downloads a file to a directory, resuming any .part file left by a
+    previous attempt with a Range request. A dropped connection is retried
+    from where it stopped, after a wait which doubles with each attempt.
+    Resuming is conditional on the file being the one the .part file was
+    started from, and the download starts again if it has changed.
+    Once complete the size is checked against the
+    size reported by the server, the SHA1 against expected_sha1 if given,
+    and the CRC32 of every member if the file is a zip archive.
+
+    If a download index is given, files it records which are unchanged on
+    the server are skipped, and each file downloaded is added to it. The
+    validator of a .part file is kept in it too, so that a later call can
+    resume it safely.
+
+    Arguments:
+        url:            URL of the file (str)
+        dest_dir:       directory to save the file to (str)
+        throttle:       throttle shared by all downloads, if any
+                        (DownloadThrottle)
+        expected_sha1:  SHA1 hex digest the file should have, if known (str)
+        verify_zip:     whether to test the members of zip archives (bool)
+        retries:        number of times to retry after an error (int)
+        timeout:        seconds to wait for the server (float)
+        block_size:     number of bytes to read at a time (int)
+        index:          download index to check and update, if any
+                        (DownloadIndex)
+        backoff:        seconds to wait before the first retry (float)
+        max_backoff:    most seconds to wait before a retry (float)
+    Returns:
+        result: url, path, size, sha1, status ("downloaded", "unchanged" or
+                "failed") and error of the download (dict)
+    Raises:
+        None
+    """
+    path = join(dest_dir, archive_filename(url))
+    part = path + ".part"
+    result = {'url': url, 'path': path, 'size': -1, 'sha1': "",
+              'status': "failed", 'error': ""}
+
+    entry = None if index is None else index.get(url)
+    if entry is not None and 'path' in entry \
+            and is_unchanged(url, entry, throttle, timeout):
+        result.update({'path': entry['path'], 'size': entry['size'],
+                       'sha1': entry['sha1'], 'status': "unchanged"})
+        return result
+
+    # The validator of the file the .part file was started from
+    resume = {'validator': None if entry is None
+              else entry.get('part_validator')}
+
+    total, headers = None, {}
+    for attempt in range(retries + 1):
+        if attempt > 0:
+            time.sleep(min(backoff * 2 ** (attempt - 1), max_backoff))
+        try:
+            total, headers = _fetch(url, part, throttle, timeout,
+                                    block_size, resume)
+            break
+        except (HTTPError, URLError, OSError,
+                http.client.HTTPException) as e:
+            result['error'] = str(e)
+            if index is not None and exists(part):
+                index.record_part(url, resume['validator'])
+            if isinstance(e, HTTPError) and 400 <= e.code < 500 \
+                    and e.code != 416:
+                return result
+    else:
+        return result
+
+    size = getsize(part)
+    if total is not None and size != total:
+        if size > total:
+            os.remove(part)
+        result['error'] = "expected {} bytes, got {}".format(total, size)
+        return result
+
+    sha1 = hashlib.sha1()
+    with open(part, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha1.update(block)
+    if expected_sha1 is not None and sha1.hexdigest() != expected_sha1:
+        os.remove(part)
+        result['error'] = "SHA1 mismatch"
+        return result
+
+    if verify_zip and path.endswith(".zip"):
+        try:
+            with zipfile.ZipFile(part) as zf:
+                bad = zf.testzip()
+        except zipfile.BadZipFile as e:
+            bad = str(e)
+        if bad is not None:
+            os.remove(part)
+            result['error'] = "bad zip archive: " + bad
+            return result
+
+    os.replace(part, path)
+    result.update({'size': size, 'sha1': sha1.hexdigest(),
+                   'status': "downloaded", 'error': ""})
+
+    if index is not None:
+        index.record(url, {'etag': headers.get("ETag"),
+                           'last_modified': headers.get("Last-Modified"),
+                           'size': size, 'sha1': result['sha1'],
+                           'path': path})
+
+    return result
+
+
+def _validator(headers):
+    """
+    Returns the validator of a response to make a Range request conditional
+    on with If-Range: its ETag, unless it is weak, or else its
+    Last-Modified.
+    """
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+
+def _fetch(url, part, throttle, timeout, block_size, resume):
+    """
+    Makes one attempt at downloading the rest of a .part file. The Range
+    request is made conditional on resume["validator"], which is updated
+    with the validator of the file being written.
+
+    Returns:
+        total:      full size of the file reported by the server, if any
+                    (int)
+        headers:    headers of the response (http.client.HTTPMessage)
+    """
+    offset = getsize(part) if exists(part) else 0
+    headers = {}
+    if offset:
+        headers["Range"] = "bytes={}-".format(offset)
+        # A server holding a different file sends all of it with a 200
+        if resume['validator']:
+            headers["If-Range"] = resume['validator']
+
+    if throttle is not None:
+        throttle.wait()
+    start = time.monotonic()
+
+    try:
+        response = urlopen(Request(url, headers=headers), timeout=timeout)
+    except HTTPError as e:
+        if throttle is not None:
+            throttle.feedback(time.monotonic() - start, ok=False)
+        # The .part file already holds the whole file
+        content_range = e.headers.get("Content-Range", "")
+        if e.code == 416 and content_range.endswith("/" + str(offset)):
+            return offset, e.headers
+        # Otherwise start again from scratch next time
+        if e.code == 416:
+            os.remove(part)
+        raise
+
+    with response:
+        if throttle is not None:
+            throttle.feedback(time.monotonic() - start)
+
+        length = response.headers.get("Content-Length")
+        content_range = response.headers.get("Content-Range")
+        if response.status == 206 and content_range is not None:
+            first, total = content_range.split(" ")[-1].split("/")
+            if int(first.split("-")[0]) != offset:
+                raise http.client.HTTPException(
+                    "unexpected Content-Range " + content_range)
+            total = None if total == "*" else int(total)
+            # A server which ignores If-Range sends part of the new file
+            validator = _validator(response.headers)
+            if resume['validator'] and validator \
+                    and validator != resume['validator']:
+                os.remove(part)
+                raise http.client.HTTPException(
+                    "file changed since the download started")
+            mode = "ab"
+        else:
+            # The server ignored the Range header, or the file has changed
+            # since the .part file was started, so start again
+            total = None if length is None else int(length)
+            mode = "wb"
+
+        if mode == "wb" or not resume['validator']:
+            resume['validator'] = _validator(response.headers)
+
+        received = 0
+        with open(part, mode) as f:
+            for block in iter(lambda: response.read(block_size), b""):
+                f.write(block)
+                received += len(block)
+
+        # A dropped connection can end the body early without an error
+        if length is not None and received < int(length):
+            raise http.client.IncompleteRead(b"", int(length) - received)
+
+        headers = response.headers
+
+    return total, headers
+
+
+def download_files(urls, dest_dir, num_downloads=2, throttle=None,
+                   **kwargs):
+    """
+    Downloads files with download_file, a bounded number at a time.
+
+    Arguments:
+        urls:           URLs of the files (list)
+        dest_dir:       directory to save the files to (str)
+        num_downloads:  number of files to download at a time (int)
+        throttle:       throttle shared by all downloads, if any
+                        (DownloadThrottle)
+        kwargs:         further arguments for download_file
+    Returns:
+        results: result of download_file for each URL, in order (list)
+    Raises:
+        None
+    """
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=num_downloads) as executor:
+        return list(executor.map(
+            lambda url: download_file(url, dest_dir, throttle, **kwargs),
+            urls))
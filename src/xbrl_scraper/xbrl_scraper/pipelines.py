@@ -5,11 +5,26 @@
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
+import hashlib
+import os
+
 from scrapy.pipelines.files import FilesPipeline
+from twisted.internet import threads
+from twisted.internet.defer import DeferredSemaphore
+
+from .downloads import DownloadIndex, DownloadThrottle, download_file
 
 class XbrlScraperPipeline(FilesPipeline):
+    """
+    Downloads the archives of each item with scrapy's FilesPipeline, storing
+    them under their filename. Each archive downloaded is recorded in the
+    same download index (download_index.json) in the scraped directory as
+    XbrlResumablePipeline uses.
+    """
+
+    index = None
 
-    def file_path(self, request, response=None, info=None):
+    def file_path(self, request, response=None, info=None, *, item=None):
 
         """
         Ensures the filename of each file is as shown on the target
@@ -20,6 +35,7 @@ class XbrlScraperPipeline(FilesPipeline):
             request: Scraped URL
             response: web page scraped from website crawled by scraper
             info
+            item: item the file belongs to
         Returns:
             filename :  The filename of the target file extracted from
                         the URL
@@ -32,3 +48,103 @@ class XbrlScraperPipeline(FilesPipeline):
         print("URL:")
         print(url)
         return filename
+
+    def file_downloaded(self, response, request, info, *, item=None):
+
+        """
+        Records a downloaded archive in the download index before it is
+        stored. An archive which then fails to be stored is not on disk, so
+        is downloaded again rather than being taken as unchanged
+
+        Arguments:
+            self:
+            response: response holding the archive
+            request: request of the archive
+            info: state of the pipeline for the spider
+            item: item the archive belongs to
+        Returns:
+            checksum :  The checksum of the archive given by FilesPipeline
+        Raises:
+            None
+        """
+
+        spider = info.spider
+        if self.index is None:
+            self.index = DownloadIndex(spider.filepath
+                                       + "download_index.json")
+
+        path = os.path.join(self.store.basedir,
+                            self.file_path(request, response, info))
+        self.index.record(request.url, {
+            'etag': response.headers.get("ETag", b"").decode() or None,
+            'last_modified':
+                response.headers.get("Last-Modified", b"").decode() or None,
+            'size': len(response.body),
+            'sha1': hashlib.sha1(response.body).hexdigest(),
+            'path': path})
+
+        return super().file_downloaded(response, request, info, item=item)
+
+
+class XbrlResumablePipeline:
+    """
+    Downloads the archives of each item with resumable Range requests in a
+    thread, so that a bounded number of archives are fetched at a time
+    without blocking the crawl. Used in place of XbrlScraperPipeline when
+    xbrl_scraper_download_mode is "resumable".
+
+    Archives are recorded in a download index (download_index.json) in the
+    scraped directory, and archives which have not changed on the server
+    since they were downloaded are skipped after a conditional HEAD request.
+    """
+
+    def __init__(self, num_downloads, throttle):
+        self.semaphore = DeferredSemaphore(num_downloads)
+        self.throttle = throttle
+        self.index = None
+
+    def open_spider(self, spider):
+        self.index = DownloadIndex(spider.filepath + "download_index.json")
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        throttle = DownloadThrottle(
+            settings.getfloat('AUTOTHROTTLE_START_DELAY', 5.0),
+            settings.getfloat('AUTOTHROTTLE_MAX_DELAY', 60.0),
+            settings.getfloat('AUTOTHROTTLE_TARGET_CONCURRENCY', 1.0),
+            settings.getfloat('DOWNLOAD_DELAY', 0.0))
+        return cls(settings.getint('XBRL_CONCURRENT_DOWNLOADS', 2), throttle)
+
+    def process_item(self, item, spider):
+        return self.semaphore.run(threads.deferToThread, self.download_item,
+                                  item, spider)
+
+    def download_item(self, item, spider):
+        """
+        Downloads each of the files of an item, recording the results in
+        the item's files field.
+
+        Arguments:
+            self:
+            item: item yielded by the spider (XbrlScraperItem)
+            spider: spider which yielded the item
+        Returns:
+            item :  The item with the results of its downloads
+        Raises:
+            None
+        """
+        item['files'] = []
+        for url in item['file_urls']:
+            result = download_file(url, spider.filepath, self.throttle,
+                                   index=self.index)
+            if result['status'] == "unchanged":
+                spider.logger.info("Unchanged since last download " + url)
+            elif result['status'] == "downloaded":
+                spider.logger.info("Downloaded " + url)
+            else:
+                spider.logger.error("Failed to download " + url + ": "
+                                    + result['error'])
+            item['files'].append(result)
+
+        return item
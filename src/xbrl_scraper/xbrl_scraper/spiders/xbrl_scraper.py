@@ -1,15 +1,14 @@
 from os import listdir, chdir
 from os.path import isfile, join
 from scrapy.spiders import CrawlSpider
-import hashlib
 import scrapy
-import time
-import random
 import argparse
 import sys
 import cv2
 import configparser
 
+from ..downloads import archive_filename
+
 
 class XbrlScraperItem(scrapy.Item):
     file_urls = scrapy.Field()
@@ -31,6 +30,22 @@ class XBRLSpider(CrawlSpider):
     filepath = config.get('xbrl_web_scraper_args', 'scraped_dir')
     filepath += "/"
 
+    # Download archives with resumable Range requests instead of scrapy's
+    # FilesPipeline
+    download_mode = config.get('xbrl_web_scraper_args',
+                               'xbrl_scraper_download_mode',
+                               fallback='files')
+    if download_mode == "resumable":
+        custom_settings = {
+            'ITEM_PIPELINES': {
+                'xbrl_scraper.pipelines.XbrlResumablePipeline': 300},
+            'XBRL_CONCURRENT_DOWNLOADS': config.getint(
+                'xbrl_web_scraper_args', 'xbrl_scraper_num_downloads',
+                fallback=2)
+        }
+
+    _downloaded_files = None
+
     def start_requests(self):
         """
         Initiates scrapy requests for all urls in start_urls
@@ -38,6 +53,16 @@ class XBRLSpider(CrawlSpider):
         for url in self.start_urls:
             yield scrapy.Request(url=url, callback=self.parse)
 
+    def downloaded_files(self):
+        """
+        Returns the names of the files in the scraped directory, listing the
+        directory only on the first call
+        """
+        if self._downloaded_files is None:
+            self._downloaded_files = {f for f in listdir(self.filepath)
+                                      if isfile(join(self.filepath, f))}
+        return self._downloaded_files
+
     def parse(self, response):
         """
         Extracts all zip files from the scraped website given by the variable
@@ -54,10 +79,6 @@ class XBRLSpider(CrawlSpider):
         Raises:
             None
         """
-        # Get a list of all filenames excluding directories and file extensions
-        files = [f.split(".")[0] for f in listdir(self.filepath)
-                 if isfile(join(self.filepath, f))]
-        
         # Extract all links from the web page (the response)
         links = response.xpath('//body//a/@href').extract()
 
@@ -66,21 +87,21 @@ class XBRLSpider(CrawlSpider):
         links = [response.urljoin(link) for link in links
                  if link.split('.')[-1] == "zip"]
 
-        # Filter list of links to exclude those whose files have already been
-        # downloaded
-        # This is based on a comparison between the existing files which have
-        # SHA1 hashed filenames and the SHA1 hashes of the scraped URLs
-        filtered_links = [link for link in links if
-                          hashlib.sha1(link.encode('utf-8')).hexdigest()
-                          not in files]
-
-        # Yield items for download
+        # In resumable mode every link is passed on, and the pipeline checks
+        # its download index for archives which have not changed.
+        # Otherwise filter out links whose files have already been
+        # downloaded, which XbrlScraperPipeline stores under the basename
+        # of their URL
+        if self.download_mode == "resumable":
+            filtered_links = links
+        else:
+            files = self.downloaded_files()
+            filtered_links = [link for link in links
+                              if archive_filename(link) not in files]
+
+        # Downloads are spaced out by AutoThrottle rather than by sleeping
         for link in filtered_links:
 
-            # Random sleep to avoid stressing the target server and to
-            # ensure all data in the zip files is downloaded
-            time.sleep((random.random() * 2.0) + 3.0)
-
             #if link == 'http://download.companieshouse.gov.uk/\
             # Accounts_Bulk_Data-2020-05-19.zip':
             #if link == 'http://download.companieshouse.gov.uk/archive\
@@ -91,7 +112,3 @@ class XBRLSpider(CrawlSpider):
         #yield XbrlScraperItem(file_urls=
         # ['http://download.companieshouse.gov.uk\
         # /Accounts_Bulk_Data-2020-05-19.zip'])
-
-        # 0c393a225a7afbfaa3f6e7bb7387da19af85f6ec
-        # This is a hash of 'http://download.companieshouse.gov.uk\
-        # /Accounts_Bulk_Data-2020-05-19.zip'
@@ -0,0 +1,158 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+# Custom import
+from src.filing_fetcher_scraper.filing_fetcher_scraper.rate_limit import (
+    ApiRateLimiter, read_api_keys
+)
+
+
+class MockApiHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the Companies House API, allowing each key limit requests
+    per fixed window and answering 429 beyond that.
+    """
+    def do_GET(self):
+        server = self.server
+        key = self.headers.get("Authorization")
+        with server.lock:
+            now = time.time()
+            start, count = server.windows.get(key, (now, 0))
+            if now >= start + server.window:
+                start, count = now, 0
+            count += 1
+            server.windows[key] = (start, count)
+            status = 200 if count <= server.limit else 429
+            server.statuses.append(status)
+
+        self.send_response(status)
+        self.send_header("X-Ratelimit-Limit", str(server.limit))
+        self.send_header("X-Ratelimit-Remaining",
+                         str(max(0, server.limit - count)))
+        self.send_header("X-Ratelimit-Reset", str(start + server.window))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestApiRateLimiter(unittest.TestCase):
+    """
+    Tests for the ApiRateLimiter class against a mock API.
+    """
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), MockApiHandler)
+        self.server.lock = threading.Lock()
+        self.server.windows = {}
+        self.server.statuses = []
+        self.server.limit = 5
+        self.server.window = 0.5
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        self.url = "http://127.0.0.1:{}/company/00000001/filing-history"\
+            .format(self.server.server_port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def fetch(self, limiter, n_requests, n_threads=4):
+        """
+        Makes n_requests requests from n_threads threads sharing a limiter,
+        returning the time taken.
+        """
+        counter = iter(range(n_requests))
+        counter_lock = threading.Lock()
+
+        def worker():
+            while True:
+                with counter_lock:
+                    if next(counter, None) is None:
+                        return
+                while True:
+                    key, wait = limiter.acquire()
+                    if key is not None:
+                        break
+                    time.sleep(wait)
+                try:
+                    with urlopen(Request(self.url, headers={
+                            "Authorization": key})) as response:
+                        status, headers = response.status, response.headers
+                except HTTPError as e:
+                    status, headers = e.code, e.headers
+                limiter.update(key, status,
+                               int(headers["X-Ratelimit-Remaining"]),
+                               float(headers["X-Ratelimit-Reset"]))
+
+        start = time.time()
+        threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return time.time() - start
+
+    def test_api_rate_limiter_pos(self):
+        """
+        Positive test case for the ApiRateLimiter class: concurrent requests
+        should use the quota in full without any being rate limited.
+        """
+        limiter = ApiRateLimiter(["key1"], limit=5, window=0.5)
+
+        elapsed = self.fetch(limiter, 12)
+
+        self.assertEqual(self.server.statuses, [200] * 12)
+        # Three windows are needed for twelve requests
+        self.assertGreaterEqual(elapsed, 1.0)
+        self.assertLess(elapsed, 2.0)
+
+    def test_api_rate_limiter_keys(self):
+        """
+        Requests should be spread across several keys, each with its own
+        quota.
+        """
+        limiter = ApiRateLimiter(["key1", "key2"], limit=5, window=0.5)
+
+        elapsed = self.fetch(limiter, 10)
+
+        self.assertEqual(self.server.statuses, [200] * 10)
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(set(self.server.windows), {"key1", "key2"})
+
+    def test_api_rate_limiter_429(self):
+        """
+        A key which is rate limited should get no more tokens until the
+        window resets.
+        """
+        limiter = ApiRateLimiter(["key1"], limit=5, window=0.5)
+
+        key, wait = limiter.acquire()
+        limiter.update(key, 429, 0, time.time() + 0.5)
+
+        key, wait = limiter.acquire()
+        self.assertIsNone(key)
+        self.assertGreater(wait, 0.4)
+
+    def test_read_api_keys(self):
+        """
+        Several keys can be given separated by commas or new lines.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filepath = os.path.join(tmp_dir, "ch_api_key.ini")
+            with open(filepath, "w") as f:
+                f.write("[companies_house]\nkey = key1, key2\n  key3\n")
+
+            self.assertEqual(read_api_keys(filepath),
+                             ["key1", "key2", "key3"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+
+# Custom import
+from src.data_processing.xbrl_parser import XbrlParser
+
+
+class TestBatchBySize(unittest.TestCase):
+    """
+    Tests for the batch_by_size function.
+    """
+    def test_batch_by_size_pos(self):
+        """
+        Positive test case for the batch_by_size function.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            files = []
+            for name, size in [("a", 10), ("b", 50), ("c", 30), ("d", 40),
+                               ("e", 20)]:
+                filepath = os.path.join(tmp_dir, name + ".html")
+                with open(filepath, "w") as f:
+                    f.write("x" * size)
+                files.append(filepath)
+
+            batches = XbrlParser.batch_by_size(files, 2)
+
+        self.assertEqual([[os.path.basename(f) for f in batch]
+                          for batch in batches],
+                         [["b.html", "d.html"], ["c.html", "e.html"],
+                          ["a.html"]])
+
+    def test_batch_by_size_empty(self):
+        """
+        No files should give no batches.
+        """
+        self.assertEqual(XbrlParser.batch_by_size([], 10), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+from bs4 import BeautifulSoup as BS
+
+# Custom import
+from src.data_processing.xbrl_parser import XbrlParser
+
+
+class TestBuildContextIndex(unittest.TestCase):
+    """
+    Tests for the context index and the indexed element parsing.
+    """
+    def soup_input(self):
+
+        doc = """
+        <html><body>
+        <link:schemaRef xlink:type="simple"
+            xlink:href="http://www.xbrl.org/uk/gaap/core/2009-09-01/uk-gaap-full-2009-09-01.xsd"/>
+        <xbrli:context id="c1"><xbrli:period>
+            <xbrli:instant>2014-03-31</xbrli:instant>
+        </xbrli:period></xbrli:context>
+        <xbrli:context id="d1"><xbrli:entity><xbrli:segment>
+            <xbrldi:explicitMember dimension="a">uk-gaap:Director1
+            </xbrldi:explicitMember>
+        </xbrli:segment></xbrli:entity><xbrli:period>
+            <xbrli:startDate>2013-04-01</xbrli:startDate>
+            <xbrli:endDate>2014-03-31</xbrli:endDate>
+        </xbrli:period></xbrli:context>
+        <xbrli:unit id="GBP"><xbrli:measure>iso4217:GBP</xbrli:measure>
+        </xbrli:unit>
+        <div id="not_a_context">text</div>
+        <ix:nonFraction name="uk-gaap:FixedAssets" contextRef="c1"
+            unitRef="GBP">12,345</ix:nonFraction>
+        <ix:nonFraction name="uk-gaap:Creditors" contextRef="c1"
+            unitRef="GBP" sign="-">1,200</ix:nonFraction>
+        <ix:nonNumeric name="uk-gaap:NameEntityOfficer"
+            contextRef="d1"></ix:nonNumeric>
+        <ix:nonNumeric name="uk-gaap:Other"
+            contextRef="2015-01-01">x</ix:nonNumeric>
+        </body></html>
+        """
+
+        return BS(doc, "lxml")
+
+    def test_build_context_index_pos(self):
+        """
+        Positive test case for the build_context_index function.
+        """
+        index = XbrlParser.build_context_index(self.soup_input())
+
+        self.assertEqual(index["contexts"],
+                         {"c1": {"date": "2014-03-31", "member": ""},
+                          "d1": {"date": "2014-03-31",
+                                 "member": "Director1"}})
+        self.assertEqual(index["units"], {"GBP": "iso4217:GBP"})
+        self.assertEqual(index["schemaref"],
+                         "http://www.xbrl.org/uk/gaap/core/2009-09-01/"
+                         "uk-gaap-full-2009-09-01.xsd")
+
+    def test_standard_from_link_cached(self):
+        """
+        The standard of a schema link should match
+        retrieve_accounting_standard and be cached by url.
+        """
+        soup = self.soup_input()
+        href = XbrlParser.build_context_index(soup)["schemaref"]
+
+        XbrlParser.standard_from_link.cache_clear()
+        first = XbrlParser.standard_from_link(href)
+        second = XbrlParser.standard_from_link(href)
+
+        self.assertEqual(first, XbrlParser.retrieve_accounting_standard(soup))
+        self.assertEqual(first[:2], ("uk-gaap-full", "2009-09-01"))
+        self.assertIs(first, second)
+        self.assertEqual(XbrlParser.standard_from_link.cache_info().hits, 2)
+
+    def test_parse_elements_matches_soup_lookups(self):
+        """
+        The indexed parse_elements should give the same dates and units as
+        the retrieve_date and retrieve_unit soup lookups.
+        """
+        soup = self.soup_input()
+        element_set = soup.find_all(attrs={"contextref": True})
+
+        elements = XbrlParser.parse_elements(element_set, soup)
+
+        self.assertEqual(elements["date"],
+                         [XbrlParser.retrieve_date(soup, e)
+                          for e in element_set])
+        self.assertEqual(elements["unit"],
+                         [XbrlParser.retrieve_unit(soup, e)
+                          for e in element_set])
+        self.assertEqual(XbrlParser.clean_values(elements["value"],
+                                                 elements["unit"],
+                                                 elements["sign"]),
+                         [12345.0, -1200.0, "Director1", "x"])
+
+
+if __name__ == '__main__':
+    unittest.main()
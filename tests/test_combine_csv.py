@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+# Custom import
+from src.data_processing.combine_csvfiles import XbrlCsvAppender
+
+
+class TestCombineCsv(unittest.TestCase):
+    """
+    Tests for the combine_csv function.
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        filepath = os.path.join(self.tmp.name, name)
+        with open(filepath, "wb") as f:
+            f.write(content)
+        return filepath
+
+    def test_combine_csv_pos(self):
+        """
+        Positive test case for the combine_csv function. Only the first
+        header should be kept, and a file without a final new line should
+        not run into the next.
+        """
+        files = [self.write("1.csv", b'name,value\na,"1,0"\n'),
+                 self.write("2.csv", b''),
+                 self.write("3.csv", b'name,value\r\nb,2'),
+                 self.write("4.csv", b'name,value\n'),
+                 self.write("5.csv", b'name,value\nc,"x\ny"\n')]
+        outfile = os.path.join(self.tmp.name, "combined.csv")
+
+        XbrlCsvAppender.combine_csv(files, outfile, buffer_size=4)
+
+        with open(outfile, "rb") as f:
+            self.assertEqual(f.read(),
+                             b'name,value\na,"1,0"\nb,2\nc,"x\ny"\n')
+
+    def test_combine_csv_neg(self):
+        """
+        Files with different headers should raise a ValueError before the
+        output is written.
+        """
+        files = [self.write("1.csv", b'name,value\na,1\n'),
+                 self.write("2.csv", b'name,unit,value\nb,NA,2\n')]
+        outfile = os.path.join(self.tmp.name, "combined.csv")
+
+        with self.assertRaises(ValueError):
+            XbrlCsvAppender.combine_csv(files, outfile)
+        self.assertFalse(os.path.exists(outfile))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Custom import
+from src.data_processing.combine_csvfiles import XbrlCsvAppender
+from src.data_processing.xbrl_pd_methods import XbrlSubsets
+
+
+class TestCompactFilesByYear(unittest.TestCase):
+    """
+    Tests for the compact_files_by_year function.
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.indir = os.path.join(self.tmp.name, "parsed") + "/"
+        self.outdir = os.path.join(self.tmp.name, "dataset")
+        os.mkdir(self.indir)
+
+        for n, month in enumerate(["January", "March", "May"]):
+            pd.DataFrame({
+                'date': ['2014-03-31'] * 4,
+                'name': ['turnover', 'creditors', 'turnover', 'fixedassets'],
+                'unit': ['iso4217:GBP'] * 4,
+                'value': [str(float(n * 10 + i)) for i in range(4)],
+                'doc_name': ['{}.html'.format(month)] * 4,
+                'doc_companieshouseregisterednumber':
+                    ['SC000002', '00000001', '00000001', '00000003'],
+                'parsed': [True] * 4
+            }).to_csv(self.indir + "2014-{}_xbrl_data.csv".format(month),
+                      index=False)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_compact_files_by_year_pos(self):
+        """
+        Each quarter should be written to its own partition, sorted by name
+        and company number.
+        """
+        XbrlCsvAppender.compact_files_by_year(self.indir, self.outdir, "2014",
+                                              row_group_size=2)
+
+        self.assertEqual(sorted(os.listdir(os.path.join(self.outdir,
+                                                        "year=2014"))),
+                         ["quarter=1", "quarter=2"])
+
+        table = pq.read_table(os.path.join(self.outdir, "year=2014",
+                                           "quarter=1", "part-0.parquet"))
+        df = table.to_pandas()
+        self.assertEqual(len(df), 8)
+        self.assertEqual(
+            list(zip(df['name'], df['doc_companieshouseregisterednumber'])),
+            [('creditors', '00000001')] * 2 + [('fixedassets', '00000003')] * 2
+            + [('turnover', '00000001')] * 2 + [('turnover', 'SC000002')] * 2)
+
+        # The same text as the csv files, without the helper columns
+        self.assertNotIn('value_text', df.columns)
+        self.assertEqual(df['value'].tolist()[:2], ['1.0', '11.0'])
+        self.assertEqual(df['doc_type'].unique().tolist(), ['NA'])
+
+        metadata = pq.ParquetFile(os.path.join(
+            self.outdir, "year=2014", "quarter=1",
+            "part-0.parquet")).metadata
+        self.assertEqual(metadata.num_row_groups, 4)
+        self.assertTrue(metadata.row_group(0).column(1).statistics
+                        .has_min_max)
+
+    def test_tag_extraction_dataset_pos(self):
+        """
+        Only the elements with the wanted tags, in the chosen partitions,
+        should be read back.
+        """
+        XbrlCsvAppender.compact_files_by_year(self.indir, self.outdir, "2014")
+
+        df = XbrlSubsets.tag_extraction_dataset(self.outdir, "turnover",
+                                                year=2014, quarter=1)
+        self.assertEqual(sorted(df['value'].tolist()),
+                         [0.0, 2.0, 10.0, 12.0])
+        self.assertEqual(df['quarter'].unique().tolist(), [1])
+        self.assertIsInstance(df['name'].dtype, pd.CategoricalDtype)
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['date']))
+        self.assertTrue(pd.api.types.is_integer_dtype(
+            df['doc_companieshouseregisterednumber']))
+
+        df = XbrlSubsets.tag_extraction_dataset(
+            self.outdir, ["turnover", "creditors"],
+            columns=['name', 'value'])
+        self.assertEqual(len(df), 9)
+        self.assertEqual(list(df.columns), ['name', 'value'])
+
+
+if __name__ == '__main__':
+    unittest.main()
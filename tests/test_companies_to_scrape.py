@@ -0,0 +1,157 @@
+import json
+import os
+import tempfile
+import unittest
+import unittest.mock as mock
+
+import numpy as np
+
+# Custom import
+from src.filing_fetcher_scraper.filing_fetcher_scraper import companies
+from src.filing_fetcher_scraper.filing_fetcher_scraper.filing_store import (
+    FilingStore
+)
+
+
+class TestCompaniesToScrape(unittest.TestCase):
+    """
+    Tests for the companies_to_scrape function and its company number
+    indexes.
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.basic_data = os.path.join(self.tmp_dir.name, "basic.csv")
+        self.digital = os.path.join(self.tmp_dir.name, "digital.csv")
+        self.feed = os.path.join(self.tmp_dir.name, "feed.json")
+
+        with open(self.basic_data, "w") as f:
+            f.write(" CompanyNumber,CompanyStatus,IncorporationDate,"
+                    "Accounts.NextDueDate,Accounts.LastMadeUpDate,"
+                    "Accounts.AccountCategory\n"
+                    "00000001,Active,01/01/2000,,31/03/2019,FULL\n"
+                    "SC000002,Active,01/01/2000,,31/03/2019,FULL\n"
+                    "00000003,Active,01/01/2000,,31/03/2019,FULL\n"
+                    "00000004,Dissolved,01/01/2000,,31/03/2019,FULL\n"
+                    "00000005,Active,01/01/2000,,,FULL\n"
+                    "OC000006,Active,01/01/2000,,31/03/2019,SMALL\n")
+        with open(self.digital, "w") as f:
+            f.write("crn\nSC000002\n")
+        with open(self.feed, "w") as f:
+            f.write(json.dumps({"company_number": "00000003"}) + "\n")
+
+        # The config is shared by everything which uses it, so is only
+        # changed for the duration of each test
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        for name, value in [("DIGITAL_REPORTERS_FILEPATH", self.digital),
+                            ("LATEST_FILING_FEED_FILE", self.feed),
+                            ("LATEST_FILING_STORE_FILE", None),
+                            ("INDEX_CACHE_DIR", self.cache_dir)]:
+            patcher = mock.patch.object(companies.config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        companies._digital_reporters = None
+        companies._already_seen = None
+
+    def tearDown(self):
+        companies._digital_reporters = None
+        companies._already_seen = None
+        self.tmp_dir.cleanup()
+
+    def test_companies_to_scrape_pos(self):
+        """
+        Positive test case for the companies_to_scrape function.
+        """
+        rows = list(companies.companies_to_scrape(self.basic_data))
+
+        self.assertEqual([row[0] for row in rows], ["00000001", "OC000006"])
+        self.assertEqual(dict(zip(companies.COMPANY_COLUMNS, rows[1])),
+                         {'CompanyNumber': "OC000006",
+                          'CompanyStatus': "Active",
+                          'IncorporationDate': "01/01/2000",
+                          'Accounts.NextDueDate': None,
+                          'Accounts.LastMadeUpDate': "31/03/2019",
+                          'Accounts.AccountCategory': "SMALL"})
+
+    def test_digital_reporters_cache(self):
+        """
+        The digital reporters index should be saved in the cache directory
+        rather than next to its csv file, and rebuilt when the file changes.
+        """
+        self.assertEqual(list(companies.digital_reporters()),
+                         list(companies.encode_company_numbers(["SC000002"])))
+        self.assertEqual(os.listdir(self.tmp_dir.name).count(
+            "digital.csv.crn.npz"), 0)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+        with open(self.digital, "a") as f:
+            f.write("00000001\n")
+        mtime = os.path.getmtime(self.digital) + 10
+        os.utime(self.digital, (mtime, mtime))
+        companies._digital_reporters = None
+
+        self.assertEqual(list(companies.digital_reporters())[0], 1)
+
+    def test_encode_company_numbers(self):
+        """
+        Company numbers should encode to distinct integers, padded with
+        leading zeros, and invalid numbers to -1.
+        """
+        codes = companies.encode_company_numbers(
+            ["00000001", "1", " sc000002", "SC000002", "", None,
+             "123456789", "AB-12345", "SC00000\u00c9"])
+
+        self.assertEqual(codes[0], 1)
+        self.assertEqual(codes[1], 1)
+        self.assertEqual(codes[2], codes[3])
+        self.assertNotEqual(codes[3], 2)
+        self.assertTrue((codes[4:] == -1).all())
+
+    def test_already_seen_incremental(self):
+        """
+        The already seen index should be saved and only read lines appended
+        to the feed since.
+        """
+        seen = companies.already_seen()
+        self.assertTrue(companies.is_in_index(
+            companies.encode_company_numbers(["00000003"]), seen)[0])
+
+        with open(self.feed, "a") as f:
+            f.write(json.dumps({"company_number": "00000001"}) + "\n")
+            f.write('{"company_number": "000')
+        companies._already_seen = None
+
+        seen = companies.already_seen()
+        self.assertEqual(list(seen), [1, 3])
+        with np.load(self.feed + ".crn.npz") as saved:
+            self.assertEqual(int(saved['offset']),
+                             os.path.getsize(self.feed) - 23)
+
+    def test_already_seen_store(self):
+        """
+        When a filing store is set, already seen companies should come from
+        the store, reading only rows added since the last start-up.
+        """
+        store_filepath = os.path.join(self.tmp_dir.name, "filings.db")
+        patcher = mock.patch.object(companies.config,
+                                    "LATEST_FILING_STORE_FILE",
+                                    store_filepath)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        store = FilingStore(store_filepath)
+        store.add([{'company_number': "00000001"}])
+
+        self.assertEqual(list(companies.already_seen()), [1])
+
+        store.add([{'company_number': "OC000006"}])
+        store.close()
+        companies._already_seen = None
+
+        rows = list(companies.companies_to_scrape(self.basic_data))
+        self.assertEqual([row[0] for row in rows], ["00000003"])
+        with np.load(store_filepath + ".crn.npz") as saved:
+            self.assertEqual(int(saved['offset']), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
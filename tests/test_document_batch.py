@@ -0,0 +1,78 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+# Custom import
+from src.data_processing.xbrl_parser import XbrlParser
+from src.data_processing.xbrl_document_batch import XbrlDocumentBatch
+
+
+class TestDocumentBatch(unittest.TestCase):
+    """
+    Tests for the XbrlDocumentBatch class.
+    """
+    def doc(self, doc_name, names, values, units):
+
+        return {'doc_name': doc_name, 'doc_type': 'html',
+                'doc_upload_date': '2020-01-01',
+                'arc_name': 'Accounts_Monthly_Data-March2014',
+                'parsed': True, 'doc_balancesheetdate': '2014-03-31',
+                'doc_companieshouseregisterednumber': '07971828',
+                'doc_standard_type': 'uk-gaap-full',
+                'doc_standard_date': '2009-09-01',
+                'doc_standard_link': 'uk-gaap-full-2009-09-01.xsd',
+                'name': names, 'value': values, 'unit': units,
+                'date': ['2014-03-31'] * len(names),
+                'sign': ['NA'] * len(names)}
+
+    def test_collect_batch_pos(self):
+        """
+        Metadata should be held once per document, elements as typed
+        columns referring to their document by doc_id.
+        """
+        batch = XbrlParser.collect_batch([
+            self.doc('a.html', ['fixedassets', 'creditors'],
+                     ['1,000', 'text'], ['iso4217:GBP', 'NA']),
+            self.doc('b.html', ['fixedassets'], ['(5)'], ['iso4217:GBP'])])
+
+        self.assertEqual(batch.n_docs, 2)
+        self.assertEqual(batch.n_facts, 3)
+        self.assertEqual(batch.docs['doc_name'].tolist(), ['a.html', 'b.html'])
+        self.assertEqual(batch.facts['doc_id'].dtype, np.int32)
+        self.assertEqual(batch.facts['doc_id'].tolist(), [0, 0, 1])
+        self.assertTrue(pd.api.types.is_categorical_dtype(
+            batch.facts['name']))
+        np.testing.assert_array_equal(batch.facts['value_num'].to_numpy(),
+                                      [1000.0, np.nan, -5.0])
+        self.assertEqual(batch.facts['value_text'].tolist()[1], 'text')
+
+    def test_concat_pos(self):
+        """
+        Concatenated batches should renumber their documents and expand to
+        the same table as a single batch of all the documents.
+        """
+        docs = [self.doc('a.html', ['fixedassets'], ['1'], ['iso4217:GBP']),
+                self.doc('b.html', ['creditors', 'name'], ['2', 'x'],
+                         ['iso4217:GBP', 'NA']),
+                self.doc('c.html', ['turnover'], ['3'], ['iso4217:GBP'])]
+
+        batches = [XbrlParser.collect_batch(docs[:1], files=[{'f': 1}]),
+                   XbrlParser.collect_batch([1], files=[{'f': 3}]),
+                   XbrlParser.collect_batch(docs[1:], files=[{'f': 2}])]
+        batch = XbrlDocumentBatch.concat(batches)
+
+        self.assertEqual(batch.facts['doc_id'].tolist(), [0, 1, 1, 2])
+        self.assertEqual(batch.files, [{'f': 1}, {'f': 3}, {'f': 2}])
+        pd.testing.assert_frame_equal(XbrlParser.batch_to_frame(batch),
+                                      XbrlParser.flatten_data(docs))
+
+    def test_concat_neg(self):
+        """
+        Concatenating no batches should raise a ValueError.
+        """
+        with self.assertRaises(ValueError):
+            XbrlDocumentBatch.concat([])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Custom import
+from src.filing_fetcher_scraper.filing_fetcher_scraper.documents import (
+    download_document
+)
+from src.filing_fetcher_scraper.filing_fetcher_scraper.pipelines import (
+    DocumentDownloadPipeline
+)
+from src.filing_fetcher_scraper.filing_fetcher_scraper.rate_limit import (
+    ApiRateLimiter
+)
+
+
+class DocumentApiHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the document API, which needs an API key and redirects to
+    S3, and for S3, which rejects requests carrying the API key.
+    """
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        if self.path.startswith("/document/"):
+            if self.headers.get("Authorization") is None:
+                self.send_error(401)
+                return
+            self.send_response(302)
+            self.send_header("Location", "/s3/" + self.path.split("/")[2])
+            self.send_header("X-Ratelimit-Remaining", "599")
+            self.send_header("X-Ratelimit-Reset", str(time.time() + 300))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif self.headers.get("Authorization") is not None:
+            self.send_error(400)
+        else:
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(self.server.pdf)))
+            self.end_headers()
+            self.wfile.write(self.server.pdf)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestDownloadDocument(unittest.TestCase):
+    """
+    Tests for the download_document function.
+    """
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                          DocumentApiHandler)
+        self.server.paths = []
+        self.server.pdf = b"%PDF-1.4\n" + b"0" * 200000
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        self.url = "http://127.0.0.1:{}/document/abc123/content".format(
+            self.server.server_port)
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.limiter = ApiRateLimiter(["key1"])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp_dir.cleanup()
+
+    def test_download_document_pos(self):
+        """
+        Positive test case for the download_document function: the document
+        should be fetched through the redirect and saved under its barcode.
+        """
+        result = download_document(self.url, self.tmp_dir.name, "XYZ123",
+                                   self.limiter, block_size=4096)
+
+        self.assertEqual(result['status'], "downloaded")
+        self.assertEqual(self.server.paths,
+                         ["/document/abc123/content", "/s3/abc123"])
+        path = os.path.join(self.tmp_dir.name, "XYZ123.pdf")
+        self.assertEqual(result['path'], path)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), self.server.pdf)
+        self.assertEqual(self.limiter.buckets["key1"].remaining, 599)
+
+    def test_download_document_skip(self):
+        """
+        Documents whose barcode has already been downloaded should be
+        skipped without any request.
+        """
+        download_document(self.url, self.tmp_dir.name, "XYZ123",
+                          self.limiter)
+        result = download_document(self.url, self.tmp_dir.name, "XYZ123",
+                                   self.limiter)
+
+        self.assertEqual(result['status'], "skipped")
+        self.assertEqual(len(self.server.paths), 2)
+
+    def test_download_document_skip_legacy(self):
+        """
+        Documents saved by FilesPipeline under full/ and the SHA1 of their
+        URL should be skipped without any request.
+        """
+        os.mkdir(os.path.join(self.tmp_dir.name, "full"))
+        path = os.path.join(self.tmp_dir.name, "full", hashlib.sha1(
+            self.url.encode("utf-8")).hexdigest() + ".pdf")
+        with open(path, "wb") as f:
+            f.write(self.server.pdf)
+
+        result = download_document(self.url, self.tmp_dir.name, "XYZ123",
+                                   self.limiter)
+
+        self.assertEqual(result['status'], "skipped")
+        self.assertEqual(result['path'], path)
+        self.assertEqual(self.server.paths, [])
+
+    def test_download_document_neg(self):
+        """
+        Documents which are not PDFs or cannot be fetched should not be
+        saved.
+        """
+        self.server.pdf = b"<html>error</html>"
+        result = download_document(self.url, self.tmp_dir.name, "XYZ123",
+                                   self.limiter)
+        self.assertEqual(result['status'], "failed")
+
+        result = download_document(self.url, self.tmp_dir.name, "XYZ123")
+        self.assertEqual(result['status'], "failed")
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+    def test_document_download_pipeline_missing_store(self):
+        """
+        The pipeline should create FILES_STORE if it does not exist, so the
+        documents are saved on a machine which has not run it before.
+        """
+        files_store = os.path.join(self.tmp_dir.name, "pdfs", "scraped")
+        pipeline = DocumentDownloadPipeline(files_store, 1, self.limiter)
+
+        pipeline.open_spider(None)
+        item = pipeline.download_item({'file_urls': [self.url],
+                                       'barcode': "XYZ123"}, None)
+
+        self.assertEqual([f['status'] for f in item['files']],
+                         ["downloaded"])
+        self.assertEqual(os.listdir(files_store), ["XYZ123.pdf"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,289 @@
+import asyncio
+import inspect
+import io
+import os
+import socket
+import tempfile
+import threading
+import unittest
+import unittest.mock as mock
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Custom import
+from src.xbrl_scraper.xbrl_scraper import downloads
+from src.xbrl_scraper.xbrl_scraper.downloads import (
+    DownloadIndex, DownloadThrottle, download_file, download_files
+)
+from src.xbrl_scraper.xbrl_scraper.pipelines import XbrlScraperPipeline
+
+
+class ArchiveHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the Companies House download server, serving the files in
+    the server's files dict with support for Range and If-Range requests.
+    The server can be told to drop the connection part way through a
+    response.
+    """
+    def do_HEAD(self):
+        data = self.server.files.get(self.path)
+        self.server.heads.append(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+
+        etag = '"{}"'.format(hash(data))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+        else:
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+
+    def do_GET(self):
+        data = self.server.files.get(self.path)
+        self.server.ranges.append(self.headers.get("Range"))
+        self.server.if_ranges.append(self.headers.get("If-Range"))
+        if data is None:
+            self.send_error(404)
+            return
+
+        etag = '"{}"'.format(hash(data))
+        start = 0
+        if self.headers.get("Range") \
+                and self.headers.get("If-Range") in [None, etag]:
+            start = int(self.headers["Range"].split("=")[1].split("-")[0])
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes {}-{}/{}".format(
+                start, len(data) - 1, len(data)))
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(data) - start))
+        self.send_header("ETag", etag)
+        self.end_headers()
+
+        if self.server.drop_after is not None:
+            self.wfile.write(data[start:start + self.server.drop_after])
+            self.server.drop_after = None
+            self.close_connection = True
+            return
+        self.wfile.write(data[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+class TestDownloadFile(unittest.TestCase):
+    """
+    Tests for the download_file function.
+    """
+    def setUp(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as zf:
+            zf.writestr("a_20140331.html", "<html>a</html>" * 1000)
+            zf.writestr("b_20140331.html", "<html>b</html>" * 1000)
+        self.data = buffer.getvalue()
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), ArchiveHandler)
+        self.server.files = {"/Accounts_Monthly_Data-March2014.zip":
+                             self.data}
+        self.server.ranges = []
+        self.server.if_ranges = []
+        self.server.heads = []
+        self.server.drop_after = None
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        self.url = "http://127.0.0.1:{}/Accounts_Monthly_Data-March2014.zip"\
+            .format(self.server.server_port)
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name,
+                                 "Accounts_Monthly_Data-March2014.zip")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp_dir.cleanup()
+
+    def test_download_file_pos(self):
+        """
+        Positive test case for the download_file function.
+        """
+        result = download_file(self.url, self.tmp_dir.name)
+
+        self.assertEqual(result['status'], "downloaded")
+        self.assertEqual(result['size'], len(self.data))
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertFalse(os.path.exists(self.path + ".part"))
+
+    def test_download_file_resume(self):
+        """
+        A partial file should be resumed with a Range request, including
+        after the connection drops part way through.
+        """
+        with open(self.path + ".part", "wb") as f:
+            f.write(self.data[:100])
+        self.server.drop_after = 50
+
+        result = download_file(self.url, self.tmp_dir.name, backoff=0.01)
+
+        self.assertEqual(result['status'], "downloaded")
+        self.assertEqual(self.server.ranges, ["bytes=100-", "bytes=150-"])
+        self.assertEqual(self.server.if_ranges,
+                         [None, '"{}"'.format(hash(self.data))])
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_download_file_resume_changed(self):
+        """
+        A partial file of an archive which has changed since it was started
+        should be downloaded again from the start, including by a later
+        call which only knows its validator from the download index.
+        """
+        index = DownloadIndex(os.path.join(self.tmp_dir.name,
+                                           "download_index.json"))
+        old_data = self.data[::-1]
+        self.server.files["/Accounts_Monthly_Data-March2014.zip"] = old_data
+        self.server.drop_after = 100
+
+        result = download_file(self.url, self.tmp_dir.name, retries=0,
+                               index=index)
+        self.assertEqual(result['status'], "failed")
+        self.assertEqual(index.get(self.url)['part_validator'],
+                         '"{}"'.format(hash(old_data)))
+
+        self.server.files["/Accounts_Monthly_Data-March2014.zip"] = self.data
+        result = download_file(self.url, self.tmp_dir.name,
+                               index=DownloadIndex(index.index_path))
+
+        self.assertEqual(result['status'], "downloaded")
+        self.assertEqual(self.server.ranges, [None, "bytes=100-"])
+        self.assertEqual(self.server.if_ranges,
+                         [None, '"{}"'.format(hash(old_data))])
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_download_file_neg(self):
+        """
+        Files which fail verification or cannot be found should not be
+        moved into place.
+        """
+        result = download_file(self.url, self.tmp_dir.name,
+                               expected_sha1="0" * 40)
+        self.assertEqual(result['status'], "failed")
+        self.assertFalse(os.path.exists(self.path))
+
+        self.server.files["/Accounts_Monthly_Data-March2014.zip"] = \
+            self.data[:-10]
+        result = download_file(self.url, self.tmp_dir.name)
+        self.assertEqual(result['status'], "failed")
+        self.assertFalse(os.path.exists(self.path))
+
+        result = download_file(self.url.replace("March", "April"),
+                               self.tmp_dir.name)
+        self.assertEqual(result['status'], "failed")
+        self.assertEqual(len(self.server.ranges), 3)
+
+    def test_download_file_backoff(self):
+        """
+        Retries should wait for twice as long after each failed attempt, up
+        to max_backoff.
+        """
+        url = self.url.replace(str(self.server.server_port),
+                               str(self.closed_port()))
+
+        with mock.patch.object(downloads.time, "sleep") as sleep:
+            result = download_file(url, self.tmp_dir.name, retries=4,
+                                   backoff=0.5, max_backoff=3.0)
+
+        self.assertEqual(result['status'], "failed")
+        self.assertEqual([c[0][0] for c in sleep.call_args_list],
+                         [0.5, 1.0, 2.0, 3.0])
+
+    def closed_port(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            return s.getsockname()[1]
+
+    def test_download_files(self):
+        """
+        Downloading several files should return a result for each in order.
+        """
+        self.server.files["/Accounts_Monthly_Data-April2014.zip"] = self.data
+        urls = [self.url, self.url.replace("March", "April")]
+
+        results = download_files(urls, self.tmp_dir.name, 2,
+                                 DownloadThrottle(start_delay=0.0))
+
+        self.assertEqual([r['url'] for r in results], urls)
+        self.assertTrue(all(r['status'] == "downloaded" for r in results))
+
+    def test_download_file_index(self):
+        """
+        Files in the download index which are unchanged on the server should
+        only cost a HEAD request, and changed files should be downloaded
+        again.
+        """
+        index_path = os.path.join(self.tmp_dir.name, "download_index.json")
+        index = DownloadIndex(index_path)
+
+        result = download_file(self.url, self.tmp_dir.name, index=index)
+        self.assertEqual(result['status'], "downloaded")
+        self.assertEqual(self.server.heads, [])
+
+        index = DownloadIndex(index_path)
+        self.assertEqual(index.get(self.url)['size'], len(self.data))
+        result = download_file(self.url, self.tmp_dir.name, index=index)
+        self.assertEqual(result['status'], "unchanged")
+        self.assertEqual(len(self.server.heads), 1)
+        self.assertEqual(len(self.server.ranges), 1)
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as zf:
+            zf.writestr("c_20140331.html", "<html>c</html>")
+        self.server.files["/Accounts_Monthly_Data-March2014.zip"] = \
+            buffer.getvalue()
+        result = download_file(self.url, self.tmp_dir.name, index=index)
+        self.assertEqual(result['status'], "downloaded")
+        self.assertEqual(len(self.server.ranges), 2)
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), buffer.getvalue())
+
+    def test_files_pipeline_index(self):
+        """
+        Archives downloaded by the FilesPipeline should be recorded in the
+        download index too, so they are found unchanged later.
+        """
+        import scrapy
+        from scrapy.pipelines.media import MediaPipeline
+        from scrapy.utils.test import get_crawler
+
+        store = os.path.join(self.tmp_dir.name, "store")
+        pipeline = XbrlScraperPipeline.from_crawler(
+            get_crawler(settings_dict={'FILES_STORE': store}))
+        spider = scrapy.Spider("xbrl_scraper")
+        spider.filepath = self.tmp_dir.name + "/"
+        info = MediaPipeline.SpiderInfo(spider)
+
+        request = scrapy.Request(self.url)
+        response = scrapy.http.Response(
+            self.url, body=self.data,
+            headers={"ETag": '"{}"'.format(hash(self.data))})
+        checksum = pipeline.file_downloaded(response, request, info)
+        if inspect.isawaitable(checksum):
+            asyncio.run(checksum)
+
+        index = DownloadIndex(os.path.join(self.tmp_dir.name,
+                                           "download_index.json"))
+        entry = index.get(self.url)
+        self.assertEqual(entry['path'], os.path.join(
+            store, "Accounts_Monthly_Data-March2014.zip"))
+        self.assertEqual(entry['size'], len(self.data))
+        self.assertTrue(os.path.exists(entry['path']))
+        self.assertTrue(downloads.is_unchanged(self.url, entry))
+
+
+if __name__ == '__main__':
+    unittest.main()
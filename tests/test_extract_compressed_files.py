@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+import zipfile
+
+# Custom import
+from src.data_processing.cst_data_processing import DataProcessing
+from src.data_processing.xbrl_manifest import XbrlManifest
+
+
+class TestExtractCompressedFiles(unittest.TestCase):
+    """
+    Tests for the extract_compressed_files function.
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp_dir.name, "scraped")
+        self.dest = os.path.join(self.tmp_dir.name, "unpacked")
+        os.mkdir(self.source)
+        os.mkdir(self.dest)
+
+        self.archive = os.path.join(self.source,
+                                    "Accounts_Monthly_Data-March2014.zip")
+        self.write_archive({"a_20140331.html": b"<html>a</html>",
+                            "b_20140331.html": b"<html>b</html>"})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_archive(self, members):
+        with zipfile.ZipFile(self.archive, "w") as zf:
+            for name, data in members.items():
+                zf.writestr(name, data)
+
+    def extracted(self):
+        folder = os.path.join(self.dest, "Accounts_Monthly_Data-March2014")
+        return {f: open(os.path.join(folder, f), "rb").read()
+                for f in os.listdir(folder)}
+
+    def test_extract_compressed_files_pos(self):
+        """
+        Positive test case for the extract_compressed_files function.
+        """
+        DataProcessing.extract_compressed_files(self.source, self.dest, 2,
+                                                chunk_size=1)
+
+        self.assertEqual(self.extracted(),
+                         {"a_20140331.html": b"<html>a</html>",
+                          "b_20140331.html": b"<html>b</html>"})
+        manifest = XbrlManifest.load(
+            os.path.join(self.dest, "extracted_files.csv"))
+        self.assertEqual(manifest[self.archive]['status'], "extracted")
+
+    def test_extract_compressed_files_unchanged(self):
+        """
+        Unchanged archives should be skipped, and changed archives extracted
+        again without leaving old members behind.
+        """
+        DataProcessing.extract_compressed_files(self.archive, self.dest, 1)
+        marker = os.path.join(self.dest, "Accounts_Monthly_Data-March2014",
+                              "marker")
+        open(marker, "w").close()
+
+        DataProcessing.extract_compressed_files(self.archive, self.dest, 1)
+        self.assertTrue(os.path.exists(marker))
+
+        self.write_archive({"c_20140331.html": b"<html>c</html>"})
+        DataProcessing.extract_compressed_files(self.archive, self.dest, 1)
+        self.assertEqual(self.extracted(),
+                         {"c_20140331.html": b"<html>c</html>"})
+
+    def test_extract_compressed_files_bad_crc(self):
+        """
+        A member whose data does not match its CRC32 should not be written
+        and the archive should be marked as failed.
+        """
+        with open(self.archive, "rb") as f:
+            data = f.read()
+        with open(self.archive, "wb") as f:
+            f.write(data.replace(b"<html>b</html>", b"<html>x</html>", 1))
+
+        DataProcessing.extract_compressed_files(self.archive, self.dest, 1)
+
+        self.assertEqual(self.extracted(),
+                         {"a_20140331.html": b"<html>a</html>"})
+        manifest = XbrlManifest.load(
+            os.path.join(self.dest, "extracted_files.csv"))
+        self.assertEqual(manifest[self.archive]['status'], "failed")
+
+    def test_extract_compressed_files_corrupt_archive(self):
+        """
+        An archive which cannot be read should be marked as failed without
+        stopping the other archives being extracted.
+        """
+        corrupt = os.path.join(self.source,
+                               "Accounts_Monthly_Data-April2014.zip")
+        with open(corrupt, "wb") as f:
+            f.write(b"not a zip archive")
+
+        DataProcessing.extract_compressed_files(self.source, self.dest, 1)
+
+        self.assertEqual(self.extracted(),
+                         {"a_20140331.html": b"<html>a</html>",
+                          "b_20140331.html": b"<html>b</html>"})
+        manifest = XbrlManifest.load(
+            os.path.join(self.dest, "extracted_files.csv"))
+        self.assertEqual(manifest[self.archive]['status'], "extracted")
+        self.assertEqual(manifest[corrupt]['status'], "failed")
+        self.assertEqual(manifest[corrupt]['checksum'], "")
+
+    def test_manifest_sha1_column(self):
+        """
+        Manifests written with a sha1 column should still be read.
+        """
+        manifest_path = os.path.join(self.dest, "extracted_files.csv")
+        with open(manifest_path, "w") as f:
+            f.write("path,size,mtime,sha1,status\n"
+                    "a.zip,10,1.5,0000abcd,extracted\n")
+
+        manifest = XbrlManifest.load(manifest_path)
+        self.assertEqual(manifest["a.zip"]['checksum'], "0000abcd")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+# Custom import
+from src.filing_fetcher_scraper.filing_fetcher_scraper.filing_store import (
+    FilingStore
+)
+
+
+class TestFilingStore(unittest.TestCase):
+    """
+    Tests for the FilingStore class.
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.tmp_dir.name, "filings.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_filing_store_pos(self):
+        """
+        Positive test case for the FilingStore class: items added should be
+        kept after reopening, and only rows added after a rowid returned.
+        """
+        store = FilingStore(self.filepath)
+        store.add([{'company_number': "00000001", 'pages': 12,
+                    'file_urls': ["https://example.com/content"]},
+                   {'company_number': "00000002"}])
+        store.close()
+
+        store = FilingStore(self.filepath)
+        company_numbers, last_rowid = store.company_numbers()
+        self.assertEqual(company_numbers, ["00000001", "00000002"])
+        self.assertEqual(last_rowid, store.last_rowid())
+        self.assertTrue(store.has_company("00000002"))
+        self.assertFalse(store.has_company("00000003"))
+
+        store.add([{'company_number': "00000003"}])
+        self.assertEqual(store.company_numbers(last_rowid),
+                         (["00000003"], last_rowid + 1))
+        self.assertEqual(store.company_numbers(last_rowid + 1),
+                         ([], last_rowid + 1))
+
+        row = store.connection.execute(
+            "SELECT pages, file_urls, barcode FROM filings "
+            "WHERE company_number = '00000001'").fetchone()
+        self.assertEqual(row, ("12", '["https://example.com/content"]',
+                               None))
+        store.close()
+
+    def test_filing_store_wal(self):
+        """
+        The store should be in WAL mode and indexed on company_number.
+        """
+        store = FilingStore(self.filepath)
+
+        mode = store.connection.execute("PRAGMA journal_mode").fetchone()
+        self.assertEqual(mode[0], "wal")
+        indexes = store.connection.execute(
+            "PRAGMA index_list(filings)").fetchall()
+        self.assertIn("filings_company_number", [i[1] for i in indexes])
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import pandas as pd
+
+# Custom import
+from src.data_processing.xbrl_parser import XbrlParser
+
+
+class TestFlattenData(unittest.TestCase):
+    """
+    Tests for the flatten_data function.
+    """
+    def doc_input(self):
+
+        meta = {'doc_type': 'html', 'doc_upload_date': '2020-01-01',
+                'arc_name': 'Accounts_Monthly_Data-March2014',
+                'doc_balancesheetdate': '2014-03-31',
+                'doc_standard_type': 'uk-gaap-full',
+                'doc_standard_date': '2009-09-01',
+                'doc_standard_link': 'uk-gaap-full-2009-09-01.xsd'}
+
+        doc1 = dict(meta, doc_name='a.html', parsed=True,
+                    doc_companieshouseregisterednumber='07971828',
+                    name=['fixedassets', 'creditors'],
+                    value=[12345.0, 'a "quoted"\nvalue'],
+                    unit=['iso4217:GBP', 'NA'],
+                    date=['2014-03-31', '2014-03-31'],
+                    sign=['NA', 'NA'])
+        doc2 = dict(meta, doc_name='b.html', parsed=False,
+                    doc_companieshouseregisterednumber='SC123456',
+                    name='NA', value='NA', unit='NA', date='NA', sign='NA')
+
+        return [doc1, 1, doc2]
+
+    def test_flatten_data_pos(self):
+        """
+        Positive test case for the flatten_data function.
+        """
+        df = XbrlParser.flatten_data(self.doc_input())
+
+        self.assertEqual(list(df.columns),
+                         ['date', 'name', 'unit', 'value', 'scale',
+                          'decimals', 'format', 'doc_name',
+                          'doc_type', 'doc_upload_date', 'arc_name',
+                          'parsed', 'doc_balancesheetdate',
+                          'doc_companieshouseregisterednumber',
+                          'doc_standard_type', 'doc_standard_date',
+                          'doc_standard_link'])
+        self.assertEqual(df['value'].tolist(),
+                         ['12345.0', 'a quotedvalue', 'NA'])
+        self.assertEqual(df['doc_name'].tolist(),
+                         ['a.html', 'a.html', 'b.html'])
+        self.assertEqual(df['doc_companieshouseregisterednumber'].tolist(),
+                         ['07971828', '07971828', 'SC123456'])
+        self.assertEqual(df['parsed'].tolist(), [True, True, False])
+        self.assertTrue(pd.api.types.is_bool_dtype(df['parsed']))
+
+    def test_flatten_data_empty(self):
+        """
+        No documents should give an empty table with the same columns.
+        """
+        df = XbrlParser.flatten_data([])
+
+        self.assertEqual(df.shape, (0, 17))
+
+
+if __name__ == '__main__':
+    unittest.main()
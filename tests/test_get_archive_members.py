@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+import zipfile
+
+# Custom import
+from src.data_processing.xbrl_pd_methods import XbrlExtraction
+from src.data_processing.xbrl_parser import XbrlParser
+from tests import test_stream_elements
+
+
+class TestGetArchiveMembers(unittest.TestCase):
+    """
+    Tests for listing and parsing the accounts in a zip archive.
+    """
+    doc = test_stream_elements.TestStreamElements.doc
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.archive = os.path.join(self.tmp_dir.name,
+                                    "Accounts_Monthly_Data-March2014.zip")
+        self.member = "Prod224_0013_07971828_20140331.html"
+
+        with zipfile.ZipFile(self.archive, "w") as zf:
+            zf.writestr(self.member, self.doc)
+            zf.writestr("readme.txt", "not an account")
+
+        # The same account unpacked to disk
+        folder = os.path.join(self.tmp_dir.name,
+                              "Accounts_Monthly_Data-March2014")
+        os.mkdir(folder)
+        self.filepath = folder + "/" + self.member
+        with open(self.filepath, "w") as f:
+            f.write(self.doc)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_archive_members_pos(self):
+        """
+        Positive test case for the get_archive_members function.
+        """
+        members, month, year = XbrlExtraction.get_archive_members(
+            self.archive)
+
+        self.assertEqual(members, [self.member])
+        self.assertEqual((month, year), ("March", "2014"))
+
+    def test_get_archive_members_types(self):
+        """
+        Types test case for the get_archive_members function.
+        """
+        with self.assertRaises(TypeError):
+            XbrlExtraction.get_archive_members(1.0)
+
+    def test_process_account_from_archive(self):
+        """
+        An account read from an archive should match the same account read
+        from disk, for both engines.
+        """
+        for engine in XbrlParser.parse_engines:
+            zip_doc = XbrlParser.process_account(self.member, engine,
+                                                 self.archive)
+            disk_doc = XbrlParser.process_account(self.filepath, engine)
+
+            zip_doc.pop("doc_upload_date")
+            disk_doc.pop("doc_upload_date")
+
+            self.assertEqual(zip_doc, disk_doc)
+            self.assertEqual(zip_doc["arc_name"],
+                             "Accounts_Monthly_Data-March2014")
+
+    def test_close_archives(self):
+        """
+        Archives opened by the process should be closed and forgotten, and
+        none left open once a directory has been parsed.
+        """
+        zf = XbrlParser.open_archive(self.archive)
+        XbrlParser.close_archives()
+
+        self.assertEqual(XbrlParser.open_archives, {})
+        self.assertIsNone(zf.fp)
+
+        processed = os.path.join(self.tmp_dir.name, "processed")
+        os.mkdir(processed)
+        XbrlParser.parse_directory(self.archive, processed, num_processes=1)
+
+        self.assertEqual(XbrlParser.open_archives, {})
+        self.assertTrue(os.path.exists(XbrlExtraction.xbrl_month_path(
+            processed, "March", "2014")))
+
+
+if __name__ == '__main__':
+    unittest.main()
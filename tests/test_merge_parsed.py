@@ -0,0 +1,34 @@
+import unittest
+import pandas as pd
+
+# Custom import
+from src.data_processing.xbrl_parser import XbrlParser
+
+
+class TestMergeParsed(unittest.TestCase):
+    """
+    Tests for the merge_parsed function.
+    """
+    def test_merge_parsed_pos(self):
+        """
+        Positive test case for the merge_parsed function.
+        """
+        new = pd.DataFrame({'doc_name': ['a', 'a'],
+                            'doc_upload_date': ['3', '3'],
+                            'value': ['a_new', 'a_new']})
+        pending = pd.DataFrame({'doc_name': ['b', 'b', 'b'],
+                                'doc_upload_date': ['1', '2', '2'],
+                                'value': ['b_old', 'b_new', 'b_new']})
+        existing = pd.DataFrame({'doc_name': ['a', 'b', 'c', 'd'],
+                                 'doc_upload_date': ['0', '0', '0', '0'],
+                                 'value': ['a_old', 'b_old', 'c', 'd']})
+
+        df = XbrlParser.merge_parsed([new, pending, existing],
+                                     ['a', 'b', 'c'])
+
+        self.assertEqual(df['value'].tolist(),
+                         ['a_new', 'a_new', 'b_new', 'b_new', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import numpy as np
+
+from src.data_processing.xbrl_parser import XbrlParser
+
+
+class TestNormaliseValues(unittest.TestCase):
+    """
+    Tests converting a column of values to numeric.
+    """
+    def test_normalise_values_formats(self):
+        """
+        Separators, dashes and brackets should be handled, and values that
+        are not numbers flagged as invalid.
+        """
+        numbers, valid = XbrlParser.normalise_values(
+            [" 1,234 ", "12 345.5", "-", "–", "(1,000)", "-7", "abc",
+             ""])
+
+        np.testing.assert_array_equal(
+            valid, [True, True, True, True, True, True, False, False])
+        np.testing.assert_array_equal(
+            numbers[valid], [1234.0, 12345.5, 0.0, 0.0, -1000.0, -7.0])
+        self.assertTrue(np.isnan(numbers[~valid]).all())
+        self.assertEqual(numbers.dtype, np.float64)
+
+    def test_normalise_values_sign_and_scale(self):
+        """
+        The sign attribute should negate values without giving -0.0, and the
+        scale attribute should multiply by a power of ten.
+        """
+        numbers, valid = XbrlParser.normalise_values(
+            ["1,200", "-", "(5)", "1234", "7"],
+            signs=["-", "-", "-", "NA", "NA"],
+            scales=["3", "0", "NA", "-2", "x"])
+
+        self.assertTrue(valid.all())
+        self.assertEqual(numbers.tolist(), [-1200000.0, 0.0, 5.0, 12.34, 7.0])
+        self.assertEqual(str(numbers[1]), "0.0")
+
+    def test_normalise_values_formats_attribute(self):
+        """
+        Comma decimal and zero formats should be honoured, whatever their
+        prefix or transformation registry version.
+        """
+        numbers, valid = XbrlParser.normalise_values(
+            ["1.234,5", "1 234,5", "1,234.5", "nil", "12"],
+            formats=["ixt:numcommadecimal", "ixt:num-comma-decimal",
+                     "ixt:numdotdecimal", "ixt:zerodash", "NA"])
+
+        self.assertTrue(valid.all())
+        self.assertEqual(numbers.tolist(),
+                         [1234.5, 1234.5, 1234.5, 0.0, 12.0])
+
+    def test_clean_values_matches_clean_value(self):
+        """
+        clean_values should give the same values as clean_value followed by
+        negating the signed values, for values with a unit.
+        """
+        values = ["1,234", " - ", "12 000", "x", "-", "Director1", ""]
+        units = ["GBP", "GBP", "GBP", "GBP", "GBP", "NA", "GBP"]
+        signs = ["NA", "NA", "-", "-", "-", "-", "NA"]
+
+        expected = []
+        for value, unit, sign in zip(values, units, signs):
+            if unit != "NA":
+                value = XbrlParser.clean_value(value)
+            if sign == "-" and isinstance(value, float):
+                value = 0.0 - value
+            expected.append(value)
+
+        self.assertEqual(XbrlParser.clean_values(values, units, signs),
+                         expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
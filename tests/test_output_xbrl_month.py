@@ -1,4 +1,6 @@
+import os
 import pandas
+import tempfile
 import unittest
 import unittest.mock as mock
 from pandas.testing import assert_frame_equal
@@ -39,6 +41,31 @@ class TestOutputXbrlMonth(unittest.TestCase):
         self.assertTrue(mock_to_csv, "output_folder" + "/" + "folder_year"
                         + "-" + "folder_month" + "_xbrl_data.csv")
 
+    def test_output_xbrl_month_parquet(self):
+        """
+        Parquet output should be readable with the name expected by
+        xbrl_import, with or without partitioning by standard.
+        """
+        extractor = XbrlExtraction()
+        df = self.data_input()
+        df['doc_standard_type'] = ['a', 'b', 'a', 'b', 'a', 'b']
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            extractor.output_xbrl_month(df, tmp_dir, "January", "2010",
+                                        "parquet")
+            output = pandas.read_parquet(
+                tmp_dir + "/2010_january_parsed.parquet")
+            assert_frame_equal(output, df)
+
+            extractor.output_xbrl_month(df, tmp_dir, "January", "2010",
+                                        "parquet", partition_by_standard=True)
+            output_path = tmp_dir + "/2010_january_parsed.parquet"
+            self.assertEqual(sorted(os.listdir(output_path)),
+                             ["doc_standard_type=a", "doc_standard_type=b"])
+            output = pandas.read_parquet(output_path)
+            self.assertEqual(sorted(output['Age'].tolist()),
+                             sorted(df['Age'].tolist()))
+
     def test_output_xbrl_month_types(self):
         """
         Types test case for the output_xbrl_month function.
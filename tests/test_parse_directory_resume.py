@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+import unittest.mock as mock
+import pandas as pd
+
+# Custom import
+from src.data_processing.xbrl_pd_methods import XbrlExtraction
+from src.data_processing.xbrl_parser import XbrlParser
+from tests import test_stream_elements
+
+
+class TestParseDirectoryResume(unittest.TestCase):
+    """
+    Tests that an interrupted parse_directory run is picked up again.
+    """
+    doc = test_stream_elements.TestStreamElements.doc
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp_dir.name,
+                                      "Accounts_Monthly_Data-March2014")
+        self.processed = os.path.join(self.tmp_dir.name, "processed")
+        os.mkdir(self.directory)
+        os.mkdir(self.processed)
+
+        for crn in ["07971828", "07971829", "07971830"]:
+            with open(self.directory + "/Prod224_0013_{}_20140331.html"
+                      .format(crn), "w") as f:
+                f.write(self.doc)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def parse(self):
+        XbrlParser.parse_directory(self.directory, self.processed,
+                                   num_processes=1, batch_size=1)
+
+    def test_killed_before_first_output(self):
+        """
+        A run killed before its first output was written should be resumed
+        from its pending rows, without parsing any file again.
+        """
+        with mock.patch.object(XbrlExtraction, "output_xbrl_month",
+                               side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                self.parse()
+
+        output_path = XbrlExtraction.xbrl_month_path(self.processed, "March",
+                                                     "2014")
+        self.assertFalse(os.path.exists(output_path))
+
+        with mock.patch.object(XbrlParser, "batch_by_size",
+                               wraps=XbrlParser.batch_by_size) as batches:
+            self.parse()
+
+        self.assertEqual(batches.call_args[0][0], [])
+        df = pd.read_csv(output_path, dtype=str)
+        self.assertEqual(df['doc_name'].nunique(), 3)
+        self.assertFalse(os.path.exists(output_path + ".pending"))
+
+    def test_output_type_changed(self):
+        """
+        Every file should be parsed again when the output type has changed.
+        """
+        self.parse()
+
+        with mock.patch.object(XbrlParser, "batch_by_size",
+                               wraps=XbrlParser.batch_by_size) as batches:
+            XbrlParser.parse_directory(self.directory, self.processed,
+                                       num_processes=1, batch_size=1,
+                                       file_type="parquet")
+
+        self.assertEqual(len(batches.call_args[0][0]), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+
+# Custom import
+from src.data_processing.xbrl_csv_cleaner import XbrlCSVCleaner
+
+
+class TestParsedCsvClean(unittest.TestCase):
+    """
+    Tests for the parsed_csv_clean function.
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.import_path = os.path.join(self.tmp.name, "parsed.csv")
+
+        # Written before the scale, decimals and format columns were added,
+        # with an extra column which is not wanted
+        pd.DataFrame({
+            'date': ['2014-03-31'] * 5,
+            'name': ['a', 'b', 'c', 'd', 'e'],
+            'unit': ['iso4217:GBP', 'NA', 'NA', 'iso4217:GBP', 'NA'],
+            'value': ['1.0', 'two  words', 'a "quoted" value', '4.0',
+                      'line\nbreak'],
+            'doc_name': ['x.html'] * 5,
+            'doc_type': ['html'] * 5,
+            'doc_upload_date': ['2020-01-01'] * 5,
+            'arc_name': ['Accounts_Monthly_Data-March2014'] * 5,
+            'parsed': [True] * 5,
+            'doc_balancesheetdate': ['2014-03-31'] * 5,
+            'doc_companieshouseregisterednumber': ['07971828'] * 5,
+            'doc_standard_type': ['uk-gaap-full'] * 5,
+            'doc_standard_date': ['2009-09-01'] * 5,
+            'doc_standard_link': ['uk-gaap-full-2009-09-01.xsd'] * 5,
+            'unwanted': range(5)
+        }).to_csv(self.import_path, index=False)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, path):
+        return pd.read_csv(path, sep="\t", dtype=str, keep_default_na=False)
+
+    def test_parsed_csv_clean_pos(self):
+        """
+        Positive test case for the parsed_csv_clean function.
+        """
+        export_path = os.path.join(self.tmp.name, "cleaned.csv")
+        XbrlCSVCleaner.parsed_csv_clean(self.import_path, export_path)
+
+        df = self.read(export_path)
+        self.assertEqual(list(df.columns), XbrlCSVCleaner.wanted_cols)
+        self.assertEqual(df['value'].tolist(),
+                         ['1.0', 'twowords', 'a quoted value', '4.0',
+                          'linebreak'])
+        self.assertEqual(df['scale'].tolist(), ['NA'] * 5)
+        self.assertEqual(df['doc_companieshouseregisterednumber'].tolist(),
+                         ['07971828'] * 5)
+
+    def test_parsed_csv_clean_chunked(self):
+        """
+        Cleaning in chunks should give the same file as cleaning it at once,
+        including when cleaning the file in place.
+        """
+        export_path = os.path.join(self.tmp.name, "cleaned.csv")
+        XbrlCSVCleaner.parsed_csv_clean(self.import_path, export_path)
+        with open(export_path) as f:
+            expected = f.read()
+
+        XbrlCSVCleaner.parsed_csv_clean(self.import_path, chunksize=2)
+        with open(self.import_path) as f:
+            self.assertEqual(f.read(), expected)
+        self.assertEqual([file for file in os.listdir(self.tmp.name)
+                          if file.endswith(".tmp")], [])
+
+    def test_clean_parsed_files_pos(self):
+        """
+        Every file should be cleaned by the pool, and cleaned again only
+        once it is newer than its cleaned file.
+        """
+        import_directory = os.path.join(self.tmp.name, "parsed")
+        export_directory = os.path.join(self.tmp.name, "cleaned")
+        os.mkdir(import_directory)
+        os.mkdir(export_directory)
+        for month in ["January", "February"]:
+            shutil.copy(self.import_path, os.path.join(
+                import_directory, "{}2014_xbrl.csv".format(month)))
+
+        results = XbrlCSVCleaner.clean_parsed_files(
+            import_directory, export_directory, num_processes=2)
+        self.assertEqual(sorted((r['file'], r['status'], r['rows'])
+                                for r in results),
+                         [("February2014_xbrl.csv", "cleaned", 5),
+                          ("January2014_xbrl.csv", "cleaned", 5)])
+        self.assertEqual(sorted(os.listdir(export_directory)),
+                         ["February2014_xbrl.csv", "January2014_xbrl.csv"])
+
+        # Make one of the parsed files newer than its cleaned file
+        later = os.path.getmtime(self.import_path) + 60
+        os.utime(os.path.join(export_directory, "January2014_xbrl.csv"),
+                 (later, later))
+        os.utime(os.path.join(import_directory, "February2014_xbrl.csv"),
+                 (later + 60, later + 60))
+
+        results = XbrlCSVCleaner.clean_parsed_files(
+            import_directory, export_directory, num_processes=2)
+        self.assertEqual(sorted((r['file'], r['status']) for r in results),
+                         [("February2014_xbrl.csv", "cleaned"),
+                          ("January2014_xbrl.csv", "skipped")])
+
+
+if __name__ == '__main__':
+    unittest.main()
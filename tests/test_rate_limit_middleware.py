@@ -0,0 +1,148 @@
+import multiprocessing as mp
+import socket
+import threading
+import time
+import unittest
+from http.server import ThreadingHTTPServer
+
+import scrapy
+from scrapy.crawler import CrawlerProcess
+
+# Custom import
+from src.filing_fetcher_scraper.filing_fetcher_scraper import rate_limit
+from tests import test_api_rate_limiter
+
+MIDDLEWARE = "src.filing_fetcher_scraper.filing_fetcher_scraper." \
+    "middlewares.RateLimitMiddleware"
+
+
+class UsedElsewhereApiHandler(test_api_rate_limiter.MockApiHandler):
+    """
+    Mock API whose first window for each key has already been used up by
+    something else, and which redirects ".../moved" to the path before it.
+    """
+    def do_GET(self):
+        key = self.headers.get("Authorization")
+        with self.server.lock:
+            if key not in self.server.windows:
+                self.server.windows[key] = (time.time(), self.server.limit)
+        super().do_GET()
+
+    def send_response(self, code, message=None):
+        if code == 200 and self.path.endswith("/moved"):
+            super().send_response(302)
+            self.send_header("Location", self.path[:-len("/moved")])
+        else:
+            super().send_response(code, message)
+
+
+class ApiSpider(scrapy.Spider):
+    name = "api"
+
+    async def start(self):
+        for request in self.start_requests():
+            yield request
+
+    def start_requests(self):
+        for url in self.urls:
+            yield scrapy.Request(url, dont_filter=True, errback=self.failed)
+
+    def parse(self, response):
+        self.results.append((response.url, response.status, time.time()))
+
+    def failed(self, failure):
+        self.results.append((failure.request.url, "failed", time.time()))
+
+
+def crawl(urls, limit, window, queue):
+    """
+    Crawls urls with RateLimitMiddleware in its own process, as the reactor
+    can only be started once, putting the responses, the crawl stats and
+    the requests left in flight on queue.
+    """
+    limiter = rate_limit.ApiRateLimiter(["key1"], limit, window)
+    rate_limit._shared_limiter = limiter
+
+    process = CrawlerProcess(settings={
+        "DOWNLOADER_MIDDLEWARES": {MIDDLEWARE: 650},
+        "CH_API_DOMAIN": "127.0.0.1",
+        "CONCURRENT_REQUESTS": 8,
+        "RETRY_TIMES": 1,
+        "LOG_ENABLED": False,
+        "TELNETCONSOLE_ENABLED": False})
+    crawler = process.create_crawler(ApiSpider)
+    results = []
+    process.crawl(crawler, urls=urls, results=results)
+    process.start()
+
+    queue.put((results, crawler.stats.get_stats(),
+               limiter.buckets["key1"].in_flight))
+
+
+class TestRateLimitMiddleware(unittest.TestCase):
+    """
+    Tests for the RateLimitMiddleware class, crawling a mock API.
+    """
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                          UsedElsewhereApiHandler)
+        self.server.lock = threading.Lock()
+        self.server.windows = {}
+        self.server.statuses = []
+        self.server.limit = 3
+        self.server.window = 0.5
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        self.url = "http://127.0.0.1:{}/company/{{:08d}}/filing-history"\
+            .format(self.server.server_port)
+
+        # A port nothing is listening on
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.closed_url = "http://127.0.0.1:{}/company/00000000"\
+                .format(s.getsockname()[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_rate_limit_middleware_crawl(self):
+        """
+        Requests beyond the quota should be held back rather than dropped,
+        a rate limited request retried by the middleware rather than the
+        retry middleware, and redirects and failed requests should give
+        back their tokens.
+        """
+        urls = [self.url.format(i) for i in range(6)] \
+            + [self.url.format(6) + "/moved", self.closed_url]
+
+        queue = mp.get_context("fork").Queue()
+        process = mp.get_context("fork").Process(
+            target=crawl, args=(urls, self.server.limit, self.server.window,
+                                queue))
+        process.start()
+        results, stats, in_flight = queue.get(timeout=60)
+        process.join()
+
+        responses = sorted((url, status) for url, status, _ in results)
+        self.assertEqual(responses,
+                         sorted([(self.url.format(i), 200)
+                                 for i in range(7)]
+                                + [(self.closed_url, "failed")]))
+
+        # Only the requests made before the API said the quota was used up
+        # were rate limited, the rest (including both requests of the
+        # redirect) being held back to three per window
+        statuses = self.server.statuses
+        self.assertEqual(statuses, sorted(statuses, reverse=True))
+        self.assertEqual(statuses.count(200), 8)
+        times = sorted(t for url, status, t in results if status == 200)
+        self.assertGreaterEqual(times[-1] - times[0], 0.9)
+
+        self.assertNotIn("retry/reason_count/429 Too Many Requests", stats)
+        self.assertEqual(stats.get("retry/count"), 1)
+        self.assertEqual(in_flight, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+# Custom import
+from src.data_processing.xbrl_manifest import XbrlManifest
+
+
+class TestStaleFiles(unittest.TestCase):
+    """
+    Tests for the manifest of parsed files.
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.files = []
+        for name in ["a", "b", "c", "d"]:
+            filepath = os.path.join(self.tmp_dir.name, name + ".html")
+            with open(filepath, "w") as f:
+                f.write(name * 10)
+            self.files.append(filepath)
+        self.manifest_path = os.path.join(self.tmp_dir.name, "manifest.csv")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_stale_files_pos(self):
+        """
+        Only new, failed and changed files should need parsing.
+        """
+        a, b, c, d = self.files
+        XbrlManifest.record(self.manifest_path,
+                            [XbrlManifest.file_entry(a, "parsed"),
+                             XbrlManifest.file_entry(b, "parsed"),
+                             XbrlManifest.file_entry(c, "failed")])
+
+        # Touched but unchanged
+        os.utime(a, (0, 0))
+        # Changed
+        with open(b, "w") as f:
+            f.write("changed")
+
+        manifest = XbrlManifest.load(self.manifest_path)
+
+        self.assertEqual(XbrlManifest.stale_files(self.files, manifest),
+                         [b, c, d])
+
+    def test_compact(self):
+        """
+        Compacting should keep the latest entry of files still present.
+        """
+        a, b, c, d = self.files
+        XbrlManifest.record(self.manifest_path,
+                            [XbrlManifest.file_entry(a, "failed"),
+                             XbrlManifest.file_entry(b, "parsed")])
+        XbrlManifest.record(self.manifest_path,
+                            [XbrlManifest.file_entry(a, "parsed")])
+
+        XbrlManifest.compact(self.manifest_path, [a, c])
+        manifest = XbrlManifest.load(self.manifest_path)
+
+        self.assertEqual(list(manifest.keys()), [a])
+        self.assertEqual(manifest[a]["status"], "parsed")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+
+# Custom import
+from src.data_processing.xbrl_parser import XbrlParser
+
+
+class TestStreamElements(unittest.TestCase):
+    """
+    Tests that the iterparse engine gives the same document as the soup
+    engine.
+    """
+    doc = """<html><body>
+        <div style="display:none">
+        <link:schemaRef xlink:type="simple"
+            xlink:href="http://www.xbrl.org/uk/gaap/core/2009-09-01/uk-gaap-full-2009-09-01.xsd"/>
+        <xbrli:unit id="GBP"><xbrli:measure>iso4217:GBP</xbrli:measure>
+        </xbrli:unit>
+        </div>
+        <table>
+        <tr><td><ix:nonFraction name="uk-gaap:FixedAssets" contextRef="c1"
+            unitRef="GBP">12,345</ix:nonFraction></td></tr>
+        <tr><td><ix:nonFraction name="uk-gaap:Creditors" contextRef="c1"
+            unitRef="GBP" sign="-">1,200</ix:nonFraction></td></tr>
+        <tr><td><ix:nonFraction name="uk-gaap:Debtors" contextRef="c0"
+            unitRef="GBP">-</ix:nonFraction></td></tr>
+        <tr><td><ix:nonFraction name="uk-gaap:Cash" contextRef="c1"
+            unitRef="GBP">1 000</ix:nonFraction></td></tr>
+        <tr><td><ix:nonFraction name="uk-gaap:Stock" contextRef="c1"
+            unitRef="GBP" scale="3" decimals="-3"
+            format="ixt:numcommadecimal">2.500</ix:nonFraction></td></tr>
+        </table>
+        <ix:nonNumeric name="uk-gaap:Policy" contextRef="d1">Text with
+            <b>nested <ix:nonNumeric name="uk-gaap:Inner" contextRef="d1">
+            inner</ix:nonNumeric></b> tags</ix:nonNumeric>
+        <ix:nonNumeric name="uk-gaap:NameEntityOfficer"
+            contextRef="d1"></ix:nonNumeric>
+        <xbrli:context id="c1"><xbrli:period>
+            <xbrli:instant>2014-03-31</xbrli:instant>
+        </xbrli:period></xbrli:context>
+        <xbrli:context id="c0"><xbrli:period>
+            <xbrli:instant>2013-03-31</xbrli:instant>
+        </xbrli:period></xbrli:context>
+        <xbrli:context id="d1"><xbrli:entity><xbrli:segment>
+            <xbrldi:explicitMember dimension="a">uk-gaap:Director1
+            </xbrldi:explicitMember>
+        </xbrli:segment></xbrli:entity><xbrli:period>
+            <xbrli:startDate>2013-04-01</xbrli:startDate>
+            <xbrli:endDate>2014-03-31</xbrli:endDate>
+        </xbrli:period></xbrli:context>
+        </body></html>"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        folder = os.path.join(self.tmp_dir.name,
+                              "Accounts_Monthly_Data-March2014")
+        os.mkdir(folder)
+        self.filepath = folder + "/Prod224_0013_07971828_20140331.html"
+        with open(self.filepath, "w") as f:
+            f.write(self.doc)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_stream_elements_pos(self):
+        """
+        Positive test case for the stream_elements function.
+        """
+        elements, index = XbrlParser.stream_elements(self.filepath)
+
+        self.assertEqual(index["schemaref"],
+                         "http://www.xbrl.org/uk/gaap/core/2009-09-01/"
+                         "uk-gaap-full-2009-09-01.xsd")
+        self.assertEqual(elements["value"][:4],
+                         ["12,345", "1,200", "-", "1 000"])
+        self.assertEqual(XbrlParser.clean_values(elements["value"][:4],
+                                                 elements["unit"][:4],
+                                                 elements["sign"][:4]),
+                         [12345.0, -1200.0, 0.0, 1000.0])
+        self.assertEqual(elements["date"][:3],
+                         ["2014-03-31", "2014-03-31", "2013-03-31"])
+        self.assertEqual(elements["value"][-1], "Director1")
+        self.assertEqual(elements["scale"][3:5], ["NA", "3"])
+        self.assertEqual(elements["decimals"][3:5], ["NA", "-3"])
+        self.assertEqual(elements["format"][3:5],
+                         ["NA", "ixt:numcommadecimal"])
+
+    def test_flatten_data_scaled(self):
+        """
+        Scaled values should be multiplied out in the flattened table, with
+        the scale, decimals and format kept as columns.
+        """
+        doc = XbrlParser.process_account(self.filepath, "iterparse")
+        df = XbrlParser.flatten_data([doc])
+
+        row = df[df['name'] == "stock"].iloc[0]
+        self.assertEqual(row['value'], "2500000.0")
+        self.assertEqual((row['scale'], row['decimals'], row['format']),
+                         ("3", "-3", "ixt:numcommadecimal"))
+
+    def test_engines_match(self):
+        """
+        Both engines should produce the same document dict.
+        """
+        soup_doc = XbrlParser.process_account(self.filepath, "soup")
+        stream_doc = XbrlParser.process_account(self.filepath, "iterparse")
+
+        soup_doc.pop("doc_upload_date")
+        stream_doc.pop("doc_upload_date")
+
+        self.assertEqual(soup_doc, stream_doc)
+
+    def test_parse_files_values(self):
+        """
+        An unknown parse engine should raise a ValueError.
+        """
+        with self.assertRaises(ValueError):
+            XbrlParser.parse_files("1", "2014", self.tmp_dir.name, "None",
+                                   self.tmp_dir.name, 1, "notanengine")
+
+
+if __name__ == '__main__':
+    unittest.main()
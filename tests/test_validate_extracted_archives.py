@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+import unittest
+import zipfile
+
+# Custom import
+from src.validators.xbrl_validator_methods import XbrlValidatorMethods
+
+
+class TestValidateExtractedArchives(unittest.TestCase):
+    """
+    Tests for the validate_extracted_archives function.
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp_dir.name, "scraped")
+        self.dest = os.path.join(self.tmp_dir.name, "unpacked")
+        os.mkdir(self.source)
+        os.mkdir(self.dest)
+
+        self.archive = os.path.join(self.source,
+                                    "Accounts_Monthly_Data-March2014.zip")
+        self.members = {"a_20140331.html": b"<html>a</html>",
+                        "sub/b_20140331.html": b"<html>b</html>"}
+        with zipfile.ZipFile(self.archive, "w") as zf:
+            for name, data in self.members.items():
+                zf.writestr(name, data)
+
+        self.folder = os.path.join(self.dest,
+                                   "Accounts_Monthly_Data-March2014")
+        for name, data in self.members.items():
+            self.write(name, data)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.folder, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def test_validate_extracted_archives_pos(self):
+        """
+        Positive test case for the validate_extracted_archives function.
+        """
+        report_path = os.path.join(self.tmp_dir.name, "report.json")
+        report = XbrlValidatorMethods.validate_extracted_archives(
+            self.source, self.dest, report_path, check_crc=True)
+
+        self.assertEqual(len(report), 1)
+        self.assertTrue(report[0]['ok'])
+        self.assertEqual(report[0]['members'], 2)
+        with open(report_path) as f:
+            self.assertEqual(json.load(f), report)
+
+    def test_validate_extracted_archives_neg(self):
+        """
+        Missing, truncated, corrupt and extra files should all be reported.
+        """
+        os.remove(os.path.join(self.folder, "a_20140331.html"))
+        self.write("sub/b_20140331.html", b"<html>")
+        self.write("c_20140331.html.part", b"")
+
+        result = XbrlValidatorMethods.validate_extracted_archives(
+            self.source, self.dest)[0]
+
+        self.assertFalse(result['ok'])
+        self.assertEqual(result['missing'], ["a_20140331.html"])
+        self.assertEqual(result['truncated'],
+                         [{'name': "sub/b_20140331.html", 'expected': 14,
+                           'actual': 6}])
+        self.assertEqual(result['extra'], ["c_20140331.html.part"])
+
+        self.write("sub/b_20140331.html", b"<html>x</html>")
+        result = XbrlValidatorMethods.validate_extracted_archives(
+            self.source, self.dest, check_crc=True)[0]
+        self.assertEqual(result['corrupt'], ["sub/b_20140331.html"])
+
+    def test_validate_extracted_archives_no_folder(self):
+        """
+        An archive with no extracted folder should report every member as
+        missing.
+        """
+        os.rename(self.folder, self.folder + "_old")
+
+        result = XbrlValidatorMethods.validate_extracted_archives(
+            self.source, self.dest)[0]
+
+        self.assertFalse(result['ok'])
+        self.assertEqual(sorted(result['missing']), sorted(self.members))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+
+# Custom import
+from src.data_processing.xbrl_schema import XbrlSchema
+from src.data_processing.xbrl_pd_methods import XbrlSubsets
+from src.filing_fetcher_scraper.filing_fetcher_scraper import companies
+
+
+class TestXbrlSchema(unittest.TestCase):
+    """
+    Tests for the XbrlSchema class.
+    """
+    def parsed(self):
+
+        return pd.DataFrame({
+            'date': ['2014-03-31', '2013-03-31', 'NA'],
+            'name': ['fixedassets', 'fixedassets', 'nameofentity'],
+            'unit': ['iso4217:GBP', 'iso4217:GBP', 'NA'],
+            'value': ['12345.0', '-5.5', 'Widgets Ltd'],
+            'scale': ['0', '0', 'NA'],
+            'decimals': ['0', '0', 'NA'],
+            'format': ['NA', 'NA', 'NA'],
+            'doc_name': ['a.html'] * 3,
+            'doc_type': ['html'] * 3,
+            'doc_upload_date': ['2020-01-01 12:34:56.789012'] * 3,
+            'arc_name': ['Accounts_Monthly_Data-March2014'] * 3,
+            'parsed': ['True'] * 3,
+            'doc_balancesheetdate': ['2014-03-31'] * 3,
+            'doc_companieshouseregisterednumber': ['SC123456'] * 3,
+            'doc_standard_type': ['uk-gaap-full'] * 3,
+            'doc_standard_date': ['2009-09-01'] * 3,
+            'doc_standard_link': ['uk-gaap-full-2009-09-01.xsd'] * 3})
+
+    def test_apply_pos(self):
+        """
+        Positive test case for the apply function.
+        """
+        df = XbrlSchema.apply(self.parsed())
+
+        self.assertEqual(list(df.columns), XbrlSchema.columns)
+        for col in XbrlSchema.category_cols:
+            self.assertIsInstance(df[col].dtype, pd.CategoricalDtype)
+        for col in XbrlSchema.date_cols + XbrlSchema.datetime_cols:
+            self.assertTrue(pd.api.types.is_datetime64_any_dtype(df[col]))
+        self.assertEqual(df['value'].dtype, np.float64)
+        self.assertEqual(df['value'].tolist()[:2], [12345.0, -5.5])
+        self.assertEqual(df['value_text'].tolist()[2], 'Widgets Ltd')
+        self.assertTrue(df['date'].isna().tolist()[2])
+        self.assertTrue(pd.api.types.is_integer_dtype(
+            df['doc_companieshouseregisterednumber']))
+        self.assertTrue(df['parsed'].all())
+
+    def test_apply_numeric_text(self):
+        """
+        The values of facts with a unit should be held as numbers whichever
+        other values they are read with, and the text of every value kept.
+        """
+        values = ['0.10', '1e3', '100', 'text', 'NA']
+        df = self.parsed().iloc[[0] * len(values)].reset_index(drop=True)
+        df['value'] = values
+
+        whole = XbrlSchema.apply(df.copy())
+        chunks = pd.concat([XbrlSchema.apply(df.iloc[[i]].copy())
+                            for i in range(len(values))])
+
+        for output in [whole, chunks]:
+            np.testing.assert_array_equal(
+                output['value'].to_numpy(),
+                [0.1, 1000.0, 100.0, np.nan, np.nan])
+            self.assertEqual(output['value_text'].tolist(), values)
+            self.assertEqual(XbrlSchema.to_text(output)['value'].tolist(),
+                             values)
+
+    def test_apply_text_facts(self):
+        """
+        Facts without a unit which look like numbers should not be held as
+        numbers, and should be written back as they were.
+        """
+        values = ['01234567', '2019', '1,000', '00']
+        df = self.parsed().iloc[[2] * len(values)].reset_index(drop=True)
+        df['value'] = values
+
+        output = XbrlSchema.apply(df.copy())
+
+        self.assertTrue(output['value'].isna().all())
+        self.assertEqual(XbrlSchema.to_text(output)['value'].tolist(),
+                         values)
+
+    def test_to_text_round_trip(self):
+        """
+        A table read with the schema should be written back as the same text.
+        """
+        df = self.parsed()
+        with tempfile.TemporaryDirectory() as tmp:
+            filepath = os.path.join(tmp, "parsed.csv")
+            df.to_csv(filepath, index=False)
+
+            text = XbrlSchema.to_text(XbrlSchema.read_csv(filepath))
+
+        pd.testing.assert_frame_equal(text.astype(str), df)
+
+    def test_to_text_rejects(self):
+        """
+        Dates and company numbers which cannot be read should keep their
+        text, and be written back as it was.
+        """
+        df = self.parsed()
+        df['date'] = ['2014-13-45', 'NA', '']
+        df['doc_upload_date'] = ['yesterday', 'NA', 'NA']
+        df['doc_companieshouseregisterednumber'] = ['AB-12345', 'NA',
+                                                    'SC123456']
+
+        typed = XbrlSchema.apply(df.copy())
+        self.assertTrue(typed['date'].isna().all())
+        self.assertEqual(typed['date_text'].fillna('missing').tolist(),
+                         ['2014-13-45', 'missing', ''])
+        self.assertEqual(
+            typed['doc_companieshouseregisterednumber'].tolist()[:2],
+            [-1, -1])
+
+        text = XbrlSchema.to_text(typed)
+        pd.testing.assert_frame_equal(text.astype(str), df)
+
+    def test_crn_pos(self):
+        """
+        Company numbers should be padded to 8 characters, and missing or not
+        valid ones decoded as "NA".
+        """
+        codes = XbrlSchema.encode_crn(['7971828', 'SC123456', 'NA', '',
+                                       '123456789', 'AB-12345'])
+
+        self.assertEqual(XbrlSchema.decode_crn(codes).tolist(),
+                         ['07971828', 'SC123456', 'NA', 'NA', 'NA', 'NA'])
+
+        # The same codes as the indexes of the filing fetcher
+        np.testing.assert_array_equal(
+            codes, companies.encode_company_numbers(
+                ['7971828', 'SC123456', 'NA', '', '123456789', 'AB-12345']))
+
+    def test_subsets_categorical(self):
+        """
+        Tags extracted from a categorical column should only keep their own
+        categories, and aggregating should only give the groups present.
+        """
+        df = XbrlSchema.apply(self.parsed())
+
+        output = XbrlSubsets.tag_extraction(df, 'name', 'fixedassets')
+        self.assertEqual(list(output['name'].cat.categories), ['fixedassets'])
+
+        output = XbrlSubsets.aggregation(df, ['name', 'unit'], 'count',
+                                         ['value'])
+        self.assertEqual(len(output), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()